@@ -0,0 +1,79 @@
+import io
+
+import numpy as np
+import soundfile as sf
+
+# --- /api/process/ 업로드 전처리 ---
+# 무음 구간 자르기 → 모노 → 16 kHz → FLAC 인코딩. CPU 작업이라 api/stt.py 의 프로세스 풀에서 돌립니다.
+# numpy/soundfile 을 쓰는 오디오 처리는 여기 모아 두고, 서버에서는 처음 쓸 때 import 합니다.
+PREPROCESS_SAMPLERATE = 16000
+SILENCE_RMS = 0.01          # CLI 의 np.abs(buffer).mean() < 0.01 기준과 같은 크기
+VAD_FRAME_SECONDS = 0.03
+VAD_PADDING_SECONDS = 0.2
+
+
+def trim_silence(samples: np.ndarray, rate: int, threshold: float = SILENCE_RMS):
+    """
+    프레임별 RMS 에너지로 앞뒤 무음을 잘라냅니다. 전부 무음이면 None.
+    """
+    frame = max(1, int(rate * VAD_FRAME_SECONDS))
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return None
+    frames = samples[: n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    voiced = np.flatnonzero(rms >= threshold)
+    if len(voiced) == 0:
+        return None
+    padding = int(rate * VAD_PADDING_SECONDS)
+    start = max(0, voiced[0] * frame - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame + padding)
+    return samples[start:end]
+
+
+def resample(samples: np.ndarray, rate: int, target_rate: int = PREPROCESS_SAMPLERATE) -> np.ndarray:
+    """
+    선형 보간 리샘플링 (음성 인식용으로는 충분하고 추가 의존성이 없음).
+    """
+    if rate == target_rate:
+        return samples
+    duration = len(samples) / rate
+    target_len = int(round(duration * target_rate))
+    source_t = np.arange(len(samples)) / rate
+    target_t = np.arange(target_len) / target_rate
+    return np.interp(target_t, source_t, samples).astype(np.float32)
+
+
+def preprocess_audio(data: bytes):
+    """
+    업로드된 녹음을 STT 용으로 줄입니다.
+    - 전부 무음이면 None (API 를 호출할 필요 없음)
+    - soundfile 이 읽을 수 없는 형식(예: 브라우저 webm)은 원본 bytes 를 그대로 돌려줌
+    - 그 외에는 무음 제거 + 모노 + 16 kHz FLAC 으로 인코딩한 BytesIO (name="input.flac")
+    """
+    try:
+        samples, rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except Exception:
+        return data
+
+    mono = samples.mean(axis=1)
+    trimmed = trim_silence(mono, rate)
+    if trimmed is None:
+        return None
+
+    output = io.BytesIO()
+    sf.write(output, resample(trimmed, rate), PREPROCESS_SAMPLERATE, format="FLAC")
+    output.seek(0)
+    output.name = "input.flac"
+    return output
+
+
+def encode_wav(samples: np.ndarray, rate: int = PREPROCESS_SAMPLERATE, name: str = "chunk.wav") -> io.BytesIO:
+    """
+    numpy 샘플을 메모리 안에서 WAV 로 인코딩합니다 (임시 파일 없이 STT 에 바로 넘길 수 있음).
+    """
+    output = io.BytesIO()
+    sf.write(output, samples, rate, format="WAV", subtype="PCM_16")
+    output.seek(0)
+    output.name = name
+    return output
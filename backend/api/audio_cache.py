@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+def make_cache_key(*parts) -> str:
+    """
+    입력값들(텍스트, 음성 설정 등)을 sha256 으로 묶어 파일 이름으로 쓸 키를 만듭니다.
+    """
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def atomic_write_bytes(path, data: bytes):
+    """
+    같은 디렉토리의 임시 파일에 쓴 뒤 os.replace 로 교체합니다.
+    읽는 쪽(브라우저, 다른 워커)이 반쯤 쓰인 파일을 보지 않게 하기 위함입니다.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class AudioCache:
+    """
+    내용 주소 기반(content-addressed) 디스크 오디오 캐시.
+    <directory>/<key>.mp3 로 저장하고, 전체 크기가 max_bytes 를 넘으면
+    가장 오래 사용되지 않은 파일부터 지웁니다.
+    """
+
+    suffix = ".mp3"
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # key -> size, 오래된 것부터
+        self._total = 0
+
+        # 재시작 후에도 LRU 순서를 이어가도록 mtime 순으로 인덱스를 복원합니다.
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[: -len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total += size
+        with self._lock:
+            self._evict()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str):
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if key not in self._index:
+                # 다른 워커가 만든 파일
+                self._index[key] = len(data)
+                self._total += len(data)
+            self._index.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> Path:
+        path = self.path(key)
+        atomic_write_bytes(path, data)
+        with self._lock:
+            self._forget(key)
+            self._index[key] = len(data)
+            self._total += len(data)
+            self._evict()
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._index),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+            }
+
+    def sweep(self, max_age: float = None) -> int:
+        """
+        디렉토리를 다시 읽어 인덱스를 맞추고(다른 워커가 만든 파일 포함), max_age 초 넘게
+        사용되지 않은 파일과 크기 상한을 넘는 오래된 파일을 지웁니다. 지운 파일 수를 돌려줍니다.
+        """
+        now = time.time()
+        entries = []
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".tmp"):
+                # 쓰다가 죽은 워커가 남긴 임시 파일
+                expired = stat.st_mtime < now - 3600
+            elif entry.name.endswith(self.suffix):
+                expired = max_age is not None and stat.st_mtime < now - max_age
+                if not expired:
+                    entries.append((stat.st_mtime, entry.name[: -len(self.suffix)], stat.st_size))
+            else:
+                continue
+            if expired:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+
+        with self._lock:
+            self._index.clear()
+            self._total = 0
+            for _, key, size in sorted(entries):
+                self._index[key] = size
+                self._total += size
+            before = len(self._index)
+            self._evict()
+            removed += before - len(self._index)
+        return removed
+
+    def _forget(self, key: str):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total -= size
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
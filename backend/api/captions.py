@@ -0,0 +1,235 @@
+"""
+마이크 실시간 자막 CLI (서버에서는 import 하지 않음).
+
+    cd backend
+    python -m api.captions
+"""
+import os
+import sys
+import queue
+import threading
+import time
+import numpy as np
+import sounddevice as sd
+
+from collections import deque
+
+from .audio import encode_wav
+from .clients import get_openai_client
+from .stt import chunk_seconds, samplerate
+
+# 1) query_devices() 로 인덱스 확인 (한 번만 하면 됩니다)
+print(sd.query_devices())
+#    ... MacBook Pro Microphone 이 0번이면 ...
+#mic_index = 2
+
+# 2) 기본 입력 장치로 설정
+# (출력은 지정할 필요 없으면 None)
+# sd.default.device = (mic_index, None)
+sd.default.device = (None, None)
+
+audio_queue = queue.Queue()
+block_size = 4000
+window_hop_seconds = 2.0  # 3초 창을 2초마다 → 1초씩 겹쳐서 경계에서 단어가 잘리지 않게 함
+
+caption_history = deque(maxlen=5)
+current_caption = ""
+caption_lock = threading.Lock()
+
+# 종료어 설정
+exit_keyword = "stop"  # 종료어 설정 (여기서는 'stop')
+
+def audio_callback(indata, frames, time, status):
+    if status:
+        print(f"Status: {status}", file=sys.stderr)
+    audio_queue.put(indata.copy())
+
+
+def clear_screen():
+    # 화면 전체를 지우는 외부 명령(clear/cls) 대신 ANSI 코드로 커서를 맨 위로 옮기고 아래를 지웁니다.
+    sys.stdout.write("\033[H\033[J")
+    sys.stdout.flush()
+
+
+def update_captions():
+    # 한 번에 만들어서 한 번에 씁니다 (깜빡임 없이 제자리 갱신).
+    lines = ["\n\n", "=" * 60, "🎙️ Real-time Speech-to-Text Captions (Press Ctrl+C to exit)", "=" * 60]
+
+    for prev in list(caption_history)[:-1]:
+        lines.append(f"\033[90m{prev}\033[0m")
+
+    if caption_history:
+        lines.append(list(caption_history)[-1])
+
+    if current_caption:
+        lines.append(f"\033[1m{current_caption}\033[0m▋")
+    else:
+        lines.append("▋")
+    lines.append("=" * 60)
+    sys.stdout.write("\033[H\033[J" + "\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+def audio_collection_thread():
+    try:
+        with sd.InputStream(samplerate=samplerate, channels=1, 
+                          callback=audio_callback, blocksize=block_size):
+            print("🎙️ Real-time STT is starting... Please wait.")
+            while True:
+                time.sleep(0.1)
+    except Exception as e:
+        print(f"Audio stream error: {e}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+
+
+class RingBuffer:
+    """
+    고정 크기 numpy 링 버퍼. 블록이 들어올 때마다 배열을 새로 만들지 않고 제자리에 덮어씁니다.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=dtype)
+        self.total_written = 0
+
+    def __len__(self):
+        return min(self.total_written, self.capacity)
+
+    def extend(self, samples: np.ndarray):
+        samples = samples.reshape(-1)
+        if len(samples) >= self.capacity:
+            samples = samples[-self.capacity:]
+            self.total_written += len(samples)
+            self._data[:] = samples
+            self._data = np.roll(self._data, self.total_written % self.capacity)
+            return
+        start = self.total_written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        self.total_written += len(samples)
+
+    def latest(self, n: int, out: np.ndarray = None) -> np.ndarray:
+        """
+        가장 최근 n 개 샘플을 시간 순서대로 out(미리 할당된 배열)에 복사해서 돌려줍니다.
+        """
+        n = min(n, len(self))
+        if out is None:
+            out = np.empty(n, dtype=self._data.dtype)
+        end = self.total_written % self.capacity
+        start = end - n
+        if start >= 0:
+            out[:n] = self._data[start:end]
+        else:
+            out[:-start] = self._data[start:]
+            out[-start:n] = self._data[:end]
+        return out[:n]
+
+
+def merge_overlap(previous: str, current: str, max_words: int = 8) -> str:
+    """
+    겹치는 창(window)에서 중복 인식된 단어를 제거합니다.
+    previous 의 끝 k 단어와 current 의 앞 k 단어가 같으면 current 에서 그 부분을 뺍니다.
+    """
+    def norm(word):
+        return "".join(ch for ch in word.lower() if ch.isalnum())
+
+    prev_words = [norm(w) for w in previous.split()]
+    words = current.split()
+    cur_words = [norm(w) for w in words]
+    for k in range(min(max_words, len(prev_words), len(cur_words)), 0, -1):
+        if prev_words[-k:] == cur_words[:k]:
+            return " ".join(words[k:])
+    return current
+
+
+def stt_processing_thread():
+    global current_caption
+    window_size = int(samplerate * chunk_seconds)
+    hop_size = int(samplerate * window_hop_seconds)  # window_size - hop_size 만큼 겹침
+    ring = RingBuffer(samplerate * 5)
+    window = np.empty(window_size, dtype=np.float32)
+    next_window_end = window_size
+    last_text = ""
+    stop_detected = False  # 종료어가 이미 감지되었는지 여부
+
+    try:
+        while True:
+            try:
+                data = audio_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                ring.extend(data)
+                if ring.total_written < next_window_end:
+                    continue
+                next_window_end = ring.total_written + hop_size
+                ring.latest(window_size, out=window)
+
+                # 👉 Ignore very quiet sounds (for noise removal)
+                if np.abs(window).mean() < 0.01:
+                    last_text = ""
+                    continue
+                response = get_openai_client().audio.transcriptions.create(
+                    model="whisper-1",
+                    file=encode_wav(window),
+                    language="en"
+                )
+
+                window_text = response.text.strip()
+                text = merge_overlap(last_text, window_text)
+                last_text = window_text
+                # 👉 Ignore very short or meaningless texts
+                if not text:
+                    continue
+
+                with caption_lock:
+                    if not current_caption or text[0].isupper() or any(current_caption.endswith(p) for p in ['.', '!', '?', '。', '！', '？']):
+                        if current_caption:
+                            caption_history.append(current_caption)
+                        current_caption = text
+                    else:
+                        current_caption += " " + text
+
+                # 종료어를 확인하여 프로그램 종료
+                if exit_keyword.lower() in text.lower() and not stop_detected:
+                    stop_detected = True  # 종료어가 감지되었음을 기록
+                    print("\n🛑 Exit keyword detected. Shutting down...")
+                    with open("captions.txt", "w") as f:
+                        for caption in caption_history:
+                            f.write(caption + "\n")
+                        if exit_keyword.lower() not in current_caption.lower():
+                            f.write(current_caption + "\n")
+                    os._exit(0)
+
+                update_captions()
+            finally:
+                audio_queue.task_done()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    try:
+        clear_screen()
+
+        t1 = threading.Thread(target=audio_collection_thread)
+        t2 = threading.Thread(target=stt_processing_thread)
+
+        t1.daemon = True
+        t2.daemon = True
+
+        t1.start()
+        t2.start()
+
+        update_captions()
+
+        while True:
+            time.sleep(0.1)
+
+    except KeyboardInterrupt:
+        clear_screen()
+        print("\n🛑 Program is shutting down...")
+        time.sleep(0.5)
+        print("👋 Shutdown complete")
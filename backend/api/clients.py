@@ -0,0 +1,36 @@
+import os
+import threading
+
+# OpenAI 클라이언트는 처음 쓸 때 만듭니다. openai 패키지 import 와 API 키 확인도 그때 합니다
+# (서버 프로세스가 뜰 때나 키 없이 manage.py 명령을 돌릴 때 느려지거나 실패하지 않도록).
+_client = None
+_async_client = None
+_clients_lock = threading.Lock()
+
+
+def get_api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise EnvironmentError("Please set the OPENAI_API_KEY environment variable.")
+    return api_key
+
+
+def get_openai_client():
+    global _client
+    if _client is None:
+        with _clients_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=get_api_key())
+    return _client
+
+
+def get_async_openai_client():
+    global _async_client
+    if _async_client is None:
+        with _clients_lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI
+                # 서버(async) 경로의 재시도/헤지는 api/resilience.py 가 맡습니다.
+                _async_client = AsyncOpenAI(api_key=get_api_key(), max_retries=0)
+    return _async_client
@@ -0,0 +1,375 @@
+import random
+import re
+
+from .menu import MenuCatalog, contains_phrase, normalize
+from .order_state import OrderDraft, parse_update
+
+# 시스템 프롬프트의 고정 대사와 글자 하나까지 같게 유지합니다 (TTS 캐시 적중을 위해).
+ASK_MENU = "What menu item would you like?"
+ASK_NICKNAME = "Please tell me nickname of custom menu."
+NICKNAME_NOT_FOUND = "Sorry, I couldn't find that nickname. Please try again."
+ASK_TEMP = "Hot or Iced?"
+ASK_EXTRA = "Any extras?"
+ASK_SIZE = "What size?"
+ASK_ANYTHING_ELSE = "Anything else to add?"
+ASK_ETA = "How many minutes until your order arrives?"
+ASK_PAYMENT = "Would you like to proceed to payment?, If so say proceed to payment."
+THANK_YOU = "Thank you."
+
+PAYMENT_PATTERN = re.compile(r"\b(proceed to payment|proceed|confirm|go ahead|make the order|place the order|pay)\b", re.IGNORECASE)
+
+# Dialog steps
+MODE = "mode"
+MENU = "menu"
+NICKNAME = "nickname"
+NICKNAME_CONFIRM = "nickname_confirm"
+TEMP = "temp"
+EXTRA = "extra"
+SIZE = "size"
+ANYTHING_ELSE = "anything_else"
+ETA = "eta"
+PAYMENT = "payment"
+DONE = "done"
+
+TEMPERATURES = {
+    "Hot": ("hot", "warm"),
+    "Iced": ("iced", "ice", "cold"),
+}
+SIZES = {
+    "Short": ("short", "small"),
+    "Tall": ("tall",),
+    "Grande": ("grande", "grand", "medium"),
+    "Venti": ("venti", "venty", "large"),
+}
+NEGATIVE_PHRASES = (
+    "no", "nope", "none", "nothing", "no thanks", "no thank you", "that's it",
+    "thats it", "that is it", "that's all", "thats all", "that is all", "i'm good",
+    "im good", "no extras", "no extra", "nothing else", "not really",
+)
+AFFIRMATIVE_WORDS = ("yes", "yeah", "yep", "correct", "right", "sure", "ok", "okay", "exactly")
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18,
+    "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60,
+}
+
+# 각 단계에서 손님이 답한 뒤 보통 이어지는 에이전트 대사 (TTS 미리 합성용)
+NEXT_PROMPTS = {
+    MODE: (ASK_MENU, ASK_NICKNAME, ASK_TEMP),
+    MENU: (ASK_TEMP,),
+    NICKNAME: (NICKNAME_NOT_FOUND,),
+    NICKNAME_CONFIRM: (ASK_ETA,),
+    TEMP: (ASK_EXTRA,),
+    EXTRA: (ASK_SIZE,),
+    SIZE: (ASK_ANYTHING_ELSE,),
+    ANYTHING_ELSE: (ASK_ETA,),
+    ETA: (ASK_PAYMENT,),
+    PAYMENT: (THANK_YOU,),
+}
+
+# 업스트림 호출 우선순위 (작을수록 먼저, api/scheduler.py): 결제에 가까운 세션이 먼저 끝나도록 합니다.
+STEP_PRIORITY = {
+    PAYMENT: 0,
+    ETA: 1,
+    ANYTHING_ELSE: 2,
+    NICKNAME_CONFIRM: 2,
+    SIZE: 3,
+    EXTRA: 4,
+    TEMP: 5,
+    NICKNAME: 6,
+    MENU: 6,
+    MODE: 7,
+}
+
+# LLM 답변에서 어느 단계의 질문을 했는지 추정할 때 쓰는 표지
+REPLY_MARKERS = [
+    ("proceed to payment", PAYMENT),
+    ("how many minutes", ETA),
+    ("anything else", ANYTHING_ELSE),
+    ("what size", SIZE),
+    ("any extras", EXTRA),
+    ("hot or iced", TEMP),
+    ("is this correct", NICKNAME_CONFIRM),
+    ("nickname", NICKNAME),
+    ("which of these", MENU),
+    ("what menu item", MENU),
+]
+
+
+def match_choice(text: str, choices: dict):
+    """
+    choices = {정식 이름: (동의어, ...)} 중 정확히 하나만 언급됐을 때 그 이름을 돌려줍니다.
+    """
+    found = {name for name, words in choices.items() if any(contains_phrase(text, w) for w in words)}
+    return found.pop() if len(found) == 1 else None
+
+
+def is_negative(text: str) -> bool:
+    return text in NEGATIVE_PHRASES or text.startswith(("no ", "nothing ", "nope "))
+
+
+def is_affirmative(text: str) -> bool:
+    return any(contains_phrase(text, w) for w in AFFIRMATIVE_WORDS) and not text.startswith(("no", "not"))
+
+
+def parse_minutes(text: str):
+    m = re.search(r"\b(\d{1,3})\b", text)
+    if m:
+        return int(m.group(1))
+    total = 0
+    for word in text.split():
+        for part in word.split("-"):
+            total += NUMBER_WORDS.get(part, 0)
+    return total or None
+
+
+class OrderFlow:
+    """
+    고정된 주문 흐름(모드 → 메뉴 → Hot/Iced → 추가 옵션 → 사이즈 → 추가 주문 → 도착 시간 → 결제)을
+    로컬에서 처리하는 상태 머신. 상태는 대화 저장소에 들어가는 dict(state)에 그대로 보관합니다.
+
+    handle() 이 None 을 돌려주면 해석할 수 없는 발화이므로 LLM 으로 넘기고,
+    LLM 답변은 observe_reply() 로 넘겨 다음 단계를 맞춰 둡니다.
+    """
+
+    def __init__(self, state: dict, catalog: MenuCatalog):
+        self.state = state
+        self.state.setdefault("step", MODE)
+        self.state.setdefault("order", {})
+        self.catalog = catalog
+        self.extras = catalog.extras
+
+    @property
+    def step(self) -> str:
+        return self.state["step"]
+
+    @property
+    def order(self) -> dict:
+        return self.state["order"]
+
+    def draft(self) -> OrderDraft:
+        return OrderDraft(**self.order)
+
+    def handle(self, user_input: str):
+        """
+        예측 가능한 답변이면 주문 상태를 갱신하고 다음 질문을 돌려줍니다. 아니면 None.
+        결제 확인 발화는 메뉴가 정해져 있으면 여기서 처리합니다 (_checkout).
+        """
+        text = normalize(user_input)
+        if not text:
+            return None
+        if PAYMENT_PATTERN.search(user_input) and self.order.get("menu"):
+            return self._checkout(text)
+        return self._handle_step(text)
+
+    def apply_update(self, args: dict):
+        """
+        LLM 의 UpdateOrder 함수 호출 결과를 주문 상태에 반영합니다.
+        """
+        update = parse_update(args)
+        if "menu" in update and "price" not in update:
+            item = self.catalog.lookup(update["menu"])
+            if item:
+                update["menu"] = item["menu"]
+                update["price"] = item.get("price", 0)
+        self.order.update(update)
+
+    def observe_reply(self, reply: str, user_input: str = "") -> str:
+        """
+        LLM 이 대신 답한 경우, 답변 속 고정 질문을 보고 현재 단계를 맞춥니다.
+        답변이 비어 있으면(함수 호출만 한 경우) 다음 고정 질문으로 채워 돌려줍니다.
+        """
+        if PAYMENT_PATTERN.search(user_input) and self.step == PAYMENT and self.missing_field() is None:
+            return self._goto(DONE, THANK_YOU)
+        if not reply:
+            return self.next_prompt()
+        text = reply.lower()
+        for marker, step in REPLY_MARKERS:
+            if marker in text:
+                self.state["step"] = step
+                break
+        # LLM 이 메뉴/옵션을 받기 전에 결제를 물으면 결제 단계에서 빠져나올 수 없으므로,
+        # 빠진 항목의 고정 질문으로 되돌립니다.
+        missing = self.missing_field()
+        if missing and (self.step == PAYMENT or (self.step in (ANYTHING_ELSE, ETA) and missing[0] != ETA)):
+            return self.next_prompt()
+        return reply
+
+    def likely_replies(self) -> list:
+        """
+        손님이 지금 단계의 질문에 답했을 때 이어질 가능성이 큰 대사들.
+        """
+        replies = list(NEXT_PROMPTS.get(self.step, ()))
+        if self.step == NICKNAME:
+            replies += [f"{MenuCatalog.describe_saved(saved)}. Is this correct?" for saved in self.catalog.saved_menu]
+        return replies
+
+    def missing_field(self):
+        """
+        아직 비어 있는 항목 중 첫 번째의 (단계, 질문). 다 채워졌으면 None.
+        """
+        for key, step, prompt in (
+            ("menu", MENU, ASK_MENU),
+            ("temp", TEMP, ASK_TEMP),
+            ("extra", EXTRA, ASK_EXTRA),
+            ("size", SIZE, ASK_SIZE),
+            ("eta_minutes", ETA, ASK_ETA),
+        ):
+            if self.order.get(key) is None:
+                return step, prompt
+        return None
+
+    def next_prompt(self) -> str:
+        """
+        아직 비어 있는 항목 중 첫 번째를 묻는 고정 질문으로 이동합니다.
+        """
+        missing = self.missing_field()
+        return self._goto(*missing) if missing else self._goto(PAYMENT, ASK_PAYMENT)
+
+    def _checkout(self, text: str) -> str:
+        """
+        결제 확인은 결제 단계에서 모든 항목이 채워졌을 때만 마무리(step=DONE)합니다.
+        그 전에 결제 말이 나오면 ("10 minutes, then pay") 지금 질문의 답으로 먼저 받아 보고,
+        빠진 항목(Hot/Iced, 추가 옵션, 사이즈, 도착 시간)을 차례로 묻습니다.
+        """
+        reply = None
+        if self.step != PAYMENT:
+            reply = self._handle_step(text)
+        if self.step == PAYMENT and self.missing_field() is None:
+            return self._goto(DONE, THANK_YOU)
+        return reply or self.next_prompt()
+
+    def _handle_step(self, text: str):
+        handler = getattr(self, f"_handle_{self.step}", None)
+        return handler(text) if handler else None
+
+    def _goto(self, step: str, reply: str) -> str:
+        self.state["step"] = step
+        return reply
+
+    def _select_menu(self, item: dict, text: str) -> str:
+        """
+        "iced vanilla latte, grande" 처럼 메뉴와 함께 말한 옵션도 받고, 남은 옵션만 묻습니다.
+        메뉴 이름의 단어("Cold Brew" 의 cold, "Vanilla Latte" 의 vanilla)는 옵션으로 보지 않습니다.
+        """
+        self.order.update({"menu": item["menu"], "price": item.get("price", 0)})
+        for word in normalize(item["menu"]).split():
+            text = re.sub(rf"\b{re.escape(word)}\b", " ", text)
+        temp, size, extras = match_choice(text, TEMPERATURES), match_choice(text, SIZES), self._match_extras(text)
+        if temp:
+            self.order["temp"] = temp
+        if size:
+            self.order["size"] = size
+        if extras:
+            self.order["extra"] = ", ".join(extras)
+        return self._next_option()
+
+    def _next_option(self) -> str:
+        """
+        메뉴의 옵션(Hot/Iced → 추가 옵션 → 사이즈) 중 아직 답하지 않은 것을 묻고, 다 받았으면 추가 주문을 묻습니다.
+        """
+        for key, step, prompt in (("temp", TEMP, ASK_TEMP), ("extra", EXTRA, ASK_EXTRA), ("size", SIZE, ASK_SIZE)):
+            if self.order.get(key) is None:
+                return self._goto(step, prompt)
+        return self._goto(ANYTHING_ELSE, ASK_ANYTHING_ELSE)
+
+    def _handle_mode(self, text: str):
+        saved = self.catalog.match_nickname(text)
+        if saved:
+            return self._select_saved(saved)
+        if "nickname" in text or "saved" in text or "custom" in text:
+            return self._goto(NICKNAME, ASK_NICKNAME)
+        if "recommend" in text:
+            favorites = self.catalog.favorite_drinks
+            picks = random.sample(favorites, min(3, len(favorites)))
+            if not picks:
+                return None
+            names = ", ".join(picks[:-1]) + (f" and {picks[-1]}" if len(picks) > 1 else picks[-1])
+            return self._goto(MENU, f"I recommend {names}. Which of these would you like?")
+        item = self.catalog.match_menu(text)
+        if item:
+            return self._select_menu(item, text)
+        if "normal" in text or "order" in text or "menu" in text:
+            return self._goto(MENU, ASK_MENU)
+        return None
+
+    def _handle_menu(self, text: str):
+        item = self.catalog.match_menu(text)
+        return self._select_menu(item, text) if item else None
+
+    def _handle_nickname(self, text: str):
+        # 못 찾으면 LLM 으로 넘깁니다: "the one with oat milk" 처럼 별명 대신 내용을 말하거나,
+        # 일반 주문으로 바꾸는 말일 수도 있습니다 (정말 없는 별명이면 LLM 이 NICKNAME_NOT_FOUND 로 답함).
+        saved = self.catalog.match_nickname(text)
+        return self._select_saved(saved) if saved else None
+
+    def _select_saved(self, saved: dict) -> str:
+        self.order.update({k: saved.get(k, "") for k in ("menu", "temp", "size", "extra", "price")})
+        return self._goto(NICKNAME_CONFIRM, f"{MenuCatalog.describe_saved(saved)}. Is this correct?")
+
+    def _handle_nickname_confirm(self, text: str):
+        if is_affirmative(text):
+            return self._goto(ETA, ASK_ETA)
+        return None
+
+    def _handle_temp(self, text: str):
+        temp = match_choice(text, TEMPERATURES)
+        if not temp:
+            return None
+        self.order["temp"] = temp
+        return self._next_option()
+
+    def _handle_extra(self, text: str):
+        if is_negative(text):
+            self.order["extra"] = ""
+            return self._next_option()
+        found = self._match_extras(text)
+        if not found:
+            return None
+        self.order["extra"] = ", ".join(found)
+        return self._next_option()
+
+    def _match_extras(self, text: str) -> list:
+        count_pattern = rf"(?:\b(\d+|{'|'.join(NUMBER_WORDS)})\s+)?(?:extra\s+)?"
+
+        def search(phrase):
+            return re.search(rf"{count_pattern}\b{re.escape(phrase)}s?\b", text)
+
+        text = re.sub(r"\bshots? of espresso\b", "espresso shots", text)
+        found = []
+        heads = {}
+        for extra in self.extras:
+            heads.setdefault(normalize(extra).split()[0], []).append(extra)
+        for extra in self.extras:
+            m = search(normalize(extra))
+            if m is None:
+                # "vanilla" 처럼 앞 단어만 말해도, 그 단어로 시작하는 옵션이 하나뿐이면 인정
+                head = normalize(extra).split()[0]
+                if len(heads[head]) != 1:
+                    continue
+                m = search(head)
+            if m:
+                found.append(f"{m.group(1)} {extra}" if m.group(1) else extra)
+                text = f"{text[:m.start()]} {text[m.end():]}"
+        return found
+
+    def _handle_size(self, text: str):
+        size = match_choice(text, SIZES)
+        if not size:
+            return None
+        self.order["size"] = size
+        return self._next_option()
+
+    def _handle_anything_else(self, text: str):
+        if is_negative(text):
+            return self._goto(ETA, ASK_ETA)
+        return None
+
+    def _handle_eta(self, text: str):
+        minutes = parse_minutes(text)
+        if minutes is None:
+            return None
+        self.order["eta_minutes"] = minutes
+        return self._goto(PAYMENT, ASK_PAYMENT)
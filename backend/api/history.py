@@ -0,0 +1,89 @@
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from langchain_core.messages import HumanMessage
+
+from .metrics import PROMPT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# OpenAI chat 형식에서 메시지 하나마다 붙는 고정 토큰 (role, 구분자)
+MESSAGE_OVERHEAD = 4
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """
+    tiktoken 인코딩 (처음 한 번만 로드). BPE 파일을 받을 수 없는 환경이면 False 를 돌려주고
+    글자 수 기반 추정으로 대신합니다.
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.encoding_for_model(settings.CHAT_HISTORY["MODEL"])
+                except Exception as e:
+                    logger.warning(f"⚠️ tiktoken unavailable, estimating tokens from length: {e}")
+                    _encoding = False
+    return _encoding
+
+
+@lru_cache(maxsize=4096)
+def count_text_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def count_tokens(message) -> int:
+    return count_text_tokens(str(message.content)) + MESSAGE_OVERHEAD
+
+
+def count_prompt_tokens(messages: list) -> int:
+    return sum(count_tokens(m) for m in messages) + 3  # 응답 시작 프라이밍
+
+
+def compact_history(messages: list, max_tokens: int = None, min_turns: int = None) -> list:
+    """
+    대화 기록 중 토큰 예산(max_tokens) 안에 들어가는 최근 턴만 남깁니다.
+
+    오래된 턴은 버리고, 그 내용은 매 호출마다 붙는 주문 상태 요약("Current order state")이
+    대신합니다. 잘라내는 위치는 항상 사용자 발화(HumanMessage) 앞이고,
+    예산을 넘더라도 최근 min_turns 턴은 남깁니다.
+    """
+    config = settings.CHAT_HISTORY
+    max_tokens = config["MAX_TOKENS"] if max_tokens is None else max_tokens
+    min_turns = config["MIN_TURNS"] if min_turns is None else min_turns
+
+    start = len(messages)
+    used = 0
+    turns = 0
+    for i in range(len(messages) - 1, -1, -1):
+        used += count_tokens(messages[i])
+        if not isinstance(messages[i], HumanMessage):
+            continue
+        turns += 1
+        if used > max_tokens and turns > min_turns:
+            break
+        start = i
+    return messages[start:]
+
+
+def build_prompt(system_message, messages: list, context_message) -> list:
+    """
+    [고정 시스템 프롬프트] + [예산 안의 최근 대화] + [이번 턴 요약/후보].
+    시스템 프롬프트를 항상 맨 앞에 같은 내용으로 두어 provider 쪽 prompt caching 이 적용되게 하고,
+    매 턴 바뀌는 주문 상태는 맨 뒤에 붙입니다.
+    """
+    prompt = [system_message, *compact_history(messages), context_message]
+    tokens = count_prompt_tokens(prompt)
+    PROMPT_TOKENS.observe(tokens)
+    logger.info(f"🧮 Prompt tokens: {tokens} ({len(prompt) - 2}/{len(messages)} history messages)")
+    return prompt
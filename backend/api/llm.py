@@ -1,220 +1,244 @@
 import os
-import re
+import logging
+import asyncio
 import json
-import uuid
+import threading
+import time
 from datetime import datetime, timedelta
+from asgiref.sync import async_to_sync
 from django.conf import settings
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage, AIMessage
-from tqdm import tqdm
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
-from urllib.parse import quote_plus
-import certifi
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from zoneinfo import ZoneInfo
+from .metrics import DIALOG_TURNS, RESILIENCE_EVENTS, record_token_usage, timed
+from .orders import get_order_feed
+from .outbox import get_order_outbox
+from .sessions import Conversation, get_conversation_store
+from .dialog import DONE, MODE, STEP_PRIORITY, OrderFlow, normalize
+from .history import build_prompt, compact_history, count_prompt_tokens
+from .prefetch import prefetch_replies
+from .resilience import deadline, guarded
+from .scheduler import Overloaded
+from .profiles import Profile, get_default_profile
+from .order_state import OrderDraft, UpdateOrder
+
+logger = logging.getLogger(__name__)
 
 # 1. ENV & MODEL SETUP
-chat_model = ChatOpenAI(model="gpt-4o-mini")
-
-# 2. LOAD user_info.json
-with open("user_info.json", "r", encoding="utf-8") as f:
-    user_info = json.load(f)
-
-customer_name   = user_info["name"]
-customer_age    = user_info["age"]
-customer_number = user_info["phone_number"]
-favorite_drinks = user_info.get("favorite_drinks", [])
-saved_menu      = user_info.get("saved_menu", [])
-total_menu      = user_info.get("total_menu", [])
-
-# 3. SYSTEM PROMPT
-system_prompt = f"""
-You are a Starbucks voice-ordering agent. Follow this flow and respond only in English:
-
-1) Ask if the customer wants:
-   - a menu recommendation,
-   - a normal menu order,
-   - to order from a saved nickname.
-   - Depending on the response, proceed with one of the following:
-
-   If recommendation:
-   • Recommend randomly at least 3 from favorite_drinks: {favorite_drinks}
-   • Ask: “Which of these would you like?”
-   • Wait for the user's response before proceeding.
-
-   If saved nickname:
-   • Ask: “Please tell me nickname of custom menu.”
-   • Match against saved_menu on the “nickname” field: {saved_menu}
-   • If no match, say: “Sorry, I couldn't find that nickname. Please try again.”
-   • If matched, confirm menu, size, extra, and price by asking: “Is this correct?”
-   • Wait for the user's response before proceeding.
-
-   If normal order:
-   • Ask: “What menu item would you like?” (from total_menu: {total_menu})
-   • Wait for the user's response before proceeding.
-
-   Then, in two cases except nickname ordering, follow this fixed sequence of questions:
-   • Ask: “Hot or Iced?”
-   • Wait for the user's response.
-   • Ask: “Any extras?”
-   • Wait for the user's response.
-   • Ask: “What size?”
-   • Wait for the user's response.
-   • Ask: “Anything else to add?”
-   • Wait for the user's response.
-
-2) After the menu selecting, ask: "How many minutes until your order arrives?"
-
-3) At the end of ordering, always ask: “Would you like to proceed to payment?, If so say proceed to payment.”
-
-4) At payment confirmation (“proceed to payment” etc.),
-   • Use the conversation context to extract the latest menu, size, extras mentioned by the user.
-   • Compute ETA as the current time plus the customer’s response in minutes. Format as HH:MM in 24-hour format.
-   • Build a JSON object with:
-     {{
-       "customer": "{customer_name}",
-       "number": "{customer_number}",
-       "menu": <extracted>,
-       "temp": <extracted>,
-       "size": <extracted>,
-       "extra": <extracted>,
-       "price": <extracted>,
-       "ETA": "<HH:MM>"
-     }}
-   • Save it to final_order.json
-   • Do not display or speak the contents of final_order.json under any circumstances.
-
-5) After saving the final order:
-   • Always say: “Thank you.” 
-"""
-
-# Message history
-messages = [SystemMessage(content=system_prompt)]
-
-
-def process_and_upload_to_mongodb(document: dict):
+# langchain_openai import 와 모델 생성은 무거우므로 처음 쓸 때 한 번만 합니다.
+_order_model = None
+_order_model_lock = threading.Lock()
+
+
+def get_order_model():
+    global _order_model
+    if _order_model is None:
+        with _order_model_lock:
+            if _order_model is None:
+                from langchain_openai import ChatOpenAI
+                from .clients import get_api_key
+                # stream_usage: 스트리밍 호출에서도 토큰 사용량(usage_metadata)을 받습니다.
+                # 재시도/헤지는 api/resilience.py 가 맡으므로 클라이언트 자체 재시도는 끕니다.
+                chat_model = ChatOpenAI(model="gpt-4o-mini", api_key=get_api_key(), stream_usage=True,
+                                        timeout=deadline("llm"), max_retries=0)
+                # 주문 항목은 UpdateOrder 함수 호출로 매 턴 구조화해서 받습니다.
+                _order_model = chat_model.bind_tools([UpdateOrder])
+    return _order_model
+
+# 2. CUSTOMER PROFILES
+# 고객 정보(user_info)와 고객별 시스템 프롬프트·메뉴 색인은 api/profiles.py 가 만들어 캐시합니다.
+# 요청마다 Profile 을 넘기고, 넘기지 않으면 기본 고객(PROFILE_STORE["DEFAULT"])을 씁니다.
+
+# Message history (세션별로 api/sessions.py 저장소에 보관)
+DEFAULT_SESSION_ID = "default"
+# 답변 + 함수 호출의 예상 출력 토큰 (스케줄러 TPM 예산에 프롬프트 토큰과 함께 잡음)
+REPLY_TOKEN_ESTIMATE = 150
+
+
+def load_conversation(session_id: str) -> Conversation:
+    # 시스템 프롬프트는 저장하지 않고 호출할 때 Profile 의 것을 앞에 붙입니다.
+    conversation = get_conversation_store().load(session_id)
+    if conversation is None:
+        conversation = Conversation()
+    return conversation
+
+
+def session_priority(session_id: str) -> int:
     """
-    document에 '_id'가 없으면 ObjectId를 생성해서 추가한 뒤,
-    order.order_list 컬렉션에 upsert합니다.
+    세션의 주문 단계로 정한 업스트림 우선순위 (결제에 가까울수록 먼저 처리, api/scheduler.py).
     """
-    # MongoDB 접속 정보
-    username = quote_plus("justintak0426")
-    password = quote_plus("b3fQp24yJubBo9rm")
-    cluster = "llm-project.5t4zx.mongodb.net"
-    database = "order"
-    collection_name = "order_list"
-
-    uri = (
-        f"mongodb+srv://{username}:{password}"
-        f"@{cluster}/{database}"
-        "?retryWrites=true&w=majority&appName=llm-project"
-    )
-
-    # document에 _id가 없으면 uuid4 기반 문자열 생성
-    if "_id" not in document:
-        document["_id"] = uuid.uuid4().hex  # 예: '3fa85f64f5d14f6e9e4adf81c1f1c6b2'
-
-
-    # MongoClient 생성 (SSL 인증서 문제 방지를 위해 certifi 사용)
-    client = MongoClient(
-        uri,
-        tls=True,
-        tlsCAFile=certifi.where(),
-        server_api=ServerApi("1")
-    )
-
-    try:
-        print("Connecting to MongoDB...")
-        # 연결 확인
-        client.admin.command("ping")
-        print("Pinged your deployment. You successfully connected to MongoDB!")
-
-        db = client[database]
-        collection = db[collection_name]
-
-        # Upsert
-        print(f"Upserting document with _id={document['_id']}...")
-        result = collection.update_one(
-            {"_id": document["_id"]},
-            {"$set": document},
-            upsert=True
-        )
-
-        if result.upserted_id:
-            print(f"Inserted new document, _id={result.upserted_id}")
-        else:
-            print(f"Updated existing document, _id={document['_id']}")
-
-    except Exception as e:
-        print(f"MongoDB 오류 발생: {e}")
-        raise
-    finally:
-        if client:
-            client.close()
-            print("MongoDB connection closed")
-
-
-def order_agent(user_input: str) -> tuple:
+    conversation = get_conversation_store().load(session_id) if session_id else None
+    step = conversation.state.get("flow", {}).get("step", MODE) if conversation is not None else MODE
+    return STEP_PRIORITY.get(step, STEP_PRIORITY[MODE])
+
+
+def llm_tokens(prompt: list) -> int:
+    return count_prompt_tokens(prompt) + REPLY_TOKEN_ESTIMATE
+
+
+def order_flow(conversation: Conversation, profile: Profile) -> OrderFlow:
+    return OrderFlow(conversation.state.setdefault("flow", {}), profile.catalog)
+
+
+def local_reply(flow: OrderFlow, user_input: str):
     """
-    Returns (reply, done_flag). When done_flag=True, final_order.json has been written.
+    고정 흐름 안의 예측 가능한 답변이면 LLM 호출 없이 다음 질문을 돌려줍니다.
     """
-    global eta_minutes
+    reply = flow.handle(user_input)
+    if reply is not None:
+        DIALOG_TURNS.inc("local")
+        logger.info(f"⚡ Local dialog step -> {flow.step}")
+    return reply
+
+
+def with_order_context(profile: Profile, messages: list, flow: OrderFlow, user_input: str = "") -> list:
+    """
+    고객의 시스템 프롬프트 뒤에 토큰 예산 안의 최근 대화를 붙이고, 현재 주문 상태와 발화에 맞는
+    메뉴 후보를 이번 호출에만 덧붙입니다 (대화 기록에는 저장하지 않음).
+    """
+    state = flow.draft().model_dump_json()
+    menu = flow.catalog.prompt_context(normalize(user_input))
+    context = SystemMessage(content=f"Current order state: {state}\n{menu}")
+    return build_prompt(profile.system_message, messages, context)
+
+
+def apply_llm_response(flow: OrderFlow, ai_resp, user_input: str) -> str:
+    DIALOG_TURNS.inc("llm")
+    record_token_usage(ai_resp)
+    for call in ai_resp.tool_calls:
+        if call["name"] == UpdateOrder.__name__:
+            flow.apply_update(call["args"])
+    return flow.observe_reply(ai_resp.content.strip(), user_input)
+
+
+class StreamClaimed(Exception):
+    """헤지된 다른 요청이 먼저 텍스트를 내보내기 시작함."""
 
-    messages.append(HumanMessage(content=user_input))
-    ai_resp = chat_model.invoke(messages)
-    reply = ai_resp.content.strip()
-    messages.append(AIMessage(content=reply))
 
-    # detect payment confirmation in user_input
-    if re.search(r"\b(proceed to payment|proceed|confirm|go ahead|make the order|place the order|pay)\b", user_input, re.IGNORECASE):
-        messages.append(HumanMessage(content="How many minutes until your order arrives?"))
-        eta_reply = chat_model.invoke(messages).content.strip()
-        messages.append(AIMessage(content=eta_reply))
+async def astream_order_model(prompt: list, on_text, tokens: int = 0):
+    """
+    order_model 을 스트리밍으로 호출하면서 텍스트 조각마다 on_text(delta) 를 부르고,
+    합친 응답(함수 호출 포함)을 돌려줍니다. 헤지로 요청이 둘이면 먼저 텍스트를 내보낸 쪽만 흘려보내고,
+    텍스트를 내보내기 시작한 뒤에는 재시도하지 않습니다.
+    """
+    owner = []
+
+    async def attempt():
+        me = object()
+        ai_resp = None
+        async for chunk in get_order_model().astream(prompt):
+            ai_resp = chunk if ai_resp is None else ai_resp + chunk
+            if chunk.content:
+                if not owner:
+                    owner.append(me)
+                if owner[0] is not me:
+                    raise StreamClaimed()
+                on_text(chunk.content)
+        return ai_resp
+
+    return await guarded("llm", attempt, can_retry=lambda: not owner, tokens=tokens)
 
-        m = re.search(r"(\d+)", eta_reply)
-        minutes = int(m.group(1)) if m else 10
 
-        extract_prompt = (
-            "From our conversation, extract only the final order details "
-            "and return a raw JSON object with keys: menu, size, temp, extra, price. No explanation."
-        )
-        messages.append(SystemMessage(content=extract_prompt))
-        extract_resp = chat_model.invoke(messages).content.strip()
-        messages.append(AIMessage(content=extract_resp))
+def finalize_order(draft: OrderDraft, profile: Profile) -> dict:
+    """
+    Build the final order from the tracked order state, hand it to the order outbox
+    (flushed to MongoDB in the background), announce it to the order feed and
+    write media/final_order.json.
+    """
+    minutes = draft.eta_minutes if draft.eta_minutes is not None else 10
+    now = datetime.now(ZoneInfo("Asia/Seoul"))
+    eta_at = now + timedelta(minutes=minutes)
+    eta_time = eta_at.strftime("%H:%M")
+    logger.info(f"Current Time: {now} | ETA Minutes: {minutes} | ETA Time: {eta_time}")
+
+    final_order = {
+        "customer": profile.name,
+        "number": profile.phone_number,
+        "menu": draft.menu,
+        "size": draft.size,
+        "temp": draft.temp,
+        "extra": draft.extra,
+        "price": draft.price,
+        "ETA": eta_time,
+        # 주문 대기열 API(api/orders.py)용: 상태, 정렬/색인용 전체 시각, 변경 감지용 타임스탬프
+        "status": "pending",
+        "eta_at": eta_at.isoformat(timespec="seconds"),
+        "created_at": now.isoformat(timespec="seconds"),
+        "updated_at": time.time(),
+    }
+
+    # MongoDB 업로드는 outbox 가 백그라운드에서 배치로 처리합니다.
+    with timed("outbox_enqueue"):
+        get_order_outbox().enqueue(final_order)
+    get_order_feed().publish(final_order)
+    final_order_path = os.path.join(settings.MEDIA_ROOT, "final_order.json")
+    with timed("final_order_write"), open(final_order_path, "w", encoding="utf-8") as f:
+        json.dump(final_order, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"✅ final_order.json created:\n{json.dumps(final_order, indent=2, ensure_ascii=False)}")
+    return final_order
+
+
+async def aorder_agent(user_input: str, session_id: str = DEFAULT_SESSION_ID, profile: Profile = None,
+                       on_text=None, on_final=None) -> tuple:
+    """
+    Returns (reply, done_flag). When done_flag=True, the order has been finalized
+    (outbox + media/final_order.json). The conversation for session_id is loaded from and
+    saved back to the conversation store; it is dropped once the order is finalized so the
+    next customer starts fresh. profile selects the customer (menus, saved nicknames, prompt);
+    None means the default customer. The finalization file work runs in a worker thread.
+    With on_text, the LLM reply is streamed and on_text(delta) is called as text arrives
+    (the returned reply can still differ, e.g. a fixed prompt after a function-call-only turn).
+    With on_final, on_final(final_order) is called with the finalized order document.
+    """
+    profile = profile or get_default_profile()
+    store = get_conversation_store()
+    conversation = load_conversation(session_id)
+    messages = conversation.messages
+    flow = order_flow(conversation, profile)
 
-        # 👇 JSON 안전하게 파싱
+    messages.append(HumanMessage(content=user_input))
+    reply = local_reply(flow, user_input)
+    if reply is None:
+        prompt = with_order_context(profile, messages, flow, user_input)
+        tokens = llm_tokens(prompt)
         try:
-            json_text = re.search(r"\{.*\}", extract_resp, re.DOTALL).group(0)
-            details = json.loads(json_text)
+            with timed("llm"):
+                if on_text is None:
+                    ai_resp = await guarded("llm", lambda: get_order_model().ainvoke(prompt), tokens=tokens)
+                else:
+                    ai_resp = await astream_order_model(prompt, on_text, tokens)
+            reply = apply_llm_response(flow, ai_resp, user_input)
+        except Overloaded:
+            # 429 로 돌려보내므로 이번 발화는 대화에 남기지 않습니다 (손님이 다시 말함).
+            messages.pop()
+            raise
         except Exception as e:
-            print("❌ Failed to extract JSON:", e)
-            return reply, False
-
-        print("Current Time: ", datetime.now(ZoneInfo("Asia/Seoul")))
-        print("ETA Minutes: ", minutes)
-        eta_time = (datetime.now(ZoneInfo("Asia/Seoul")) + timedelta(minutes=minutes)).strftime("%H:%M")
-        print("ETA Time: ", eta_time)
-
-
-        final_order = {
-            "customer": customer_name,
-            "number": customer_number,
-            "menu": details.get("menu", ""),
-            "size": details.get("size", ""),
-            "temp": details.get("temp", ""),
-            "extra": details.get("extra", ""),
-            "price": details.get("price", 0),
-            "ETA": eta_time
-        }
-
-        process_and_upload_to_mongodb(final_order)
-        final_order_path = os.path.join(settings.MEDIA_ROOT, "final_order.json")
-        with open(final_order_path, "w", encoding="utf-8") as f:
-            json.dump(final_order, f, ensure_ascii=False, indent=2)
-
-        print("✅ final_order.json created:\n", json.dumps(final_order, indent=2))
+            # LLM 이 느리거나 죽어 있으면 기다리지 않고 다음 고정 질문으로 대화를 이어 갑니다.
+            logger.error(f"❌ LLM unavailable, falling back to scripted prompt: {e}")
+            RESILIENCE_EVENTS.inc("llm", "fallback")
+            reply = flow.next_prompt()
+    messages.append(AIMessage(content=reply))
+
+    if flow.step == DONE:
+        final_order = await asyncio.to_thread(finalize_order, flow.draft(), profile)
+        store.delete(session_id)
+        prefetch_replies(session_id, [])
+        if on_final is not None:
+            on_final(final_order)
         return reply, True
-    
-    print(f"🤖 LLM reply: {reply}")
 
-    return reply, False
\ No newline at end of file
+    logger.info(f"🤖 LLM reply: {reply}")
+    # 다시 보내지 않을 오래된 턴은 저장하지도 않습니다.
+    conversation.messages = compact_history(messages)
+    store.save(session_id, conversation)
+    # 다음 턴에 나올 고정 대사를 미리 합성해 둡니다 (예상이 바뀌면 이전 예상은 취소).
+    prefetch_replies(session_id, flow.likely_replies())
+
+    return reply, False
+
+
+def order_agent(user_input: str, session_id: str = DEFAULT_SESSION_ID, profile: Profile = None) -> tuple:
+    """
+    Sync entry point for scripts and the Django shell: runs aorder_agent on its own event loop.
+    """
+    return async_to_sync(aorder_agent)(user_input, session_id=session_id, profile=profile)
@@ -0,0 +1,28 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+_listener = None
+
+
+def setup_queue_logging(level: int = logging.INFO):
+    """
+    'api' 로거를 큐 기반으로 설정합니다. 요청 처리 스레드/이벤트 루프는 큐에 넣기만 하고,
+    실제 출력(stderr)은 QueueListener 스레드가 합니다.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger = logging.getLogger("api")
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(level)
+    logger.propagate = False
@@ -0,0 +1,245 @@
+"""
+녹음해 둔 음성 주문을 STT → aorder_agent → TTS 파이프라인에 동시에 흘려보내는 배치 리플레이.
+용량 계획과 워커 수에 따른 처리량 확인용입니다.
+
+    python manage.py replay_orders recordings/ --workers 4 --output replay.json
+    python manage.py replay_orders manifest.jsonl --workers 1 2 4 8     # 워커 수별 처리량 비교
+
+입력:
+- 디렉토리: 하위 디렉토리 하나가 세션 하나, 그 안의 음성 파일을 이름 순서대로 한 턴씩 재생
+- JSONL manifest: {"session": "s1", "audio": "s1/01.wav", "customer": "..."} 를 한 줄에 한 턴씩
+  (audio 경로는 manifest 기준 상대 경로, customer 는 선택)
+
+각 세션은 실행마다 새 session_id 를 쓰므로 대화 상태가 서로 섞이지 않습니다.
+--commit-orders 를 주지 않으면 확정된 주문은 결과 파일에만 남고 MongoDB 로 보내지 않습니다.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import outbox, prefetch, scheduler, tts as tts_module
+from api.llm import aorder_agent
+from api.metrics import LatencyRecorder, format_report
+from api.pipeline import SpeechPipeline
+from api.profiles import get_profile
+from api.stt import alisten_and_transcribe, apreprocess_audio
+from api.views import REPEAT_TEXT
+
+AUDIO_SUFFIXES = {".wav", ".webm", ".mp3", ".m4a", ".ogg", ".flac"}
+
+
+class ReplayOutbox(outbox.OrderOutbox):
+    """
+    주문을 로컬 outbox 에만 기록하고 MongoDB 로는 보내지 않습니다.
+    """
+
+    def start(self):
+        pass
+
+
+def load_sessions(source: Path) -> "OrderedDict[str, dict]":
+    """
+    {session: {"customer": str | None, "clips": [Path, ...]}}
+    """
+    sessions = OrderedDict()
+    if source.is_dir():
+        for directory in sorted(p for p in source.iterdir() if p.is_dir()):
+            clips = sorted(p for p in directory.iterdir() if p.suffix.lower() in AUDIO_SUFFIXES)
+            if clips:
+                sessions[directory.name] = {"customer": None, "clips": clips}
+        return sessions
+
+    with open(source, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                session = sessions.setdefault(str(entry["session"]), {"customer": None, "clips": []})
+                session["clips"].append(source.parent / entry["audio"])
+            except (ValueError, KeyError) as e:
+                raise CommandError(f"{source}:{number}: invalid manifest line ({e})")
+            session["customer"] = entry.get("customer") or session["customer"]
+    return sessions
+
+
+async def replay_turn(session_id: str, profile, clip: Path, recorder: LatencyRecorder, tts: bool) -> dict:
+    """
+    STTProcessView 와 같은 순서로 한 턴을 처리하고 단계별 소요 시간을 기록합니다.
+    """
+    timings = {}
+
+    def mark(stage: str, start: float):
+        timings[stage] = time.perf_counter() - start
+        recorder.add(f"stage:{stage}", timings[stage])
+
+    turn_start = start = time.perf_counter()
+    data = await asyncio.to_thread(clip.read_bytes)
+    audio = await apreprocess_audio(data)
+    mark("preprocess", start)
+
+    text = ""
+    if audio is not None:
+        start = time.perf_counter()
+        text = await alisten_and_transcribe(audio)
+        mark("stt", start)
+
+    pipeline = SpeechPipeline()
+    final_order = None
+    if not text:
+        reply, final_flag = REPEAT_TEXT, False
+    else:
+        def on_final(order):
+            nonlocal final_order
+            final_order = order
+
+        start = time.perf_counter()
+        try:
+            reply, final_flag = await aorder_agent(
+                text, session_id=session_id, profile=profile,
+                on_text=pipeline.feed if tts else None, on_final=on_final,
+            )
+        except Exception:
+            pipeline.cancel()
+            raise
+        mark("llm", start)
+
+    audio_bytes = 0
+    if tts:
+        pipeline.finish(reply)
+        start = time.perf_counter()
+        audio_bytes = len(await pipeline.read_all())
+        mark("tts_wait", start)
+    mark("turn", turn_start)
+
+    return {
+        "audio": str(clip),
+        "transcript": text,
+        "reply": reply,
+        "final": final_flag,
+        "final_order": final_order,
+        "audio_bytes": audio_bytes,
+        "timings": timings,
+    }
+
+
+async def replay_session(name: str, session: dict, run_id: str, recorder: LatencyRecorder, tts: bool) -> dict:
+    result = {"session": name, "customer": session["customer"], "turns": [], "final_order": None, "error": None}
+    profile = get_profile(session["customer"])
+    if profile is None:
+        result["error"] = f"Unknown customer: {session['customer']}"
+        recorder.errors["session"] += 1
+        return result
+
+    session_id = f"replay-{run_id}-{name}"
+    for clip in session["clips"]:
+        try:
+            turn = await replay_turn(session_id, profile, clip, recorder, tts)
+        except Exception as e:
+            result["error"] = f"{clip}: {e!r}"
+            recorder.errors["turn"] += 1
+            break
+        result["turns"].append(turn)
+        if turn["final"]:
+            result["final_order"] = turn["final_order"]
+            break
+    return result
+
+
+async def replay(sessions: dict, workers: int, recorder: LatencyRecorder, tts: bool) -> tuple:
+    run_id = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(workers)
+
+    async def bounded(name, session):
+        async with semaphore:
+            return await replay_session(name, session, run_id, recorder, tts)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(bounded(name, session) for name, session in sessions.items()))
+    return results, time.perf_counter() - start
+
+
+def reset_tts_state(cache_dir: str):
+    """
+    워커 수별 실행마다 빈 TTS 캐시, 새 미리 합성 풀, 가득 찬 스케줄러 버킷으로 시작합니다.
+    앞 실행이 채운 캐시를 뒤 실행이 그대로 쓰면 처리량이 워커 수가 아니라 캐시 적중률을 재게 됩니다.
+    """
+    if prefetch._prefetcher is not None:
+        prefetch._prefetcher._executor.shutdown(wait=True, cancel_futures=True)
+        prefetch._prefetcher = None
+    settings.TTS_CACHE = {**settings.TTS_CACHE, "DIR": cache_dir}
+    tts_module._tts_cache = None
+    scheduler._schedulers.clear()
+
+
+class Command(BaseCommand):
+    help = "Replay recorded voice orders through STT → order agent → TTS concurrently and report per-stage timings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="directory of per-session subdirectories, or a JSONL manifest")
+        parser.add_argument("--workers", type=int, nargs="+", default=[4],
+                            help="concurrent sessions; several values run one replay per value")
+        parser.add_argument("--output", default="replay_results.json", help="results file (JSON)")
+        parser.add_argument("--no-tts", action="store_true", help="skip speech synthesis of the replies")
+        parser.add_argument("--commit-orders", action="store_true",
+                            help="send finalized orders to MongoDB instead of keeping them in the results only")
+
+    async def replay_all(self, sessions: dict, worker_counts: list, tts: bool, workdir: str) -> list:
+        runs = []
+        for number, workers in enumerate(worker_counts):
+            await asyncio.to_thread(reset_tts_state, os.path.join(workdir, f"tts_cache-{number}"))
+            recorder = LatencyRecorder()
+            results, wall = await replay(sessions, workers, recorder, tts)
+            report = recorder.report(wall, sum(len(r["turns"]) for r in results))
+            report["workers"] = workers
+            report["sessions"] = len(results)
+            report["completed_orders"] = sum(1 for r in results if r["final_order"])
+            self.stdout.write(f"\n=== workers: {workers} ===")
+            self.stdout.write(format_report(report))
+            runs.append({"summary": report, "sessions": results})
+        return runs
+
+    def handle(self, *args, **options):
+        source = Path(options["source"])
+        if not source.exists():
+            raise CommandError(f"{source} does not exist")
+        sessions = load_sessions(source)
+        if not sessions:
+            raise CommandError(f"No recorded sessions found in {source}")
+        if any(w < 1 for w in options["workers"]):
+            raise CommandError("--workers must be at least 1")
+        tts = not options["no_tts"]
+        turns = sum(len(s["clips"]) for s in sessions.values())
+        self.stdout.write(f"▶️ {len(sessions)} sessions, {turns} recorded turns")
+
+        with tempfile.TemporaryDirectory(prefix="vorder-replay-") as workdir:
+            # 리플레이로 만든 음성(답변 음성, 실행마다 새로 만드는 TTS 캐시)은 실제 media 디렉토리에 남기지 않습니다.
+            settings.MEDIA_CLIPS = {**settings.MEDIA_CLIPS, "DIR": os.path.join(workdir, "clips")}
+            if not options["commit_orders"]:
+                # final_order.json 과 주문 outbox 를 임시 디렉토리로 돌려서 실제 주문에 섞이지 않게 합니다.
+                settings.MEDIA_ROOT = workdir
+                outbox._outbox = ReplayOutbox(os.path.join(workdir, "outbox.sqlite3"))
+
+            # 비동기 클라이언트가 이벤트 루프에 묶이므로 모든 실행을 한 루프에서 돌립니다.
+            runs = asyncio.run(self.replay_all(sessions, options["workers"], tts, workdir))
+
+        if len(runs) > 1:
+            self.stdout.write(f"\n{'workers':>8}{'turns/s':>10}{'speedup':>10}{'turn p95':>10}")
+            base = runs[0]["summary"]["turns_per_second"] or 1.0
+            for run in runs:
+                summary = run["summary"]
+                p95 = summary["stages"].get("stage:turn", {}).get("p95", 0.0)
+                self.stdout.write(f"{summary['workers']:>8}{summary['turns_per_second']:>10.2f}"
+                                  f"{summary['turns_per_second'] / base:>9.2f}x{p95:>10.3f}")
+
+        output = Path(options["output"])
+        output.write_text(json.dumps({"source": str(source), "runs": runs}, ensure_ascii=False, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"✅ Results written to {output}"))
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+
+from .audio_cache import AudioCache
+from .tts import get_tts_cache
+
+logger = logging.getLogger(__name__)
+
+# 요청마다 만든 답변 음성은 내용 해시 이름(<sha256>.mp3)으로 MEDIA_ROOT/clips 에 저장합니다.
+# 같은 URL 의 내용은 절대 바뀌지 않으므로 브라우저/프록시가 영구 캐시해도 됩니다.
+CLIP_NAME = re.compile(r"[0-9a-f]{64}\.mp3")
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_clips = None
+_clips_lock = threading.Lock()
+_sweeper = None
+
+
+def get_clip_store() -> AudioCache:
+    global _clips
+    if _clips is None:
+        with _clips_lock:
+            if _clips is None:
+                _clips = AudioCache(settings.MEDIA_CLIPS["DIR"], settings.MEDIA_CLIPS["MAX_BYTES"])
+                start_sweeper()
+    return _clips
+
+
+def save_clip(data: bytes) -> str:
+    """
+    음성을 내용 해시 이름으로 저장하고 그 키를 돌려줍니다. 이미 있으면 다시 쓰지 않습니다.
+    """
+    key = hashlib.sha256(data).hexdigest()
+    store = get_clip_store()
+    path = store.path(key)
+    if path.exists():
+        os.utime(path)  # TTL 은 마지막 사용 시각 기준
+    else:
+        store.put(key, data)
+    return key
+
+
+async def asave_clip(data: bytes) -> str:
+    return await asyncio.to_thread(save_clip, data)
+
+
+def clip_url(request, key: str) -> str:
+    relative = os.path.relpath(settings.MEDIA_CLIPS["DIR"], settings.MEDIA_ROOT).replace(os.sep, "/")
+    return request.build_absolute_uri(f"{settings.MEDIA_URL}{relative}/{key}.mp3")
+
+
+def sweep_media():
+    """
+    만료된 답변 음성(TTL)을 지우고, 답변 음성 / TTS 캐시 디렉토리를 크기 상한에 맞춥니다.
+    """
+    removed = get_clip_store().sweep(settings.MEDIA_CLIPS["TTL"])
+    removed += get_tts_cache().sweep()
+    if removed:
+        logger.info(f"🧹 Removed {removed} expired audio files")
+    return removed
+
+
+def start_sweeper():
+    global _sweeper
+    if _sweeper is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(settings.MEDIA_CLIPS["SWEEP_INTERVAL"])
+            try:
+                sweep_media()
+            except Exception as e:
+                logger.exception(f"❌ Media sweep failed: {e}")
+
+    _sweeper = threading.Thread(target=run, name="media-sweeper", daemon=True)
+    _sweeper.start()
+
+
+def serve_media(request, path: str):
+    """
+    MEDIA_ROOT 파일 서빙 (DEBUG 와 무관). ETag / If-None-Match, Range 요청을 지원합니다.
+    clips/ 의 내용 해시 파일은 immutable 로, 나머지(intro.mp3 등)는 매번 재검증하도록 보냅니다.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+
+    name = os.path.basename(full_path)
+    in_clips = os.path.dirname(full_path) == os.path.abspath(settings.MEDIA_CLIPS["DIR"])
+    if in_clips and CLIP_NAME.fullmatch(name):
+        etag = f'"{name[:-4]}"'
+        cache_control = IMMUTABLE
+    else:
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache_control = "no-cache"
+
+    def finish(response):
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+        return finish(HttpResponseNotModified())
+
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    byte_range = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if byte_range and (not if_range or if_range == etag):
+        match = RANGE_PATTERN.fullmatch(byte_range.strip())
+        size = stat.st_size
+        start = end = None
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                # bytes=-N : 마지막 N 바이트
+                start = max(0, size - int(match.group(2)))
+                end = size - 1
+        if start is None or start > end or start >= size:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return finish(response)
+        with open(full_path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+        response = HttpResponse(data, status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return finish(response)
+
+    return finish(FileResponse(open(full_path, "rb"), content_type=content_type))
@@ -0,0 +1,179 @@
+import logging
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# 시스템 프롬프트에 메뉴 전체를 넣는 대신, 발화와 맞는 후보만 찾아 넣기 위한 메뉴 색인.
+# STT 가 "carmel makiato" 처럼 철자를 틀려도 잡을 수 있도록 발음 키 + 유사도 비교를 함께 씁니다.
+FUZZY_THRESHOLD = 0.82     # 발음 키가 달라도 이 이상 비슷하면 같은 이름으로 봅니다
+PHONETIC_THRESHOLD = 0.6   # 발음 키가 같을 때 요구하는 최소 유사도 ("make" ≠ "Mocha")
+CANDIDATE_THRESHOLD = 0.6  # 프롬프트 후보로 넣을 최소 점수
+
+DEFAULT_EXTRAS = [
+    "Vanilla Syrup", "Caramel Syrup", "Hazelnut Syrup", "Caramel Drizzle",
+    "Whipped Cream", "Cocoa Powder", "Espresso Shot", "Almond Milk",
+    "Oat Milk", "Soy Milk", "Skim Milk",
+]
+
+_PHONETIC_RULES = [
+    (r"ph", "f"), (r"ck", "k"), (r"ch", "k"), (r"q", "k"), (r"x", "ks"),
+    (r"c(?=[eiy])", "s"), (r"c", "k"), (r"z", "s"), (r"(?<=[^aeiou])h", ""),
+]
+
+
+def normalize(text: str) -> str:
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[^a-z0-9' ]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def contains_phrase(text: str, phrase: str) -> bool:
+    return re.search(rf"(?<![a-z0-9']){re.escape(phrase)}(?![a-z0-9'])", text) is not None
+
+
+@lru_cache(maxsize=4096)
+def phonetic_key(text: str) -> str:
+    """
+    단어마다 첫 글자 + 자음 뼈대만 남긴 키. "caramel macchiato" 와 "carmel makiato" 는 둘 다 "krml mkt".
+    """
+    words = []
+    for word in normalize(text).replace("'", "").split():
+        for pattern, repl in _PHONETIC_RULES:
+            word = re.sub(pattern, repl, word)
+        word = re.sub(r"(.)\1+", r"\1", word)
+        words.append(word[:1] + re.sub(r"[aeiouy]", "", word[1:]))
+    return " ".join(words)
+
+
+def similarity(a: str, b: str, floor: float = 0.0) -> float:
+    matcher = SequenceMatcher(None, a, b)
+    # 상한값이 floor 보다 낮으면 비싼 ratio() 계산을 건너뜁니다.
+    if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+        return 0.0
+    return matcher.ratio()
+
+
+class MenuCatalog:
+    """
+    user_info.json 의 total_menu / saved_menu / favorite_drinks 를 한 번 색인해 두고
+    메뉴 이름·닉네임을 LLM 없이 찾습니다.
+
+    - 정규화된 이름 / 닉네임 색인 (정확히 말한 경우)
+    - 발음 키 + 유사도로 STT 오타 허용
+    - prompt_context() 는 발화와 맞는 후보만 짧게 돌려줍니다.
+    """
+
+    def __init__(self, total_menu: list, saved_menu: list, favorite_drinks: list):
+        self.favorite_drinks = list(favorite_drinks)
+        self.saved_menu = [item for item in saved_menu if item.get("nickname")]
+        for item in saved_menu:
+            if not item.get("nickname"):
+                # 닉네임으로 주문할 수 없는 항목 (키 오타 등)
+                logger.warning(f"⚠️ Saved menu without a nickname is ignored: {item}")
+
+        self.items = []
+        self._by_name = {}
+        for item in total_menu:
+            name = normalize(item["menu"])
+            if name and name not in self._by_name:
+                self._by_name[name] = item
+                self.items.append(item)
+        self._by_nickname = {normalize(item["nickname"]): item for item in self.saved_menu}
+
+        # 가장 긴 이름부터 비교해서 "Latte" 보다 "Vanilla Latte" 가 먼저 잡히게 합니다.
+        self._names = sorted(self._by_name, key=len, reverse=True)
+        self._nicknames = sorted(self._by_nickname, key=len, reverse=True)
+        self._phonetic = {name: phonetic_key(name) for name in (*self._names, *self._nicknames)}
+
+        extras = list(DEFAULT_EXTRAS)
+        for item in self.saved_menu:
+            for extra in str(item.get("extra", "")).split(","):
+                extra = extra.strip()
+                # "2shots of espresso" 같은 수량 표현은 Espresso Shot 으로 처리됩니다.
+                if extra and not extra[0].isdigit() and extra.lower() not in (e.lower() for e in extras):
+                    extras.append(extra)
+        self.extras = extras
+
+    def lookup(self, name: str):
+        """
+        정확한 메뉴 이름(대소문자/기호 무시) 또는 오타가 섞인 이름으로 메뉴 항목을 찾습니다.
+        """
+        return self.match_menu(normalize(name))
+
+    def match_menu(self, text: str):
+        """
+        정규화된 발화(text)에서 언급된 메뉴 항목 하나를 돌려줍니다. 없으면 None.
+        """
+        match = self._match(text, self._names)
+        return self._by_name[match] if match else None
+
+    def match_nickname(self, text: str):
+        match = self._match(text, self._nicknames)
+        return self._by_nickname[match] if match else None
+
+    def candidates(self, text: str, limit: int = 3) -> list:
+        """
+        발화와 가까운 메뉴 항목을 점수 순으로 최대 limit 개 돌려줍니다 (프롬프트 주입용).
+        """
+        scored = [(self._score(text, name), name) for name in self._names]
+        scored = [(score, name) for score, name in scored if score >= CANDIDATE_THRESHOLD]
+        scored.sort(key=lambda pair: -pair[0])
+        return [self._by_name[name] for _, name in scored[:limit]]
+
+    def prompt_context(self, text: str) -> str:
+        """
+        이번 LLM 호출에만 덧붙일 메뉴 정보. 맞는 후보가 있으면 후보(가격 포함)만,
+        없으면 메뉴 이름 목록만 돌려줍니다.
+        """
+        lines = []
+        nickname = self.match_nickname(text)
+        if nickname:
+            lines.append(f"Saved menu matching the customer's nickname: {self.describe_saved(nickname)}")
+        items = self.candidates(text)
+        if items:
+            lines.append("Menu items matching the customer's words: "
+                         + "; ".join(f"{item['menu']} ({item.get('price', 0)} won)" for item in items))
+        elif not nickname:
+            lines.append("Menu: " + ", ".join(item["menu"] for item in self.items))
+        if "recommend" in text and self.favorite_drinks:
+            lines.append("Favorite drinks: " + ", ".join(self.favorite_drinks))
+        return "\n".join(lines)
+
+    @staticmethod
+    def describe_saved(saved: dict) -> str:
+        extra = f" with {saved['extra']}" if saved.get("extra") else ""
+        return (f"{saved['nickname']} is a {saved.get('size', '')} {saved.get('temp', '')} "
+                f"{saved['menu']}{extra}, {saved.get('price', 0)} won")
+
+    def _match(self, text: str, names: list):
+        for name in names:
+            if contains_phrase(text, name):
+                return name
+        best, best_score = None, 0.0
+        for name in names:
+            score = self._score(text, name)
+            if score > best_score:
+                best, best_score = name, score
+        return best if best_score >= FUZZY_THRESHOLD else None
+
+    def _score(self, text: str, name: str) -> float:
+        """
+        발화 안에서 name 과 단어 수가 비슷한 구간들 중 가장 비슷한 구간의 점수.
+        발음 키가 같고 철자도 어느 정도 비슷하면 1.0 으로 봅니다.
+        """
+        words = text.split()
+        size = len(name.split())
+        key = self._phonetic[name]
+        best = 0.0
+        for n in range(max(1, size - 1), size + 2):
+            for start in range(0, max(1, len(words) - n + 1)):
+                window = " ".join(words[start:start + n])
+                if not window:
+                    continue
+                score = similarity(window, name, PHONETIC_THRESHOLD)
+                if score >= PHONETIC_THRESHOLD and phonetic_key(window) == key:
+                    return 1.0
+                best = max(best, score)
+        return best
@@ -0,0 +1,195 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.http import HttpResponse
+
+# 프로세스 단위 메트릭 (여러 워커로 띄우면 워커마다 따로 집계됩니다).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, entry in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, entry):
+                    le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {count}")
+                inf = _format_labels(self.labelnames, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf} {entry[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {entry[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {entry[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "vorder_stage_duration_seconds", "Time spent in each pipeline stage.", ["stage"],
+)
+STAGE_ERRORS = Counter(
+    "vorder_stage_errors_total", "Errors raised in each pipeline stage.", ["stage"],
+)
+RESILIENCE_EVENTS = Counter(
+    "vorder_resilience_events_total", "Hedges, retries, timeouts and circuit-open rejections per stage.", ["stage", "event"],
+)
+LLM_TOKENS = Counter(
+    "vorder_llm_tokens_total", "Tokens used by chat model calls.", ["kind"],
+)
+PROMPT_TOKENS = Histogram(
+    "vorder_llm_prompt_tokens", "Prompt tokens sent per chat model call (counted locally).",
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 8000),
+)
+DIALOG_TURNS = Counter(
+    "vorder_dialog_turns_total", "Order turns by how the reply was produced (local state machine or llm).", ["path"],
+)
+TTS_PREFETCH = Counter(
+    "vorder_tts_prefetch_total", "Predicted agent lines synthesized ahead of time (scheduled, used, cancelled, shed).", ["result"],
+)
+TTS_CACHE_LOOKUPS = Counter(
+    "vorder_tts_cache_lookups_total", "TTS audio cache lookups.", ["result"],
+)
+ADMISSION_EVENTS = Counter(
+    "vorder_admission_events_total", "Upstream admission decisions per stage (admitted, queued, rejected, expired, shed).",
+    ["stage", "result"],
+)
+ADMISSION_WAIT = Histogram(
+    "vorder_admission_wait_seconds", "Time queued calls waited for upstream capacity.", ["stage"],
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    with timed("stt"): ...  — 소요 시간을 히스토그램에 기록하고, 예외가 나면 에러 카운터를 올립니다.
+    (async 함수 안에서도 그대로 쓸 수 있습니다.)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+def record_token_usage(ai_resp):
+    usage = getattr(ai_resp, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        LLM_TOKENS.inc("input", amount=usage["input_tokens"])
+    if usage.get("output_tokens"):
+        LLM_TOKENS.inc("output", amount=usage["output_tokens"])
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# --- 오프라인 측정 (benchmarks/run.py, manage.py replay_orders) ---
+# 히스토그램 버킷이 아니라 표본 전체를 모아 정확한 p50/p95/p99 를 냅니다.
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name: str, seconds: float):
+        self.samples[name].append(seconds)
+
+    def report(self, wall_seconds: float, turns: int) -> dict:
+        rows = {}
+        for name, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            rows[name] = {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": percentile(ordered, 50),
+                "p95": percentile(ordered, 95),
+                "p99": percentile(ordered, 99),
+            }
+        return {
+            "stages": rows,
+            "errors": dict(self.errors),
+            "wall_seconds": wall_seconds,
+            "turns": turns,
+            "turns_per_second": turns / wall_seconds if wall_seconds else 0.0,
+        }
+
+
+def percentile(ordered: list, p: float) -> float:
+    # nearest-rank
+    if not ordered:
+        return 0.0
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def format_report(report: dict) -> str:
+    lines = [f"\n{'stage':<24}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}   (seconds)"]
+    for name, row in report["stages"].items():
+        lines.append(f"{name:<24}{row['count']:>7}{row['mean']:>9.3f}{row['p50']:>9.3f}{row['p95']:>9.3f}{row['p99']:>9.3f}")
+    lines.append(f"\nturns: {report['turns']}  wall: {report['wall_seconds']:.2f}s  "
+                 f"throughput: {report['turns_per_second']:.2f} turns/s")
+    if report["errors"]:
+        lines.append(f"errors: {report['errors']}")
+    return "\n".join(lines)
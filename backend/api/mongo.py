@@ -0,0 +1,63 @@
+import threading
+
+from django.conf import settings
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _create_client():
+    config = settings.MONGODB
+    uri = config["URI"]
+
+    # 테스트/벤치마크용 인프로세스 MongoDB (pip install mongomock)
+    if uri.startswith("mongomock://"):
+        import mongomock
+        return mongomock.MongoClient()
+
+    # pymongo 는 처음 연결할 때 불러옵니다 (서버 시작 시간 단축).
+    import certifi
+    from pymongo import MongoClient
+    from pymongo.server_api import ServerApi
+
+    options = {
+        "maxPoolSize": config["MAX_POOL_SIZE"],
+        "minPoolSize": config["MIN_POOL_SIZE"],
+        "maxIdleTimeMS": config["MAX_IDLE_TIME_MS"],
+        "serverSelectionTimeoutMS": config["SERVER_SELECTION_TIMEOUT_MS"],
+        "connectTimeoutMS": config["CONNECT_TIMEOUT_MS"],
+        "socketTimeoutMS": config["SOCKET_TIMEOUT_MS"],
+        "w": config["WRITE_CONCERN"],
+        "retryWrites": True,
+        "appname": "vorder",
+    }
+    if uri.startswith("mongodb+srv://"):
+        # Atlas: SSL 인증서 문제 방지를 위해 certifi 사용
+        options.update(tls=True, tlsCAFile=certifi.where(), server_api=ServerApi("1"))
+    return MongoClient(uri, **options)
+
+
+def get_mongo_client():
+    """
+    프로세스 전체에서 공유하는 MongoClient. 처음 사용할 때 한 번만 만들고,
+    이후 요청은 pymongo 커넥션 풀을 재사용합니다 (매번 TLS 핸드셰이크/SRV 조회를 하지 않음).
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+    return _client
+
+
+def get_order_collection():
+    config = settings.MONGODB
+    return get_mongo_client()[config["DATABASE"]][config["COLLECTION"]]
+
+
+def close_mongo_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
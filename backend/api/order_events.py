@@ -0,0 +1,144 @@
+import asyncio
+import hmac
+import json
+import logging
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
+from .orders import OPEN_STATUSES, get_order_feed, list_orders, matches
+
+logger = logging.getLogger(__name__)
+
+# 주문 대기열 Server-Sent Events (/api/orders/events/), backend/asgi.py 에서 라우팅하는 raw ASGI 핸들러.
+#
+# Django 4.2 의 StreamingHttpResponse 는 클라이언트가 끊어도 제너레이터를 멈추지 않아서
+# (uvicorn 의 send 도 끊긴 뒤에는 그냥 돌아옴) 구독이 정리되지 않습니다. 그래서 websocket_stt 처럼
+# ASGI 로 직접 받아 http.disconnect 를 보고 구독을 해제합니다. WSGI(runserver)에서는 쓸 수 없습니다.
+#
+# server → client
+#   event: snapshot  {"orders": [...ETA 순]}          (Last-Event-ID/?since 가 있으면 그 뒤에 바뀐 주문, 상태 무관)
+#   event: order     바뀐 주문 하나 (상태 필터와 상관없이 보내므로 picked_up 등으로 빠지는 주문도 알 수 있음)
+#   : keepalive      HEARTBEAT 초마다
+# 너무 뒤처진 연결은 서버가 닫고, EventSource 는 Last-Event-ID 로 다시 연결해서 이어 받습니다.
+
+
+def barista_error(authorization: str, query_token: str):
+    """
+    주문 목록/이벤트/상태 변경은 고객 이름과 전화번호가 보이므로 바리스타 토큰이 있어야 합니다.
+    Authorization: Bearer <BARISTA_TOKEN> 헤더, 또는 헤더를 못 붙이는 EventSource 용으로 ?token=<BARISTA_TOKEN>.
+    통과하면 None, 아니면 (HTTP 상태 코드, 에러 메시지).
+    """
+    expected = settings.ORDERS["BARISTA_TOKEN"]
+    if not expected:
+        logger.warning("⚠️ BARISTA_TOKEN is not set, order queue API is disabled")
+        return 403, "Order queue API is not configured"
+    token = authorization[len("Bearer "):] if authorization.startswith("Bearer ") else query_token or ""
+    if not hmac.compare_digest(token.encode(), expected.encode()):
+        return 401, "Barista token required"
+    return None
+
+
+def order_filters(params) -> tuple:
+    """
+    ?status=pending,ready (기본: 진행 중인 주문, all 이면 전체), ?number=<고객 전화번호>
+    """
+    status_param = params.get("status")
+    if status_param == "all":
+        statuses = None
+    elif status_param:
+        statuses = tuple(status.strip() for status in status_param.split(",") if status.strip())
+    else:
+        statuses = OPEN_STATUSES
+    return statuses, params.get("number") or None
+
+
+def parse_cursor(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def sse_event(event: str, data, event_id=None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, ensure_ascii=False)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def cors_headers(headers: dict) -> list:
+    # CorsMiddleware 를 거치지 않으므로 같은 설정으로 직접 붙입니다.
+    origin = headers.get("origin")
+    if settings.CORS_ALLOW_ALL_ORIGINS:
+        return [(b"access-control-allow-origin", b"*")]
+    if origin and origin in getattr(settings, "CORS_ALLOWED_ORIGINS", ()):
+        return [(b"access-control-allow-origin", origin.encode()), (b"vary", b"Origin")]
+    return []
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def order_events(scope, receive, send):
+    """
+    Raw ASGI HTTP handler, routed from backend/asgi.py.
+    """
+    query = {key: values[0] for key, values in parse_qs(scope.get("query_string", b"").decode()).items()}
+    headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope.get("headers", [])}
+
+    async def start(status: int, content_type: bytes, extra=()):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type), *cors_headers(headers), *extra],
+        })
+
+    async def write(text: str, more_body: bool = True):
+        await send({"type": "http.response.body", "body": text.encode(), "more_body": more_body})
+
+    error = barista_error(headers.get("authorization", ""), query.get("token"))
+    if error:
+        await start(error[0], b"application/json")
+        await write(json.dumps({"error": error[1]}), more_body=False)
+        return
+
+    statuses, number = order_filters(query)
+    since = parse_cursor(headers.get("last-event-id") or query.get("since"))
+    feed = get_order_feed()
+    # 스냅샷을 읽는 동안 생긴 변경을 놓치지 않도록 먼저 구독합니다 (중복은 클라이언트가 _id 로 덮어씀).
+    queue = feed.subscribe()
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await start(200, b"text/event-stream", [
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),  # nginx 가 이벤트를 모아 두지 않도록
+        ])
+        # 재연결이면 그 사이에 바뀐 주문을 상태와 상관없이 보내야 닫힌 주문도 목록에서 뺄 수 있습니다.
+        snapshot = await asyncio.to_thread(list_orders, statuses if since is None else None, number, since)
+        cursor = max([order.get("updated_at", 0) for order in snapshot], default=since)
+        await write(sse_event("snapshot", {"orders": snapshot}, cursor))
+
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {getter, disconnected}, timeout=settings.ORDERS["HEARTBEAT"], return_when=asyncio.FIRST_COMPLETED,
+            )
+            if getter not in done:
+                getter.cancel()
+                if disconnected in done:
+                    return
+                await write(": keepalive\n\n")
+                continue
+            order = getter.result()
+            if order is None:  # 너무 뒤처져서 OrderFeed 가 끊은 연결
+                break
+            if matches(order, number=number):
+                await write(sse_event("order", order, order.get("updated_at")))
+        await write("", more_body=False)
+    finally:
+        feed.unsubscribe(queue)
+        disconnected.cancel()
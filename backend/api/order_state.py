@@ -0,0 +1,46 @@
+import logging
+from typing import Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class OrderDraft(BaseModel):
+    """
+    대화가 진행되는 동안 채워지는 주문 상태. 결제 확인 시 그대로 final_order 가 됩니다.
+    """
+
+    menu: str = ""
+    temp: str = ""
+    size: str = ""
+    extra: str = ""
+    price: int = 0
+    eta_minutes: Optional[int] = None
+
+
+class UpdateOrder(BaseModel):
+    """Record order details the customer just chose or changed. Only fill the fields that changed."""
+
+    menu: Optional[str] = Field(None, description="Menu item name, spelled exactly as on the menu")
+    temp: Optional[str] = Field(None, description="'Hot' or 'Iced'")
+    size: Optional[str] = Field(None, description="Short, Tall, Grande or Venti")
+    extra: Optional[str] = Field(None, description="Extras as a comma separated list, '' for none")
+    price: Optional[int] = Field(None, description="Price in won")
+    eta_minutes: Optional[int] = Field(None, description="Minutes until the customer arrives")
+
+
+def parse_update(args: dict) -> dict:
+    """
+    Validate UpdateOrder tool-call arguments and return only the fields that were set.
+    Invalid fields (e.g. a price of "about 5000") are dropped instead of failing the turn.
+    """
+    clean = {}
+    for name, value in args.items():
+        if value is None or name not in UpdateOrder.model_fields:
+            continue
+        try:
+            clean[name] = getattr(UpdateOrder(**{name: value}), name)
+        except ValidationError:
+            logger.warning(f"⚠️ Ignoring invalid order field {name}={value!r}")
+    return clean
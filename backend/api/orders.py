@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .mongo import get_order_collection
+from .outbox import get_order_outbox
+
+logger = logging.getLogger(__name__)
+
+# 주문 상태: 키오스크에서 확정되면 pending, 이후 바리스타 화면에서 바꿉니다.
+ORDER_STATUSES = ("pending", "preparing", "ready", "picked_up", "cancelled")
+OPEN_STATUSES = ("pending", "preparing", "ready")
+
+# ETA("HH:MM")는 자정을 넘기면 순서가 뒤집히므로 정렬/색인은 전체 시각(eta_at, ISO 8601)으로 합니다.
+ORDER_INDEXES = [
+    ([("status", 1), ("eta_at", 1)], "status_eta"),
+    ([("number", 1), ("created_at", -1)], "customer_number"),
+    ([("updated_at", 1)], "updated_at"),  # 폴링 방식 변경 감지용
+]
+
+_indexed = False
+_indexed_lock = threading.Lock()
+
+
+def get_orders():
+    """
+    order.order_list 컬렉션. 처음 쓸 때 색인을 만듭니다 (이미 있으면 그대로).
+    """
+    global _indexed
+    collection = get_order_collection()
+    if not _indexed:
+        with _indexed_lock:
+            if not _indexed:
+                for keys, name in ORDER_INDEXES:
+                    collection.create_index(keys, name=name)
+                _indexed = True
+    return collection
+
+
+def matches(order: dict, statuses=None, number: str = None, since: float = None) -> bool:
+    return ((not statuses or order.get("status") in statuses)
+            and (not number or order.get("number") == number)
+            and (since is None or order.get("updated_at", 0) > since))
+
+
+def list_orders(statuses=None, number: str = None, since: float = None, limit: int = None) -> list:
+    """
+    조건에 맞는 주문을 ETA 순으로 돌려줍니다. 아직 outbox 에 있는(MongoDB 로 가기 전) 주문도 합칩니다.
+    """
+    limit = limit or settings.ORDERS["MAX_RESULTS"]
+    query = {}
+    if statuses:
+        query["status"] = {"$in": list(statuses)}
+    if number:
+        query["number"] = number
+    if since is not None:
+        query["updated_at"] = {"$gt": since}
+
+    orders = {}
+    try:
+        for order in get_orders().find(query).sort("eta_at", 1).limit(limit):
+            orders[order["_id"]] = order
+    except Exception as e:
+        logger.error(f"❌ Order query failed, showing unsent orders only: {e}")
+    for order in get_order_outbox().unsent_documents():
+        if matches(order, statuses, number, since):
+            orders[order["_id"]] = order
+    return sorted(orders.values(), key=lambda order: order.get("eta_at") or "")[:limit]
+
+
+def get_order(order_id: str):
+    """
+    MongoDB 의 주문과, 이 프로세스가 outbox 에 쓴 사본 중 더 최근 것을 돌려줍니다. 없으면 None.
+    """
+    local = get_order_outbox().get(order_id)
+    try:
+        stored = get_orders().find_one({"_id": order_id})
+    except Exception as e:
+        if local is None:
+            raise
+        logger.error(f"❌ Order lookup failed, using outbox copy: {e}")
+        return local
+    if stored is None or (local is not None and local.get("updated_at", 0) > stored.get("updated_at", 0)):
+        return local
+    return stored
+
+
+def update_order_status(order_id: str, status: str):
+    """
+    주문 상태를 바꿉니다. 쓰기는 주문 생성과 같이 outbox(ReplaceOne upsert)를 거치므로
+    MongoDB 가 잠시 안 돼도 잃지 않습니다. 없는 주문이면 None.
+    """
+    if status not in ORDER_STATUSES:
+        raise ValueError(f"Unknown order status: {status}")
+    order = get_order(order_id)
+    if order is None:
+        return None
+    order = {**order, "status": status, "updated_at": time.time()}
+    get_order_outbox().enqueue(order)
+    get_order_feed().publish(order)
+    return order
+
+
+class OrderFeed:
+    """
+    새 주문/바뀐 주문을 구독자(SSE 연결)에게 보냅니다.
+
+    다른 프로세스의 변경은 MongoDB change stream 으로 받고, change stream 을 쓸 수 없는
+    배포(단일 서버 mongod, mongomock)에서는 updated_at 색인으로 POLL_INTERVAL 마다 폴링합니다.
+    이 프로세스가 쓴 주문은 MongoDB 로 가기 전에 publish() 로 바로 보냅니다.
+    같은 변경은 (_id, updated_at) 로 한 번만 보냅니다.
+
+    구독자 큐는 queue_size 개까지만 쌓습니다. 그보다 뒤처진 구독자는 큐를 비우고 None 을 넣어
+    끊습니다 (SSE 클라이언트는 Last-Event-ID 로 다시 연결해서 그 뒤의 변경을 스냅샷으로 받음).
+    """
+
+    def __init__(self, poll_interval: float = 1.0, max_seen: int = 10000, queue_size: int = 100):
+        self.poll_interval = poll_interval
+        self.max_seen = max_seen
+        self.queue_size = queue_size
+        self.mode = None  # "change_stream" | "polling"
+        self._subscribers = set()  # (loop, asyncio.Queue)
+        self._seen = OrderedDict()  # _id -> updated_at
+        self._lock = threading.Lock()
+        self._thread = None
+        self._resume_token = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="order-feed", daemon=True)
+                self._thread.start()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = {entry for entry in self._subscribers if entry[1] is not queue}
+
+    def publish(self, order: dict):
+        with self._lock:
+            updated_at = order.get("updated_at")
+            if self._seen.get(order["_id"], -1) >= (updated_at or 0):
+                return
+            self._seen[order["_id"]] = updated_at or 0
+            self._seen.move_to_end(order["_id"])
+            while len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, order)
+            except RuntimeError:
+                self.unsubscribe(queue)  # 이벤트 루프가 이미 닫힌 연결
+
+    def _deliver(self, queue: asyncio.Queue, order: dict):
+        # 구독자의 이벤트 루프에서 실행됩니다.
+        if queue.full():
+            self.unsubscribe(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+            logger.warning("⚠️ Order feed subscriber fell behind, disconnecting it")
+            return
+        queue.put_nowait(order)
+
+    def _run(self):
+        backoff = self.poll_interval
+        while True:
+            try:
+                self._watch()
+            except (NotImplementedError, TypeError, _operation_failure()) as e:
+                # 단일 서버 mongod 는 OperationFailure, watch 가 없는 mongomock 은 TypeError
+                logger.warning(f"⚠️ Order change streams unavailable, polling every {self.poll_interval}s: {e}")
+                break
+            except Exception as e:
+                logger.warning(f"⚠️ Order change stream interrupted, retrying in {backoff:.0f}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+        self.mode = "polling"
+        self._poll()
+
+    def _watch(self):
+        # 끊겼다 다시 연결하면 마지막으로 받은 변경 다음부터 이어 받습니다.
+        with get_orders().watch(full_document="updateLookup", resume_after=self._resume_token) as stream:
+            self.mode = "change_stream"
+            for change in stream:
+                self._resume_token = stream.resume_token
+                order = change.get("fullDocument")
+                if order is not None:
+                    self.publish(order)
+
+    def _poll(self):
+        # 다른 프로세스가 조금 늦게 쓴 변경을 놓치지 않도록 한 주기만큼 겹쳐서 조회합니다.
+        last = time.time() - self.poll_interval
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                cursor = get_orders().find({"updated_at": {"$gt": last - self.poll_interval}}).sort("updated_at", 1)
+                for order in cursor:
+                    last = max(last, order.get("updated_at", 0))
+                    self.publish(order)
+            except Exception as e:
+                logger.warning(f"⚠️ Order polling failed: {e}")
+
+
+def _operation_failure():
+    from pymongo.errors import OperationFailure
+    return OperationFailure
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_order_feed() -> OrderFeed:
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                _feed = OrderFeed(settings.ORDERS["POLL_INTERVAL"], queue_size=settings.ORDERS["QUEUE_SIZE"])
+    return _feed
@@ -0,0 +1,168 @@
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from .metrics import timed
+from .mongo import get_order_collection
+
+logger = logging.getLogger(__name__)
+
+
+class OrderOutbox:
+    """
+    주문을 로컬 SQLite 테이블(outbox)에 먼저 기록하고, 백그라운드 스레드가
+    order.order_list 로 묶어서(bulk_write) 보냅니다.
+
+    _id 를 기준으로 ReplaceOne(upsert) 하므로 같은 주문을 여러 번 보내도 한 건만 남습니다.
+    실패한 배치는 지수 백오프(+지터) 후 다시 시도합니다.
+    """
+
+    def __init__(self, path, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_backoff: float = 60.0, keep_sent: float = 24 * 3600):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.keep_sent = keep_sent
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id TEXT PRIMARY KEY,"
+            " document TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL,"
+            " sent_at REAL)"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (sent_at, next_attempt_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, document: dict) -> str:
+        """
+        주문을 outbox 에 기록하고 바로 돌려줍니다 (MongoDB 응답을 기다리지 않음).
+        """
+        if "_id" not in document:
+            document["_id"] = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO outbox (id, document, created_at, attempts, next_attempt_at, sent_at)"
+            " VALUES (?, ?, ?, 0, ?, NULL)",
+            (document["_id"], json.dumps(document, ensure_ascii=False), now, now),
+        )
+        self.start()
+        self._wakeup.set()
+        return document["_id"]
+
+    def pending_count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM outbox WHERE sent_at IS NULL").fetchone()[0]
+
+    def unsent_documents(self) -> list:
+        """
+        아직 MongoDB 로 보내지 못한 주문들 (주문 조회 시 MongoDB 결과에 합쳐서 바로 보이게 합니다).
+        """
+        rows = self._conn().execute("SELECT document FROM outbox WHERE sent_at IS NULL").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get(self, order_id: str):
+        row = self._conn().execute("SELECT document FROM outbox WHERE id = ?", (order_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def flush_once(self) -> int:
+        """
+        전송 시각이 된 대기 주문을 한 배치 보냅니다. 보낸 건수를 돌려줍니다.
+        """
+        conn = self._conn()
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, document, attempts FROM outbox"
+            " WHERE sent_at IS NULL AND next_attempt_at <= ?"
+            " ORDER BY created_at LIMIT ?",
+            (now, self.batch_size),
+        ).fetchall()
+        if not rows:
+            return 0
+
+        from pymongo import ReplaceOne
+
+        try:
+            with timed("mongo_upsert"):
+                get_order_collection().bulk_write(
+                    [ReplaceOne({"_id": row[0]}, json.loads(row[1]), upsert=True) for row in rows],
+                    ordered=False,
+                )
+        except Exception as e:
+            attempts = max(row[2] for row in rows) + 1
+            delay = min(self.max_backoff, 2 ** attempts) * random.uniform(0.5, 1.0)
+            logger.error(f"❌ Order outbox flush failed ({len(rows)} orders, attempt {attempts}): {e}")
+            conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ? AND document = ?",
+                [(now + delay, row[0], row[1]) for row in rows],
+            )
+            return 0
+
+        # 보내는 동안 같은 주문이 다시 enqueue 됐으면(예: 상태 변경) 새 버전은 보낸 것으로 표시하지 않고 남겨 둡니다.
+        sent_at = time.time()
+        conn.executemany(
+            "UPDATE outbox SET sent_at = ? WHERE id = ? AND document = ?",
+            [(sent_at, row[0], row[1]) for row in rows],
+        )
+        conn.execute("DELETE FROM outbox WHERE sent_at IS NOT NULL AND sent_at < ?", (now - self.keep_sent,))
+        logger.info(f"📦 Flushed {len(rows)} orders to MongoDB")
+        return len(rows)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="order-outbox", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # 새 주문이 들어오면 곧바로 깨고, 아니면 flush_interval 마다 재시도 대상을 확인합니다.
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                while self.flush_once() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.exception(f"❌ Order outbox error: {e}")
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_order_outbox() -> OrderOutbox:
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                config = settings.ORDER_OUTBOX
+                _outbox = OrderOutbox(
+                    config["PATH"],
+                    batch_size=config["BATCH_SIZE"],
+                    flush_interval=config["FLUSH_INTERVAL"],
+                    max_backoff=config["MAX_BACKOFF"],
+                )
+                # 이전 실행에서 못 보낸 주문이 남아 있을 수 있으므로 바로 전송 스레드를 띄웁니다.
+                _outbox.start()
+    return _outbox
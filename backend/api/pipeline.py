@@ -0,0 +1,91 @@
+import asyncio
+import logging
+
+from .prefetch import asynthesize_prefetched
+from .tts import SENTENCE_BREAK
+
+logger = logging.getLogger(__name__)
+
+
+class SpeechPipeline:
+    """
+    LLM 이 내보내는 텍스트 조각을 문장 단위로 잘라, 문장이 완성되는 즉시 TTS 를 시작합니다.
+    나머지 문장이 생성되는 동안 앞 문장의 음성이 만들어지고, 결과는 항상 문장 순서대로 나옵니다.
+
+        pipeline = SpeechPipeline()
+        reply, final = await aorder_agent(text, on_text=pipeline.feed)
+        pipeline.finish(reply)
+        audio = await pipeline.read_all()      # 또는 async for chunk in pipeline.stream(): ...
+    """
+
+    def __init__(self, synthesize=asynthesize_prefetched, max_parallel: int = 3):
+        self.synthesize = synthesize
+        self.text = ""  # 지금까지 feed 된 전체 텍스트
+        self._buffer = ""
+        self._tasks = []
+        self._segments = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(max_parallel)
+
+    def feed(self, delta: str):
+        self.text += delta
+        self._buffer += delta
+        *sentences, self._buffer = SENTENCE_BREAK.split(self._buffer)
+        for sentence in sentences:
+            self._speak(sentence)
+
+    def finish(self, reply: str):
+        """
+        최종 답변으로 마무리합니다. 스트리밍되지 않은 부분(로컬 답변, 함수 호출만 한 턴의 고정 질문)만
+        새로 읽고, 남은 버퍼를 마지막 문장으로 보냅니다.
+        """
+        # 스트리밍된 텍스트와 최종 답변(strip 된 것)은 앞뒤 공백이 다를 수 있으므로 양쪽 다 strip 해서 비교합니다.
+        streamed, reply = self.text.strip(), reply.strip()
+        if reply.startswith(streamed):
+            self.feed(reply[len(streamed):])
+        else:
+            # 결제 확인처럼 답변이 스트리밍된 내용과 달라진 경우: 이미 읽은 말 뒤에 최종 답변을 이어 읽습니다.
+            logger.info("🔀 Final reply differs from streamed text, appending it")
+            self._speak(self._buffer)
+            self._buffer = ""
+            self.feed(reply)
+        self._speak(self._buffer)
+        self._buffer = ""
+        self._segments.put_nowait(None)
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def segments(self):
+        """
+        문장별 MP3 바이트를 문장 순서대로 돌려줍니다.
+        """
+        try:
+            while True:
+                task = await self._segments.get()
+                if task is None:
+                    return
+                yield await task
+        finally:
+            self.cancel()
+
+    async def stream(self, chunk_size: int = 4096):
+        async for data in self.segments():
+            for start in range(0, len(data), chunk_size):
+                yield data[start:start + chunk_size]
+
+    async def read_all(self) -> bytes:
+        # MP3 프레임은 이어 붙여도 그대로 재생됩니다.
+        return b"".join([data async for data in self.segments()])
+
+    def _speak(self, sentence: str):
+        sentence = sentence.strip()
+        if not sentence:
+            return
+        task = asyncio.create_task(self._synthesize(sentence))
+        self._tasks.append(task)
+        self._segments.put_nowait(task)
+
+    async def _synthesize(self, sentence: str) -> bytes:
+        async with self._semaphore:
+            return await self.synthesize(sentence)
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .metrics import TTS_PREFETCH
+from .scheduler import Overloaded
+from .tts import asynthesize_bytes, get_tts_cache, split_sentences, synthesize_bytes, tts_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    다음에 나올 가능성이 큰 에이전트 대사를 백그라운드 스레드 풀에서 미리 합성해 TTS 캐시에 넣어 둡니다.
+
+    세션마다 "지금 예상하는 대사" 집합을 기억하고, 다음 턴에 예상이 바뀌면 아직 시작하지 않은
+    작업은 취소합니다 (이미 합성 중인 것은 끝까지 돌고 캐시에 남습니다).
+    같은 문장을 여러 세션이 기다리면 작업은 하나만 돌립니다.
+    """
+
+    def __init__(self, max_workers: int = 2, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-prefetch")
+        self._inflight = {}  # cache key -> (future, {session_id, ...})
+        self._wanted = OrderedDict()  # session_id -> {cache key, ...}
+        # future.cancel() 은 done 콜백(_finished)을 같은 스레드에서 바로 부르므로 재진입 가능한 락을 씁니다.
+        self._lock = threading.RLock()
+
+    def schedule(self, session_id: str, texts):
+        """
+        session_id 의 다음 대사 예상을 texts 로 바꿉니다. 빈 목록이면 해당 세션의 예상을 모두 취소합니다.
+        """
+        cache = get_tts_cache()
+        wanted = {}
+        for text in texts:
+            for sentence in split_sentences(text):
+                wanted[tts_cache_key(sentence)] = sentence
+
+        with self._lock:
+            for key in self._wanted.pop(session_id, set()) - wanted.keys():
+                self._release(key, session_id)
+            if wanted:
+                self._wanted[session_id] = set(wanted)
+                while len(self._wanted) > self.max_sessions:
+                    old_session, keys = self._wanted.popitem(last=False)
+                    for key in keys:
+                        self._release(key, old_session)
+
+            for key, sentence in wanted.items():
+                entry = self._inflight.get(key)
+                if entry is not None:
+                    entry[1].add(session_id)
+                    continue
+                if cache.path(key).exists():
+                    continue
+                future = self._executor.submit(synthesize_bytes, sentence)
+                self._inflight[key] = (future, {session_id})
+                future.add_done_callback(lambda f, key=key: self._finished(key, f))
+                TTS_PREFETCH.inc("scheduled")
+
+    def pending(self, text: str):
+        """
+        text 를 합성 중인 작업(concurrent Future)이 있으면 돌려주고, 더 이상 취소되지 않게 합니다.
+        """
+        with self._lock:
+            entry = self._inflight.get(tts_cache_key(text))
+            if entry is None:
+                return None
+            entry[1].add(None)  # 실제 답변이 기다리는 중
+            return entry[0]
+
+    def _release(self, key: str, session_id: str):
+        entry = self._inflight.get(key)
+        if entry is None:
+            return
+        future, sessions = entry
+        sessions.discard(session_id)
+        if not sessions and future.cancel():
+            TTS_PREFETCH.inc("cancelled")
+
+    def _finished(self, key: str, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is None:
+            return
+        if isinstance(future.exception(), Overloaded):
+            # 미리 합성은 남는 용량만 씁니다: 라이브 요청이 밀려 있으면 조용히 건너뜁니다.
+            TTS_PREFETCH.inc("shed")
+        else:
+            logger.warning(f"⚠️ TTS prefetch failed: {future.exception()}")
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher(settings.TTS_PREFETCH["WORKERS"])
+    return _prefetcher
+
+
+def prefetch_replies(session_id: str, texts):
+    if settings.TTS_PREFETCH["ENABLED"]:
+        get_prefetcher().schedule(session_id, texts)
+
+
+async def asynthesize_prefetched(text: str) -> bytes:
+    """
+    asynthesize_bytes 와 같지만, 같은 문장을 미리 합성하는 중이면 새로 요청하지 않고 그 결과를 기다립니다.
+    """
+    future = get_prefetcher().pending(text) if settings.TTS_PREFETCH["ENABLED"] else None
+    if future is not None:
+        try:
+            data = await asyncio.wrap_future(future)
+            TTS_PREFETCH.inc("used")
+            return data
+        except Exception as e:
+            logger.warning(f"⚠️ Prefetched TTS failed, synthesizing again: {e}")
+    return await asynthesize_bytes(text)
@@ -0,0 +1,240 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from langchain_core.messages import SystemMessage
+
+from .menu import MenuCatalog
+from .prompts import build_system_prompt
+
+
+def normalize_phone(phone: str) -> str:
+    digits = re.sub(r"\D", "", str(phone))
+    # +82-10-1234-5678 과 010-1234-5678 을 같은 번호로 봅니다.
+    if digits.startswith("82"):
+        digits = "0" + digits[2:]
+    return digits
+
+
+class Profile:
+    """
+    고객 한 명의 user_info (user_info.json 과 같은 형식) 와, 그로부터 한 번만 만드는
+    메뉴 색인(catalog) / 시스템 프롬프트(system_message).
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.customer_id = str(data.get("user_id") or normalize_phone(data.get("phone_number", "")))
+        self.name = data.get("name", "")
+        self.phone_number = data.get("phone_number", "")
+        self.catalog = MenuCatalog(
+            data.get("total_menu", []),
+            data.get("saved_menu", []),
+            data.get("favorite_drinks", []),
+        )
+        self.system_message = SystemMessage(content=build_system_prompt(data))
+
+
+class ProfileStore(ABC):
+    """
+    고객 ID 또는 전화번호 -> Profile 저장소의 공통 인터페이스.
+
+    만든 Profile 은 LRU(max_profiles) 로 보관하고, 원본(파일 mtime / 행 updated_at)이
+    바뀌었을 때만 다시 만듭니다.
+    """
+
+    def __init__(self, max_profiles: int = 256):
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()  # customer_id -> (version, Profile)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """
+        key(고객 ID 또는 전화번호)에 맞는 Profile. 없으면 None.
+        """
+        found = self._locate(str(key))
+        if found is None:
+            return None
+        customer_id, version = found
+        with self._lock:
+            cached = self._profiles.get(customer_id)
+            if cached is not None and cached[0] == version:
+                self._profiles.move_to_end(customer_id)
+                return cached[1]
+
+        data = self._read(customer_id)
+        if data is None:
+            return None
+        profile = Profile(data)
+        with self._lock:
+            self._profiles[customer_id] = (version, profile)
+            self._profiles.move_to_end(customer_id)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile
+
+    @abstractmethod
+    def _locate(self, key: str):
+        """
+        key -> (customer_id, version). version 이 바뀌면 캐시된 Profile 을 다시 만듭니다.
+        """
+
+    @abstractmethod
+    def _read(self, customer_id: str):
+        """
+        customer_id 의 원본 데이터(dict). 없으면 None.
+        """
+
+
+class JSONProfileStore(ProfileStore):
+    """
+    directory/<customer_id>.json 파일 하나가 고객 한 명입니다.
+    전화번호 색인은 디렉토리가 바뀌었을 때(mtime)만 다시 읽습니다.
+    """
+
+    def __init__(self, directory, max_profiles: int = 256):
+        super().__init__(max_profiles)
+        self.directory = Path(directory)
+        self._phones = {}
+        self._phones_mtime = None
+
+    def path(self, customer_id: str) -> Path:
+        return self.directory / f"{customer_id}.json"
+
+    def _phone_index(self) -> dict:
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self._phones_mtime:
+            phones = {}
+            for path in self.directory.glob("*.json"):
+                try:
+                    data = json.loads(path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    continue
+                if data.get("phone_number"):
+                    phones[normalize_phone(data["phone_number"])] = path.stem
+            self._phones, self._phones_mtime = phones, mtime
+        return self._phones
+
+    def _locate(self, key: str):
+        customer_id = key
+        if not re.fullmatch(r"[\w.-]+", key) or not self.path(key).exists():
+            customer_id = self._phone_index().get(normalize_phone(key))
+            if customer_id is None:
+                return None
+        try:
+            return customer_id, os.stat(self.path(customer_id)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read(self, customer_id: str):
+        try:
+            return json.loads(self.path(customer_id).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+
+class SQLiteProfileStore(ProfileStore):
+    """
+    profiles 테이블 한 행이 고객 한 명입니다 (data 는 user_info JSON).
+    """
+
+    def __init__(self, path, max_profiles: int = 256):
+        super().__init__(max_profiles)
+        self.path = str(path)
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " customer_id TEXT PRIMARY KEY,"
+            " phone TEXT,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS profiles_phone ON profiles (phone)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, data: dict) -> str:
+        profile = Profile(data)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO profiles (customer_id, phone, data, updated_at) VALUES (?, ?, ?, ?)",
+            # 전화번호가 없으면 NULL: 빈 문자열로 두면 숫자가 없는 키("guest" → "")와 맞아 버립니다.
+            (profile.customer_id, normalize_phone(profile.phone_number) or None,
+             json.dumps(data, ensure_ascii=False), time.time()),
+        )
+        return profile.customer_id
+
+    def _locate(self, key: str):
+        phone = normalize_phone(key)
+        if phone:
+            # 고객 ID 가 그대로 맞는 행이 전화번호로 맞는 행보다 먼저
+            row = self._conn().execute(
+                "SELECT customer_id, updated_at FROM profiles WHERE customer_id = ? OR phone = ?"
+                " ORDER BY customer_id = ? DESC LIMIT 1",
+                (key, phone, key),
+            ).fetchone()
+        else:
+            row = self._conn().execute(
+                "SELECT customer_id, updated_at FROM profiles WHERE customer_id = ?", (key,),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def _read(self, customer_id: str):
+        row = self._conn().execute("SELECT data FROM profiles WHERE customer_id = ?", (customer_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+_store = None
+_default = None
+_store_lock = threading.Lock()
+
+
+def get_profile_store() -> ProfileStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.PROFILE_STORE
+                if config["BACKEND"] == "sqlite":
+                    _store = SQLiteProfileStore(config["PATH"], config["MAX_PROFILES"])
+                else:
+                    _store = JSONProfileStore(config["DIR"], config["MAX_PROFILES"])
+    return _store
+
+
+def get_default_profile() -> Profile:
+    """
+    고객을 지정하지 않은 요청(키오스크 기본 고객)에 쓰는 PROFILE_STORE["DEFAULT"] 파일.
+    """
+    global _default
+    path = settings.PROFILE_STORE["DEFAULT"]
+    mtime = os.stat(path).st_mtime_ns
+    default = _default
+    if default is None or default[0] != mtime:
+        with open(path, "r", encoding="utf-8") as f:
+            default = _default = (mtime, Profile(json.load(f)))
+    return default[1]
+
+
+def get_profile(customer_key=None):
+    """
+    고객 ID 또는 전화번호로 Profile 을 찾습니다. 지정하지 않으면 기본 고객, 찾지 못하면 None.
+    """
+    if not customer_key:
+        return get_default_profile()
+    return get_profile_store().get(customer_key)
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .metrics import RESILIENCE_EVENTS
+from .scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """단계(stt/llm/tts)가 연속으로 실패해서 잠시 호출을 막아 둔 상태."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} is temporarily unavailable (circuit open)")
+        self.stage = stage
+
+
+class CircuitBreaker:
+    """
+    연속 실패가 failure_threshold 번이면 열리고(open, 즉시 실패), reset_timeout 초 뒤
+    한 번만 시험 호출(half-open)을 허용합니다. 시험 호출이 성공하면 다시 닫힙니다.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """
+        결과를 모르고 끝난 호출(취소됨): 시험 호출 자리만 돌려줘서 다음 호출이 다시 시험할 수 있게 합니다.
+        """
+        with self._lock:
+            self._probing = False
+
+
+class LatencyTracker:
+    """
+    최근 성공한 호출의 소요 시간으로 헤지(hedge) 시점(예: p95)을 정합니다.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class StageGuard:
+    """
+    한 단계(stt/llm/tts)의 업스트림 호출 정책:
+    - deadline: 재시도를 포함한 전체 제한 시간
+    - hedge: 첫 요청이 최근 p95 (표본이 적으면 hedge_after) 를 넘기면 같은 요청을 하나 더 보내고 먼저 온 응답을 씀
+    - retries: 실패 시 지터를 섞은 지수 백오프로 재시도
+    - circuit breaker: 계속 실패하면 deadline 까지 기다리지 않고 바로 CircuitOpenError
+    - 첫 요청은 api/scheduler.py 의 승인을 기다리고(Overloaded 가능), 헤지/재시도는 남는 용량이 있을 때만 보냄
+    """
+
+    def __init__(self, stage: str, config: dict):
+        self.stage = stage
+        self.deadline = config["DEADLINE"]
+        self.hedge_after = config["HEDGE_AFTER"]
+        self.hedge_percentile = config["HEDGE_PERCENTILE"]
+        self.min_samples = config["MIN_SAMPLES"]
+        self.retries = config["RETRIES"]
+        self.backoff = config["BACKOFF"]
+        self.breaker = CircuitBreaker(config["FAILURE_THRESHOLD"], config["RESET_TIMEOUT"])
+        self.latency = LatencyTracker()
+
+    def hedge_delay(self):
+        if self.hedge_after is None:
+            return None
+        p = self.latency.percentile(self.hedge_percentile, self.min_samples)
+        return p if p is not None else self.hedge_after
+
+    async def call(self, make_call, can_retry=None, tokens: float = 0):
+        """
+        make_call() 은 호출할 때마다 새 코루틴을 만들어야 합니다 (헤지/재시도에서 여러 번 부름).
+        can_retry() 가 False 를 돌려주면(예: 스트리밍으로 이미 일부를 내보낸 경우) 재시도하지 않습니다.
+        tokens 는 스케줄러 TPM 예산에 쓰는 이 호출의 예상 토큰 수입니다.
+        """
+        scheduler = get_scheduler(self.stage)
+        await scheduler.acquire(tokens=tokens)
+        if not self.breaker.allow():
+            RESILIENCE_EVENTS.inc(self.stage, "circuit_open")
+            raise CircuitOpenError(self.stage)
+        probe = self.breaker.state != "closed"  # half-open 에서 통과했다면 이 호출이 시험 호출
+        try:
+            return await self._attempts(scheduler, make_call, can_retry, tokens)
+        except asyncio.CancelledError:
+            # 클라이언트 연결 끊김, pipeline.cancel(), 바깥 wait_for 등: 성공/실패 어느 쪽도 기록하지 않으므로
+            # 시험 호출이었다면 그 자리를 돌려줘야 회로가 영영 열린 채로 남지 않습니다.
+            if probe:
+                self.breaker.release()
+            raise
+
+    async def _attempts(self, scheduler, make_call, can_retry, tokens: float):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(self._hedged(make_call, tokens), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError as e:
+                RESILIENCE_EVENTS.inc(self.stage, "timeout")
+                error = e
+            except Exception as e:
+                error = e
+            else:
+                self.latency.add(time.perf_counter() - start)
+                self.breaker.record_success()
+                return result
+
+            attempt += 1
+            delay = self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            if (attempt > self.retries or loop.time() + delay >= deadline or (can_retry and not can_retry())
+                    or not scheduler.try_acquire(tokens)):
+                self.breaker.record_failure()
+                raise error
+            RESILIENCE_EVENTS.inc(self.stage, "retry")
+            logger.warning(f"⚠️ {self.stage} attempt {attempt} failed ({error!r}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def _hedged(self, make_call, tokens: float = 0):
+        first = asyncio.ensure_future(make_call())
+        delay = self.hedge_delay()
+        if delay is None:
+            return await first
+
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and get_scheduler(self.stage).try_acquire(tokens):
+                RESILIENCE_EVENTS.inc(self.stage, "hedge")
+                hedge = asyncio.ensure_future(make_call())
+                tasks.add(hedge)
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            RESILIENCE_EVENTS.inc(self.stage, "hedge_won")
+                        return task.result()
+                # 먼저 끝난 쪽이 실패했으면 남은 요청을 계속 기다립니다.
+            return await first  # 모두 실패: 첫 요청의 예외를 올립니다
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(stage: str) -> StageGuard:
+    guard = _guards.get(stage)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(stage)
+            if guard is None:
+                config = {**settings.RESILIENCE["DEFAULTS"], **settings.RESILIENCE["STAGES"].get(stage, {})}
+                guard = _guards[stage] = StageGuard(stage, config)
+    return guard
+
+
+def deadline(stage: str) -> float:
+    return get_guard(stage).deadline
+
+
+async def guarded(stage: str, make_call, can_retry=None, tokens: float = 0):
+    return await get_guard(stage).call(make_call, can_retry, tokens)
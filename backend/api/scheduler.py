@@ -0,0 +1,201 @@
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .metrics import ADMISSION_EVENTS, ADMISSION_WAIT
+
+# 우선순위: 작을수록 먼저. 라이브 요청은 뷰가 주문 단계로 정하고(dialog.STEP_PRIORITY),
+# 지정하지 않은 호출(미리 합성, CLI)은 BACKGROUND 로 남는 용량만 씁니다.
+BACKGROUND_PRIORITY = 100
+request_priority = ContextVar("request_priority", default=BACKGROUND_PRIORITY)
+
+
+class Overloaded(Exception):
+    """업스트림 대기열이 가득 찼거나 MAX_WAIT 안에 처리할 수 없음 (429 + Retry-After)."""
+
+    def __init__(self, stage: str, retry_after: float):
+        super().__init__(f"{stage} is overloaded, retry after {retry_after:.0f}s")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    분당 rate 만큼 채워지고 capacity 까지 쌓이는 토큰 버킷.
+    """
+
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_for(self, amount: float) -> float:
+        """
+        (refill 직후) amount 만큼 쌓이기까지 남은 초.
+        """
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class StageScheduler:
+    """
+    한 단계(stt/llm/tts)의 업스트림 호출 승인.
+
+    - 요청 수(RPM)와 토큰 수(TPM) 토큰 버킷을 모두 통과해야 호출합니다.
+    - 바로 보낼 수 없으면 우선순위 대기열에서 기다립니다 (같은 우선순위는 먼저 온 순서).
+      맨 앞 요청만 버킷을 쓸 수 있어서, 결제 직전 세션이 둘러보는 세션보다 항상 먼저 나갑니다.
+    - 대기열이 MAX_QUEUE 개로 찼거나 예상 대기 시간이 MAX_WAIT 를 넘으면 기다리지 않고 Overloaded.
+      뒤에 온 높은 우선순위 요청에 계속 밀려 MAX_WAIT 를 넘게 기다린 요청도 Overloaded 로 끝냅니다.
+    - try_acquire() 는 대기열이 비어 있고 버킷에 여유가 있을 때만 통과합니다 (미리 합성, 헤지, 재시도용).
+    """
+
+    def __init__(self, stage: str, config: dict):
+        self.stage = stage
+        burst = config["BURST_SECONDS"] / 60.0
+        self.requests = TokenBucket(config["RPM"], max(1.0, config["RPM"] * burst))
+        self.tokens = TokenBucket(config["TPM"], max(1.0, config["TPM"] * burst)) if config.get("TPM") else None
+        self.max_queue = config["MAX_QUEUE"]
+        self.max_wait = config["MAX_WAIT"]
+        self._waiters = []  # heap of (priority, seq, waiter)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.requests.refill(now)
+        if self.tokens is not None:
+            self.tokens.refill(now)
+
+    def _ready_in(self, requests: float, tokens: float) -> float:
+        delay = self.requests.time_for(requests)
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.time_for(tokens))
+        return delay
+
+    def _take(self, tokens: float):
+        self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+
+    def _wake_head(self):
+        if self._waiters:
+            waiter = self._waiters[0][2]
+            waiter.loop.call_soon_threadsafe(waiter.event.set)
+
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def try_acquire(self, tokens: float = 0) -> bool:
+        with self._lock:
+            if self._waiters:
+                return False
+            self._refill(time.monotonic())
+            if self._ready_in(1, tokens) > 0:
+                return False
+            self._take(tokens)
+            return True
+
+    async def acquire(self, priority: int = None, tokens: float = 0):
+        priority = request_priority.get() if priority is None else priority
+        start = time.monotonic()
+        with self._lock:
+            self._refill(start)
+            if not self._waiters and self._ready_in(1, tokens) == 0:
+                self._take(tokens)
+                ADMISSION_EVENTS.inc(self.stage, "admitted")
+                return
+
+            ahead = [entry for entry in self._waiters if entry[0] <= priority]
+            estimate = self._ready_in(len(ahead) + 1, sum(entry[2].tokens for entry in ahead) + tokens)
+            if len(self._waiters) >= self.max_queue or estimate > self.max_wait:
+                ADMISSION_EVENTS.inc(self.stage, "rejected")
+                raise Overloaded(self.stage, max(1, math.ceil(estimate)))
+
+            waiter = _Waiter(asyncio.get_running_loop(), tokens)
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+            ADMISSION_EVENTS.inc(self.stage, "queued")
+
+        give_up_at = start + self.max_wait
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    delay = give_up_at - now  # 맨 앞이 아니면 앞 요청이 나갈 때까지 기다림
+                    if self._waiters[0][2] is waiter:
+                        self._refill(now)
+                        ready_in = self._ready_in(1, tokens)
+                        if ready_in == 0:
+                            heapq.heappop(self._waiters)
+                            self._take(tokens)
+                            self._wake_head()
+                            break
+                        delay = min(delay, ready_in)
+                    if now >= give_up_at:
+                        ADMISSION_EVENTS.inc(self.stage, "expired")
+                        raise Overloaded(self.stage, max(1, math.ceil(self._ready_in(len(self._waiters), 0))))
+                    waiter.event.clear()
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            # 취소(클라이언트 연결 끊김, deadline)되면 대기열에서 빠지고 다음 요청을 깨웁니다.
+            with self._lock:
+                self._waiters = [entry for entry in self._waiters if entry[2] is not waiter]
+                heapq.heapify(self._waiters)
+                self._wake_head()
+            raise
+        ADMISSION_EVENTS.inc(self.stage, "admitted")
+        ADMISSION_WAIT.observe(time.monotonic() - start, self.stage)
+
+
+class _Waiter:
+    __slots__ = ("loop", "tokens", "event")
+
+    def __init__(self, loop, tokens: float):
+        self.loop = loop
+        self.tokens = tokens
+        self.event = asyncio.Event()
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(stage: str) -> StageScheduler:
+    scheduler = _schedulers.get(stage)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(stage)
+            if scheduler is None:
+                config = {**settings.SCHEDULER["DEFAULTS"], **settings.SCHEDULER["STAGES"].get(stage, {})}
+                scheduler = _schedulers[stage] = StageScheduler(stage, config)
+    return scheduler
+
+
+def set_request_priority(priority: int):
+    """
+    지금 처리 중인 요청(과 그 안에서 만든 task)의 업스트림 우선순위를 정합니다.
+    """
+    request_priority.set(priority)
+
+
+def admit(stage: str, tokens: float = 0):
+    """
+    동기 호출(미리 합성, CLI)용: 남는 용량이 있을 때만 통과하고, 없으면 기다리지 않고 Overloaded.
+    """
+    if not get_scheduler(stage).try_acquire(tokens):
+        ADMISSION_EVENTS.inc(stage, "shed")
+        raise Overloaded(stage, 1)
@@ -0,0 +1,169 @@
+import json
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+
+class Conversation:
+    """
+    한 키오스크 세션의 대화 기록(messages)과 세션별 상태(state)를 담습니다.
+    """
+
+    def __init__(self, messages=None, state=None):
+        self.messages = messages if messages is not None else []
+        self.state = state if state is not None else {}
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"messages": messages_to_dict(self.messages), "state": self.state},
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Conversation":
+        data = json.loads(raw)
+        return cls(messages_from_dict(data.get("messages", [])), data.get("state", {}))
+
+
+class ConversationStore(ABC):
+    """
+    session_id -> Conversation 저장소의 공통 인터페이스.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def save(self, session_id: str, conversation: Conversation):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    프로세스 내부 LRU 저장소. 오래 쓰이지 않은 세션(idle_timeout 초)과
+    max_sessions 를 넘는 가장 오래된 세션은 자동으로 제거됩니다.
+    """
+
+    def __init__(self, max_sessions: int = 1000, idle_timeout: float = 1800):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()  # session_id -> (conversation, last_seen)
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        # 가장 오래 전에 접근한 세션이 항상 맨 앞에 있습니다.
+        while self._sessions:
+            session_id, (_, last_seen) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.idle_timeout and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def load(self, session_id: str):
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions[session_id] = (entry[0], now)
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def save(self, session_id: str, conversation: Conversation):
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = (conversation, now)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    SQLite 파일 기반 저장소. 같은 파일을 바라보는 여러 gunicorn/uvicorn 워커가
+    하나의 세션을 이어서 처리할 수 있습니다.
+    """
+
+    def __init__(self, path, idle_timeout: float = 1800, purge_every: int = 100):
+        self.path = str(path)
+        self.idle_timeout = idle_timeout
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._saves = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않습니다.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str):
+        row = self._conn().execute(
+            "SELECT data FROM conversations WHERE session_id = ? AND updated_at >= ?",
+            (session_id, time.time() - self.idle_timeout),
+        ).fetchone()
+        return Conversation.from_json(row[0]) if row else None
+
+    def save(self, session_id: str, conversation: Conversation):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO conversations (session_id, data, updated_at) VALUES (?, ?, ?)",
+            (session_id, conversation.to_json(), now),
+        )
+        self._saves += 1
+        if self._saves % self.purge_every == 0:
+            conn.execute("DELETE FROM conversations WHERE updated_at < ?", (now - self.idle_timeout,))
+
+    def delete(self, session_id: str):
+        self._conn().execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """
+    settings.CONVERSATION_STORE 설정에 맞는 저장소를 한 번만 만들어 재사용합니다.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.CONVERSATION_STORE
+                backend = config.get("BACKEND", "memory")
+                idle_timeout = config.get("IDLE_TIMEOUT", 1800)
+                if backend == "sqlite":
+                    _store = SQLiteConversationStore(config["PATH"], idle_timeout=idle_timeout)
+                elif backend == "memory":
+                    _store = InMemoryConversationStore(
+                        max_sessions=config.get("MAX_SESSIONS", 1000),
+                        idle_timeout=idle_timeout,
+                    )
+                else:
+                    raise ValueError(f"Unknown CONVERSATION_STORE backend: {backend}")
+    return _store
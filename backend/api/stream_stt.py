@@ -0,0 +1,152 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import numpy as np
+
+from .llm import aorder_agent, session_priority
+from .profiles import get_profile
+from .scheduler import Overloaded, set_request_priority
+from .audio import encode_wav
+from .stt import alisten_and_transcribe, chunk_seconds, samplerate
+
+# 웹소켓 STT (/ws/stt/)
+#
+# client → server
+#   binary frame : 16 kHz mono PCM int16 little-endian 오디오
+#   text frame   : {"type": "end"}  발화 종료 (서버도 무음으로 종료를 감지함)
+# server → client
+#   {"type": "partial", "text": 지금까지의 전체 문장, "segment": 새로 인식된 부분}
+#   {"type": "final", "text": 전체 문장}
+#   {"type": "reply", "assistant_text": ..., "final": bool}   (?session=<id> 로 연결한 경우)
+#   (?customer=<고객 ID 또는 전화번호> 로 고객 지정, 없는 고객이면 4404 코드로 연결 종료)
+#   {"type": "error", "error": "overloaded", "retry_after": 초}   업스트림이 밀려 이번 구간/발화를 처리하지 못함
+#
+# stt_processing_thread 와 같은 모델: 수신 프레임을 큐에 넣고, 처리 쪽에서
+# chunk_seconds 만큼 모이면 그 구간을 전사합니다.
+
+SILENCE_LEVEL = 0.01
+END_SILENCE_SECONDS = 0.8
+QUEUE_MAX_FRAMES = 256
+
+
+class UtteranceTranscriber:
+    """
+    한 발화 동안 들어오는 오디오를 창(window) 단위로 전사하고 부분 결과를 모읍니다.
+    """
+
+    def __init__(self):
+        self.window_size = int(samplerate * chunk_seconds)
+        self.pending = []
+        self.pending_len = 0
+        self.segments = []
+        self.heard_speech = False
+        self.quiet_samples = 0
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.segments)
+
+    def add(self, samples: np.ndarray) -> bool:
+        """
+        샘플을 추가합니다. 말한 뒤 END_SILENCE_SECONDS 이상 조용하면 True (발화 종료).
+        """
+        self.pending.append(samples)
+        self.pending_len += len(samples)
+        if np.abs(samples).mean() < SILENCE_LEVEL:
+            self.quiet_samples += len(samples)
+        else:
+            self.heard_speech = True
+            self.quiet_samples = 0
+        return self.heard_speech and self.quiet_samples >= samplerate * END_SILENCE_SECONDS
+
+    def window_ready(self) -> bool:
+        return self.pending_len >= self.window_size
+
+    async def transcribe_pending(self):
+        """
+        모인 오디오를 전사해서 새로 인식된 부분을 돌려줍니다 (없으면 "").
+        """
+        if not self.pending:
+            return ""
+        window = np.concatenate(self.pending)
+        self.pending, self.pending_len = [], 0
+        # 👉 Ignore very quiet sounds (for noise removal)
+        if np.abs(window).mean() < SILENCE_LEVEL:
+            return ""
+        segment = await alisten_and_transcribe(encode_wav(window))
+        if segment:
+            self.segments.append(segment)
+        return segment
+
+
+async def websocket_stt(scope, receive, send):
+    """
+    Raw ASGI websocket handler, routed from backend/asgi.py.
+    """
+    query = parse_qs(scope.get("query_string", b"").decode())
+    session_id = query.get("session", [None])[0]
+    profile = get_profile(query.get("customer", [None])[0])
+
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+    if profile is None:
+        await send({"type": "websocket.close", "code": 4404})
+        return
+    await send({"type": "websocket.accept"})
+    set_request_priority(session_priority(session_id))
+
+    frames = asyncio.Queue(maxsize=QUEUE_MAX_FRAMES)
+
+    async def send_json(payload: dict):
+        await send({"type": "websocket.send", "text": json.dumps(payload, ensure_ascii=False)})
+
+    async def reader():
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.disconnect":
+                await frames.put(None)
+                return
+            if event.get("bytes"):
+                pcm = np.frombuffer(event["bytes"], dtype="<i2").astype(np.float32) / 32768.0
+                await frames.put(pcm)
+            elif event.get("text"):
+                try:
+                    message = json.loads(event["text"])
+                except ValueError:
+                    continue
+                if message.get("type") == "end":
+                    await frames.put("end")
+
+    async def finish_utterance(transcriber: UtteranceTranscriber):
+        # 발화마다 지금 주문 단계로 우선순위를 다시 정합니다 (결제에 가까울수록 먼저).
+        set_request_priority(session_priority(session_id))
+        await transcriber.transcribe_pending()
+        text = transcriber.text
+        await send_json({"type": "final", "text": text})
+        if session_id and text:
+            reply, final_flag = await aorder_agent(text, session_id=session_id, profile=profile)
+            await send_json({"type": "reply", "assistant_text": reply, "final": final_flag})
+
+    reader_task = asyncio.create_task(reader())
+    transcriber = UtteranceTranscriber()
+    try:
+        while True:
+            item = await frames.get()
+            if item is None:
+                break
+            try:
+                if isinstance(item, str) or transcriber.add(item):
+                    await finish_utterance(transcriber)
+                    transcriber = UtteranceTranscriber()
+                    continue
+                if transcriber.window_ready():
+                    segment = await transcriber.transcribe_pending()
+                    if segment:
+                        await send_json({"type": "partial", "text": transcriber.text, "segment": segment})
+            except Overloaded as e:
+                await send_json({"type": "error", "error": "overloaded", "retry_after": e.retry_after})
+                transcriber = UtteranceTranscriber()
+    finally:
+        reader_task.cancel()
@@ -1,190 +1,113 @@
 import os
-import sys
-import numpy as np
-import queue
+import logging
+import asyncio
 import threading
-import time
-import tempfile
-import soundfile as sf
-import sounddevice as sd
-
-from openai import OpenAI
-from collections import deque
-
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
-    
-# 1) query_devices() 로 인덱스 확인 (한 번만 하면 됩니다)
-print(sd.query_devices())
-#    ... MacBook Pro Microphone 이 0번이면 ...
-#mic_index = 2
-
-# 2) 기본 입력 장치로 설정
-# (출력은 지정할 필요 없으면 None)
-# sd.default.device = (mic_index, None)
-sd.default.device = (None, None)
-
-audio_queue = queue.Queue()
-samplerate = 16000
-block_size = 4000
 
-caption_history = deque(maxlen=5)
-current_caption = ""
-caption_lock = threading.Lock()
+from asgiref.sync import async_to_sync
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 
-# 종료어 설정
-exit_keyword = "stop"  # 종료어 설정 (여기서는 'stop')
+from .clients import get_async_openai_client
+from .metrics import timed
+from .resilience import guarded
+from .scheduler import Overloaded
 
-def audio_callback(indata, frames, time, status):
-    if status:
-        print(f"Status: {status}", file=sys.stderr)
-    audio_queue.put(indata.copy())
+logger = logging.getLogger(__name__)
 
+# 전사 창 설정 (마이크 CLI api/captions.py 와 웹소켓 STT 가 같이 씀)
+samplerate = 16000
+chunk_seconds = 3.0
 
-def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
+_preprocess_pool = None
+_preprocess_pool_lock = threading.Lock()
 
 
-def update_captions():
-    clear_screen()
-    print("\n\n\n")
-    print("=" * 60)
-    print("🎙️ Real-time Speech-to-Text Captions (Press Ctrl+C to exit)")
-    print("=" * 60)
+def get_preprocess_pool() -> ProcessPoolExecutor:
+    global _preprocess_pool
+    if _preprocess_pool is None:
+        with _preprocess_pool_lock:
+            if _preprocess_pool is None:
+                workers = int(os.getenv("STT_PREPROCESS_WORKERS", "2"))
+                _preprocess_pool = ProcessPoolExecutor(max_workers=workers)
+    return _preprocess_pool
 
-    for prev in list(caption_history)[:-1]:
-        print(f"\033[90m{prev}\033[0m")
 
-    if caption_history:
-        print(list(caption_history)[-1])
+async def apreprocess_audio(data: bytes):
+    # numpy/soundfile 은 전처리를 처음 할 때 불러옵니다 (서버 시작을 느리게 하지 않도록).
+    from .audio import preprocess_audio
+    loop = asyncio.get_running_loop()
+    with timed("preprocess"):
+        return await loop.run_in_executor(get_preprocess_pool(), preprocess_audio, data)
 
-    if current_caption:
-        print(f"\033[1m{current_caption}\033[0m", end="▋\n")
-    else:
-        print("▋")
-    print("=" * 60)
 
+@contextmanager
+def open_audio(audio):
+    """
+    STT 입력을 OpenAI 클라이언트의 file= 인자로 넘길 수 있는 형태로 바꿉니다.
+    - 파일 경로(str/Path): 파일을 열어서 전달 (CLI 용)
+    - bytes/bytearray/memoryview: 메모리 버퍼 그대로 전달
+    - Django UploadedFile / BytesIO 등 file-like: 디스크에 다시 쓰지 않고 그대로 전달
+    """
+    if isinstance(audio, (str, os.PathLike)):
+        with open(audio, "rb") as audio_file:
+            yield audio_file
+        return
+    if isinstance(audio, memoryview):
+        audio = audio.tobytes()
+    if isinstance(audio, (bytes, bytearray)):
+        yield ("input.wav", audio)
+        return
+
+    # Whisper 는 파일 이름의 확장자로 형식을 판단하므로 이름을 함께 넘깁니다.
+    name = os.path.basename(getattr(audio, "name", None) or "input.wav")
+    fileobj = getattr(audio, "file", audio)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    yield (name, fileobj)
+
+
+def audio_payload(audio) -> tuple:
+    """
+    (파일 이름, bytes). 헤지/재시도로 같은 오디오를 여러 번 보낼 수 있도록 한 번만 읽어 둡니다.
+    """
+    with open_audio(audio) as audio_file:
+        if isinstance(audio_file, tuple):
+            name, data = audio_file
+            return name, data if isinstance(data, (bytes, bytearray)) else data.read()
+        return os.path.basename(audio_file.name), audio_file.read()
 
-def audio_collection_thread():
-    try:
-        with sd.InputStream(samplerate=samplerate, channels=1, 
-                          callback=audio_callback, blocksize=block_size):
-            print("🎙️ Real-time STT is starting... Please wait.")
-            while True:
-                time.sleep(0.1)
-    except Exception as e:
-        print(f"Audio stream error: {e}", file=sys.stderr)
-    except KeyboardInterrupt:
-        pass
 
+def describe_audio(audio) -> str:
+    if isinstance(audio, (str, os.PathLike)):
+        return str(audio)
+    return f"<in-memory {type(audio).__name__}>"
 
-def stt_processing_thread():
-    global current_caption
-    buffer = np.zeros((0, 1), dtype=np.float32)
-    max_buffer_size = samplerate * 5
-    stop_detected = False  # 종료어가 이미 감지되었는지 여부
 
-    try:
-        while True:
-            try:
-                data = audio_queue.get(timeout=1)
-                buffer = np.concatenate((buffer, data), axis=0)
-
-                if len(buffer) > max_buffer_size:
-                    buffer = buffer[-max_buffer_size:]
-
-                chunk_size = int(samplerate * 3.0)
-                if len(buffer) >= chunk_size:
-                    # 👉 Ignore very quiet sounds (for noise removal)
-                    if np.abs(buffer).mean() < 0.01:
-                        buffer = np.zeros((0, 1), dtype=np.float32)
-                        continue
-                    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-                        sf.write(f.name, buffer[:chunk_size], samplerate)
-                        audio_file = open(f.name, "rb")
-                        response = client.audio.transcriptions.create(
-                            model="whisper-1",
-                            file=audio_file,
-                            language="en"
-                        )
-                        audio_file.close()
-                        os.unlink(f.name)
-
-                    text = response.text.strip()
-                    # 👉 Ignore very short or meaningless texts
-                    if not text:
-                        buffer = np.zeros((0, 1), dtype=np.float32)
-                        continue
-
-                    with caption_lock:
-                        if not current_caption or text[0].isupper() or any(current_caption.endswith(p) for p in ['.', '!', '?', '。', '！', '？']):
-                            if current_caption:
-                                caption_history.append(current_caption)
-                            current_caption = text
-                        else:
-                            current_caption += " " + text
-                    
-                    # 종료어를 확인하여 프로그램 종료
-                    if exit_keyword.lower() in text.lower() and not stop_detected:
-                        stop_detected = True  # 종료어가 감지되었음을 기록
-                        print("\n🛑 Exit keyword detected. Shutting down...")
-                        with open("captions.txt", "w") as f:
-                            for caption in caption_history:
-                                f.write(caption + "\n")
-                            if exit_keyword.lower() not in current_caption.lower():
-                                f.write(current_caption + "\n")
-                        os._exit(0)
-                        
-                    update_captions()
-                    buffer = np.zeros((0, 1), dtype=np.float32)
-
-                audio_queue.task_done()
-            except queue.Empty:
-                continue
-    except KeyboardInterrupt:
-        pass
-
-
-def listen_and_transcribe(audio_path: str) -> str:
+async def alisten_and_transcribe(audio) -> str:
     """
-    주어진 .wav 오디오 파일을 Whisper API로 텍스트로 변환합니다.
+    오디오(파일 경로 또는 메모리 버퍼/업로드 파일)를 Whisper API로 텍스트로 변환합니다 (AsyncOpenAI 사용).
     """
-    print(f"🎧 Running STT on: {audio_path}")
+    logger.info(f"🎧 Running STT on: {describe_audio(audio)}")
     try:
-        with open(audio_path, "rb") as audio_file:
-            response = client.audio.transcriptions.create(
+        payload = audio_payload(audio)
+        with timed("stt"):
+            response = await guarded("stt", lambda: get_async_openai_client().audio.transcriptions.create(
                 model="whisper-1",
-                file=audio_file,
+                file=payload,
                 language="en"
-            )
+            ))
         text = response.text.strip()
-        print(f"📝 인식된 텍스트: {text}")
+        logger.info(f"📝 인식된 텍스트: {text}")
         return text
+    except Overloaded:
+        raise
     except Exception as e:
-        print(f"❌ STT error: {e}")
+        logger.error(f"❌ STT error: {e}")
         return ""
-    
 
-if __name__ == "__main__":
-    try:
-        clear_screen()
-
-        t1 = threading.Thread(target=audio_collection_thread)
-        t2 = threading.Thread(target=stt_processing_thread)
-
-        t1.daemon = True
-        t2.daemon = True
-
-        t1.start()
-        t2.start()
 
-        update_captions()
-
-        while True:
-            time.sleep(0.1)
-
-    except KeyboardInterrupt:
-        clear_screen()
-        print("\n🛑 Program is shutting down...")
-        time.sleep(0.5)
-        print("👋 Shutdown complete")
\ No newline at end of file
+def listen_and_transcribe(audio) -> str:
+    """
+    스크립트/셸용 동기 버전: alisten_and_transcribe 를 자체 이벤트 루프에서 돌립니다.
+    """
+    return async_to_sync(alisten_and_transcribe)(audio)
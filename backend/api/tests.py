@@ -1,3 +1,783 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from langchain_core.messages import AIMessage, HumanMessage
+
+from api import dialog
+from api.audio_cache import AudioCache
+from api.dialog import OrderFlow
+from api.history import compact_history, count_tokens
+from api.menu import MenuCatalog, normalize
+from api.order_events import order_events
+from api.orders import OrderFeed
+from api.outbox import OrderOutbox
+from api.pipeline import SpeechPipeline
+from api.prefetch import Prefetcher
+from api.resilience import CircuitOpenError, StageGuard
+from api.scheduler import Overloaded, StageScheduler, request_priority
+from api.tts import tts_cache_key
+
+
+class UtteranceTranscriberTests(SimpleTestCase):
+    """
+    웹소켓 STT(api/stream_stt.py): 모듈이 import 되는지, 창 단위 전사/발화 종료 감지가 되는지.
+    STT 호출은 가짜로 바꿉니다.
+    """
+
+    def setUp(self):
+        from api import stream_stt
+        self.stream_stt = stream_stt
+        self.transcribed = []
+
+        async def fake_transcribe(audio):
+            self.transcribed.append(audio.read())
+            return f"segment {len(self.transcribed)}"
+
+        patcher = mock.patch.object(stream_stt, "alisten_and_transcribe", fake_transcribe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def speech(self, seconds: float) -> np.ndarray:
+        return np.full(int(self.stream_stt.samplerate * seconds), 0.2, dtype=np.float32)
+
+    def silence(self, seconds: float) -> np.ndarray:
+        return np.zeros(int(self.stream_stt.samplerate * seconds), dtype=np.float32)
+
+    async def test_transcribes_full_windows(self):
+        transcriber = self.stream_stt.UtteranceTranscriber()
+        self.assertFalse(transcriber.add(self.speech(1.0)))
+        self.assertFalse(transcriber.window_ready())
+        transcriber.add(self.speech(self.stream_stt.chunk_seconds))
+        self.assertTrue(transcriber.window_ready())
+
+        segment = await transcriber.transcribe_pending()
+        self.assertEqual(segment, "segment 1")
+        self.assertTrue(self.transcribed[0].startswith(b"RIFF"))  # WAV 로 인코딩해서 넘김
+        self.assertFalse(transcriber.window_ready())
+
+        transcriber.add(self.speech(0.5))
+        await transcriber.transcribe_pending()
+        self.assertEqual(transcriber.text, "segment 1 segment 2")
+
+    async def test_silent_window_is_not_sent(self):
+        transcriber = self.stream_stt.UtteranceTranscriber()
+        transcriber.add(self.silence(self.stream_stt.chunk_seconds))
+        self.assertEqual(await transcriber.transcribe_pending(), "")
+        self.assertEqual(self.transcribed, [])
+
+    def test_end_of_utterance_after_silence(self):
+        transcriber = self.stream_stt.UtteranceTranscriber()
+        # 말하기 전의 무음만으로는 끝나지 않음
+        self.assertFalse(transcriber.add(self.silence(2.0)))
+        self.assertFalse(transcriber.add(self.speech(0.5)))
+        self.assertFalse(transcriber.add(self.silence(self.stream_stt.END_SILENCE_SECONDS / 2)))
+        self.assertTrue(transcriber.add(self.silence(self.stream_stt.END_SILENCE_SECONDS)))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """
+    api/resilience.py: 연속 실패로 열린 회로가 시험 호출(half-open)로 다시 닫히는지.
+    """
+
+    def make_guard(self):
+        config = {
+            "DEADLINE": 5.0, "HEDGE_AFTER": None, "HEDGE_PERCENTILE": 95, "MIN_SAMPLES": 20,
+            "RETRIES": 0, "BACKOFF": 0.0, "FAILURE_THRESHOLD": 1, "RESET_TIMEOUT": 0.0,
+        }
+        return StageGuard("test", config)
+
+    async def test_cancelled_probe_does_not_keep_circuit_open(self):
+        guard = self.make_guard()
+        guard.breaker.reset_timeout = 60.0  # 열린 상태를 먼저 확인
+
+        async def fail():
+            raise RuntimeError("upstream down")
+
+        with self.assertRaises(RuntimeError):
+            await guard.call(fail)
+        self.assertEqual(guard.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            await guard.call(fail)
+
+        # 바로 half-open: 다음 호출 하나만 시험 호출로 통과합니다.
+        guard.breaker.reset_timeout = 0.0
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+
+        probe = asyncio.create_task(guard.call(hang))
+        await started.wait()
+        with self.assertRaises(CircuitOpenError):  # 시험 호출이 진행 중이면 다른 호출은 막힘
+            await guard.call(fail)
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+
+        async def succeed():
+            return "ok"
+
+        self.assertEqual(await guard.call(succeed), "ok")
+        self.assertEqual(guard.breaker.state, "closed")
+
+    async def test_failed_probe_reopens_circuit(self):
+        guard = self.make_guard()
+
+        async def fail():
+            raise RuntimeError("upstream down")
+
+        with self.assertRaises(RuntimeError):
+            await guard.call(fail)
+        with self.assertRaises(RuntimeError):  # half-open 시험 호출도 실패
+            await guard.call(fail)
+        guard.breaker.reset_timeout = 60.0
+        with self.assertRaises(CircuitOpenError):
+            await guard.call(fail)
+
+
+class OrderFlowTests(SimpleTestCase):
+    """
+    api/dialog.py: LLM 없이 처리하는 주문 흐름.
+    """
+
+    catalog = MenuCatalog(
+        total_menu=[
+            {"menu": "Caffe Latte", "price": 4500},
+            {"menu": "Vanilla Latte", "price": 5000},
+            {"menu": "Caffe Mocha", "price": 5500},
+            {"menu": "Cold Brew", "price": 4900},
+        ],
+        saved_menu=[
+            {"nickname": "Morning Boost", "menu": "Caffe Latte", "temp": "Iced",
+             "extra": "Vanilla Syrup", "size": "Grande", "price": 4500},
+        ],
+        favorite_drinks=["Caffe Latte", "Cold Brew"],
+    )
+
+    def setUp(self):
+        self.flow = OrderFlow({}, self.catalog)
+
+    def say(self, *utterances) -> str:
+        reply = None
+        for text in utterances:
+            reply = self.flow.handle(text)
+        return reply
+
+    def test_menu_order_asks_each_field_in_turn(self):
+        self.assertEqual(self.say("I'd like a vanilla latte"), dialog.ASK_TEMP)
+        self.assertEqual(self.flow.order["menu"], "Vanilla Latte")
+        self.assertEqual(self.say("iced please"), dialog.ASK_EXTRA)
+        self.assertEqual(self.say("no thanks"), dialog.ASK_SIZE)
+        self.assertEqual(self.say("large"), dialog.ASK_ANYTHING_ELSE)
+        self.assertEqual(self.say("that's it"), dialog.ASK_ETA)
+        self.assertEqual(self.say("about fifteen minutes"), dialog.ASK_PAYMENT)
+        self.assertEqual(self.say("proceed to payment"), dialog.THANK_YOU)
+        self.assertEqual(self.flow.step, dialog.DONE)
+        self.assertEqual(
+            self.flow.draft().model_dump(),
+            {"menu": "Vanilla Latte", "temp": "Iced", "size": "Venti", "extra": "",
+             "price": 5000, "eta_minutes": 15},
+        )
+
+    def test_options_said_with_the_menu(self):
+        self.assertEqual(self.say("iced caffe latte grande"), dialog.ASK_EXTRA)
+        self.assertEqual((self.flow.order["temp"], self.flow.order["size"]), ("Iced", "Grande"))
+        self.assertEqual(self.say("no thanks"), dialog.ASK_ANYTHING_ELSE)
+
+    def test_menu_name_words_are_not_options(self):
+        self.assertEqual(self.say("cold brew"), dialog.ASK_TEMP)
+        self.flow = OrderFlow({}, self.catalog)
+        self.assertEqual(self.say("hot vanilla latte with whipped cream"), dialog.ASK_SIZE)
+        self.assertEqual(self.flow.order["extra"], "Whipped Cream")
+
+    def test_extras_with_counts(self):
+        self.say("caffe mocha", "hot")
+        self.assertEqual(self.say("two shots of espresso and whipped cream"), dialog.ASK_SIZE)
+        self.assertEqual(self.flow.order["extra"], "Whipped Cream, two Espresso Shot")
+
+    def test_nickname_fills_the_saved_order(self):
+        self.assertEqual(self.say("my saved menu"), dialog.ASK_NICKNAME)
+        self.assertEqual(self.say("morning boot"), f"{MenuCatalog.describe_saved(self.catalog.saved_menu[0])}. Is this correct?")
+        self.assertEqual(self.say("yes"), dialog.ASK_ETA)
+        self.assertEqual(self.say("10"), dialog.ASK_PAYMENT)
+        self.assertEqual(self.say("confirm"), dialog.THANK_YOU)
+        self.assertEqual(self.flow.order["size"], "Grande")
+
+    def test_unknown_nickname_goes_to_llm(self):
+        self.say("nickname")
+        self.assertIsNone(self.say("evening calm"))  # LLM 이 답함
+        self.assertEqual(self.flow.step, dialog.NICKNAME)
+
+    def test_recommendation_then_choice(self):
+        reply = self.say("what do you recommend")
+        self.assertTrue(reply.startswith("I recommend "))
+        self.assertEqual(self.flow.step, dialog.MENU)
+        self.assertEqual(self.say("cold brew"), dialog.ASK_TEMP)
+        self.assertEqual(self.flow.order["menu"], "Cold Brew")
+
+    def test_unrecognized_answer_goes_to_llm(self):
+        self.say("caffe latte")
+        self.assertIsNone(self.say("hmm what do you think"))
+        self.assertEqual(self.flow.step, dialog.TEMP)
+
+    def test_early_payment_asks_missing_fields_first(self):
+        self.say("caffe mocha")
+        self.assertEqual(self.say("can I pay by card?"), dialog.ASK_TEMP)
+        self.assertEqual(self.say("10 minutes"), None)  # Hot/Iced 질문의 답이 아님
+        self.assertEqual(self.say("ok pay"), dialog.ASK_TEMP)
+        self.assertNotEqual(self.flow.step, dialog.DONE)
+        self.assertEqual(self.say("hot", "none", "tall"), dialog.ASK_ANYTHING_ELSE)
+        # 결제 말과 함께 온 답은 지금 질문의 답으로 먼저 받습니다.
+        self.assertEqual(self.say("nothing, let's pay"), dialog.ASK_ETA)
+        self.assertEqual(self.say("ten minutes and then pay"), dialog.THANK_YOU)
+        self.assertEqual(self.flow.step, dialog.DONE)
+        self.assertEqual(self.flow.draft().temp, "Hot")
+
+    def test_payment_reply_after_llm_turn_needs_complete_order(self):
+        self.flow.apply_update({"menu": "Caffe Latte", "eta_minutes": 5})
+        self.assertEqual(self.flow.observe_reply("", "proceed to payment"), dialog.ASK_TEMP)
+        self.assertEqual(self.flow.step, dialog.TEMP)
+
+        self.flow.apply_update({"temp": "Hot", "extra": "", "size": "Tall"})
+        self.flow.state["step"] = dialog.PAYMENT
+        self.assertEqual(self.flow.observe_reply("Sure.", "go ahead and pay"), dialog.THANK_YOU)
+        self.assertEqual(self.flow.step, dialog.DONE)
+
+
+    def test_llm_payment_question_with_missing_fields_resyncs(self):
+        reply = self.flow.observe_reply("Great! Would you like to proceed to payment?", "just a coffee")
+        self.assertEqual(reply, dialog.ASK_MENU)
+        self.assertEqual(self.flow.step, dialog.MENU)
+
+        self.say("caffe latte", "hot", "no")
+        self.assertEqual(self.flow.observe_reply("How many minutes until you arrive?", "um"), dialog.ASK_SIZE)
+        self.assertEqual(self.say("tall", "no", "five"), dialog.ASK_PAYMENT)
+
+
+class MenuCatalogTests(SimpleTestCase):
+    """
+    api/menu.py: 메뉴/닉네임 색인.
+    """
+
+    catalog = MenuCatalog(
+        total_menu=[{"menu": name, "price": 5000} for name in
+                    ("Caramel Macchiato", "Caffe Latte", "Vanilla Latte", "Caffe Mocha", "Americano", "Latte")],
+        saved_menu=[{"nickname": "Morning Boost", "menu": "Caffe Latte"}],
+        favorite_drinks=[],
+    )
+
+    def menu(self, text: str):
+        item = self.catalog.match_menu(normalize(text))
+        return item["menu"] if item else None
+
+    def test_exact_names_prefer_the_longest(self):
+        self.assertEqual(self.menu("vanilla latte please"), "Vanilla Latte")
+        self.assertEqual(self.menu("I want a latte"), "Latte")
+        self.assertEqual(self.catalog.lookup("CAFFE-LATTE")["menu"], "Caffe Latte")
+
+    def test_stt_misspellings(self):
+        self.assertEqual(self.menu("carmel makiato please"), "Caramel Macchiato")
+        self.assertEqual(self.menu("cafe moca"), "Caffe Mocha")
+        self.assertEqual(self.catalog.match_nickname("morning boot")["nickname"], "Morning Boost")
+
+    def test_unrelated_words_do_not_match(self):
+        for text in ("make it quick", "hello there", "lemonade"):
+            self.assertIsNone(self.menu(text), text)
+            self.assertEqual(self.catalog.candidates(normalize(text)), [])
+
+    def test_prompt_context_lists_only_candidates(self):
+        context = self.catalog.prompt_context(normalize("cafe moca"))
+        self.assertIn("Caffe Mocha (5000 won)", context)
+        self.assertNotIn("Americano", context)
+        self.assertIn("Americano", self.catalog.prompt_context("hello"))  # 후보가 없으면 메뉴 이름 목록
+
+    def test_saved_menu_without_nickname_is_reported(self):
+        with self.assertLogs("api.menu", "WARNING"):
+            catalog = MenuCatalog([], [{":nickname": "Afternoon Delight", "menu": "Caffe Mocha"}], [])
+        self.assertEqual(catalog.saved_menu, [])
+
+
+class OrderOutboxTests(SimpleTestCase):
+    """
+    api/outbox.py: MongoDB 로 보내는 동안 같은 주문이 다시 기록돼도 새 버전을 잃지 않는지.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.outbox = OrderOutbox(f"{directory.name}/outbox.sqlite3")
+        self.outbox.start = lambda: None  # 백그라운드 스레드 없이 flush_once 를 직접 부름
+        self.collection = mock.Mock()
+        patcher = mock.patch("api.outbox.get_order_collection", return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_update_during_flush_is_sent_next_time(self):
+        self.outbox.enqueue({"_id": "o1", "status": "pending"})
+        sent = []
+
+        def bulk_write(operations, ordered):
+            sent.append(self.outbox.unsent_documents()[0]["status"])
+            if len(sent) == 1:
+                # 바리스타가 상태를 바꾼 것이 전송 중에 들어옴
+                self.outbox.enqueue({"_id": "o1", "status": "ready"})
+
+        self.collection.bulk_write.side_effect = bulk_write
+        self.assertEqual(self.outbox.flush_once(), 1)
+        self.assertEqual(self.outbox.pending_count(), 1)
+        self.assertEqual(self.outbox.flush_once(), 1)
+        self.assertEqual(self.outbox.pending_count(), 0)
+        self.assertEqual(sent, ["pending", "ready"])
+
+    def test_failed_flush_is_retried_later(self):
+        self.outbox.enqueue({"_id": "o1", "status": "pending"})
+        self.collection.bulk_write.side_effect = ConnectionError("mongo down")
+        self.assertEqual(self.outbox.flush_once(), 0)
+        self.assertEqual(self.outbox.pending_count(), 1)
+        self.assertEqual(self.outbox.flush_once(), 0)  # 백오프 중이라 아직 보내지 않음
+        self.assertEqual(self.collection.bulk_write.call_count, 1)
+
+
+@override_settings(ORDERS={**settings.ORDERS, "BARISTA_TOKEN": "barista-secret"})
+class OrderQueueAuthTests(SimpleTestCase):
+    """
+    주문 목록/이벤트/상태 변경은 바리스타 토큰이 있어야 합니다.
+    """
+
+    order = {"_id": "o1", "customer": "Kim", "number": "010-1234-5678", "status": "pending", "updated_at": 1.0}
+
+    def setUp(self):
+        for name, value in (("list_orders", [self.order]), ("update_order_status", {**self.order, "status": "ready"})):
+            patcher = mock.patch(f"api.views.{name}", return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_list_requires_token(self):
+        response = await self.async_client.get("/api/orders/?status=all")
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get("/api/orders/", headers={"Authorization": "Bearer wrong"})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get("/api/orders/", headers={"Authorization": "Bearer barista-secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["orders"], [self.order])
+
+    async def test_status_change_requires_token(self):
+        body = json.dumps({"status": "cancelled"})
+        response = await self.async_client.post("/api/orders/o1/", body, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post("/api/orders/o1/", body, content_type="application/json",
+                                                headers={"Authorization": "Bearer barista-secret"})
+        self.assertEqual(response.status_code, 200)
+
+    async def test_events_are_not_served_under_wsgi(self):
+        # Django 까지 온 요청(= asgi.py 의 raw 핸들러를 거치지 않음)은 끊김을 알 수 없으므로 열지 않습니다.
+        response = await self.async_client.get("/api/orders/events/?token=barista-secret")
+        self.assertEqual(response.status_code, 501)
+
+    async def test_closed_without_configured_token(self):
+        with self.settings(ORDERS={**settings.ORDERS, "BARISTA_TOKEN": None}):
+            response = await self.async_client.get("/api/orders/", headers={"Authorization": "Bearer "})
+        self.assertEqual(response.status_code, 403)
+
+
+class SaveAudioTests(SimpleTestCase):
+    """
+    api/tts.py save_audio: 같은 내용이면 intro.mp3 같은 고정 파일을 다시 쓰지 않습니다.
+    """
+
+    def test_rewrites_only_changed_content(self):
+        from api.tts import save_audio
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            path = save_audio(b"first", "intro")
+            written = path.stat().st_mtime_ns
+            with mock.patch("api.tts.atomic_write_bytes") as write:
+                save_audio(b"first", "intro")
+                write.assert_not_called()
+            self.assertEqual(path.stat().st_mtime_ns, written)
+            save_audio(b"second", "intro")
+            self.assertEqual(path.read_bytes(), b"second")
+
+
+class StageSchedulerTests(SimpleTestCase):
+    """
+    api/scheduler.py: 우선순위 순서로 승인하고, 기다릴 수 없으면 Overloaded.
+    """
+
+    def scheduler(self, **config):
+        return StageScheduler("llm", {"RPM": 600, "TPM": None, "BURST_SECONDS": 0.1,
+                                      "MAX_QUEUE": 10, "MAX_WAIT": 2.0, **config})
+
+    async def test_waiters_are_admitted_by_priority(self):
+        scheduler = self.scheduler()  # 0.1 초에 하나, 버스트 1
+        await scheduler.acquire(priority=0)
+        admitted = []
+
+        async def wait(priority):
+            await scheduler.acquire(priority=priority)
+            admitted.append(priority)
+
+        tasks = []
+        for priority in (7, 0, 3, 0):
+            tasks.append(asyncio.create_task(wait(priority)))
+            await asyncio.sleep(0)  # 이 순서대로 대기열에 들어가게
+        self.assertEqual(scheduler.queue_depth(), 4)
+        await asyncio.gather(*tasks)
+        self.assertEqual(admitted, [0, 0, 3, 7])
+
+    async def test_full_queue_is_overloaded(self):
+        scheduler = self.scheduler(MAX_QUEUE=1)
+        await scheduler.acquire()
+        waiting = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0)
+        with self.assertRaises(Overloaded) as raised:
+            await scheduler.acquire()
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        await waiting
+
+    async def test_wait_longer_than_max_wait_is_overloaded(self):
+        scheduler = self.scheduler(RPM=60, MAX_WAIT=0.5)  # 다음 자리까지 1 초
+        await scheduler.acquire()
+        with self.assertRaises(Overloaded):
+            await scheduler.acquire()
+        self.assertEqual(scheduler.queue_depth(), 0)
+        self.assertFalse(scheduler.try_acquire())
+
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        scheduler = self.scheduler()
+        await scheduler.acquire()
+        waiting = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(scheduler.queue_depth(), 0)
+
+
+class TTSViewTests(SimpleTestCase):
+    """
+    intro/confirm TTS: 세션 단계 우선순위로 승인받고, 대기열이 차면 스트림을 시작하기 전에 429.
+    """
+
+    async def test_confirm_stream_overloaded_before_headers(self):
+        with mock.patch("api.views.asynthesize_stream", side_effect=Overloaded("tts", 3)):
+            response = await self.async_client.get("/api/confirm-tts", {"text": "One latte.", "stream": "1"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "3")
+
+    async def test_confirm_uses_payment_priority(self):
+        priorities = []
+
+        async def synthesize(text):
+            priorities.append(request_priority.get())
+            raise Overloaded("tts", 2)
+
+        with mock.patch("api.views.asynthesize_bytes", synthesize):
+            response = await self.async_client.get("/api/confirm-tts", {"text": "One latte."})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(priorities, [dialog.STEP_PRIORITY[dialog.PAYMENT]])
+
+
+class SpeechPipelineTests(SimpleTestCase):
+    """
+    api/pipeline.py: 이미 스트리밍해서 읽은 문장을 finish() 에서 다시 읽지 않는지.
+    """
+
+    async def spoken(self, deltas, reply):
+        async def synthesize(sentence):
+            return f"[{sentence}]".encode()
+
+        pipeline = SpeechPipeline(synthesize=synthesize)
+        for delta in deltas:
+            pipeline.feed(delta)
+        pipeline.finish(reply)
+        return (await pipeline.read_all()).decode()
+
+    async def test_streamed_reply_with_surrounding_whitespace(self):
+        spoken = await self.spoken(["\n Sure! One latte", ". Anything else? \n"], "Sure! One latte. Anything else?")
+        self.assertEqual(spoken, "[Sure!][One latte.][Anything else?]")
+
+    async def test_local_reply_continues_streamed_text(self):
+        spoken = await self.spoken([" Which size"], "Which size would you like?")
+        self.assertEqual(spoken, "[Which size would you like?]")
+
+    async def test_different_reply_is_appended(self):
+        spoken = await self.spoken(["Okay. "], "Please confirm payment.")
+        self.assertEqual(spoken, "[Okay.][Please confirm payment.]")
+
+
+class ServeMediaTests(SimpleTestCase):
+    """
+    api/media.py serve_media: ETag 재검증과 Range 요청.
+    """
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        clips = f"{media_root.name}/clips"
+        override = self.settings(MEDIA_ROOT=media_root.name, MEDIA_CLIPS={**settings.MEDIA_CLIPS, "DIR": clips})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.key = "a" * 64
+        Path(clips).mkdir()
+        Path(clips, f"{self.key}.mp3").write_bytes(b"0123456789")
+        Path(media_root.name, "intro.mp3").write_bytes(b"intro")
+
+    def test_clip_is_immutable_and_revalidates_with_etag(self):
+        response = self.client.get(f"/media/clips/{self.key}.mp3")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], f'"{self.key}"')
+        self.assertIn("immutable", response["Cache-Control"])
+
+        response = self.client.get(f"/media/clips/{self.key}.mp3", headers={"If-None-Match": f'"{self.key}"'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_fixed_file_is_revalidated(self):
+        response = self.client.get("/media/intro.mp3")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        etag = response["ETag"]
+        self.assertEqual(self.client.get("/media/intro.mp3", headers={"If-None-Match": etag}).status_code, 304)
+        Path(settings.MEDIA_ROOT, "intro.mp3").write_bytes(b"new intro")
+        self.assertEqual(self.client.get("/media/intro.mp3", headers={"If-None-Match": etag}).status_code, 200)
+
+    def test_range_requests(self):
+        url = f"/media/clips/{self.key}.mp3"
+        for byte_range, body, content_range in (
+            ("bytes=2-5", b"2345", "bytes 2-5/10"),
+            ("bytes=7-", b"789", "bytes 7-9/10"),
+            ("bytes=-3", b"789", "bytes 7-9/10"),
+            ("bytes=8-100", b"89", "bytes 8-9/10"),
+        ):
+            response = self.client.get(url, headers={"Range": byte_range})
+            self.assertEqual(response.status_code, 206, byte_range)
+            self.assertEqual(response.content, body)
+            self.assertEqual(response["Content-Range"], content_range)
+
+        for byte_range in ("bytes=10-", "bytes=5-2", "bytes=-"):
+            response = self.client.get(url, headers={"Range": byte_range})
+            self.assertEqual(response.status_code, 416, byte_range)
+            self.assertEqual(response["Content-Range"], "bytes */10")
+
+        # If-Range 가 다르면(파일이 바뀜) 전체를 보냄
+        response = self.client.get(url, headers={"Range": "bytes=0-1", "If-Range": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_paths_outside_media_root_are_not_found(self):
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/clips/missing.mp3").status_code, 404)
+
+
+class CompactHistoryTests(SimpleTestCase):
+    """
+    api/history.py compact_history: 토큰 예산 안의 최근 턴만, 항상 사용자 발화부터.
+    """
+
+    messages = [
+        AIMessage(content="Welcome! Choose between normal ordering, recommendation, or nickname."),
+        HumanMessage(content="normal order please"),
+        AIMessage(content="What menu item would you like?"),
+        HumanMessage(content="a caffe latte"),
+        AIMessage(content="Hot or Iced?"),
+        HumanMessage(content="iced"),
+        AIMessage(content="Any extras?"),
+    ]
+
+    def tokens(self, messages) -> int:
+        return sum(count_tokens(m) for m in messages)
+
+    def test_keeps_recent_turns_within_budget(self):
+        budget = self.tokens(self.messages[3:])
+        self.assertEqual(compact_history(self.messages, budget, min_turns=0), self.messages[3:])
+        self.assertEqual(compact_history(self.messages, budget - 1, min_turns=0), self.messages[5:])
+
+    def test_everything_fits(self):
+        kept = compact_history(self.messages, self.tokens(self.messages), min_turns=0)
+        self.assertEqual(kept, self.messages[1:])  # 첫 사용자 발화 앞의 인사말은 잘림
+
+    def test_min_turns_survive_a_tiny_budget(self):
+        self.assertEqual(compact_history(self.messages, 1, min_turns=2), self.messages[3:])
+        self.assertEqual(compact_history(self.messages, 1, min_turns=0), [])
+        self.assertEqual(compact_history([], 1, min_turns=2), [])
+
+
+class PrefetcherTests(SimpleTestCase):
+    """
+    api/prefetch.py: 예상이 바뀌면 시작 전 작업은 취소하고, 같은 문장은 한 번만 합성합니다.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = AudioCache(directory.name, 10 ** 6)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.synthesized = []
+
+        def synthesize(sentence):
+            self.synthesized.append(sentence)
+            self.started.set()
+            self.release.wait(5)
+            return sentence.encode()
+
+        for name, patch in (("get_tts_cache", {"return_value": self.cache}), ("synthesize_bytes", {"new": synthesize})):
+            patcher = mock.patch(f"api.prefetch.{name}", **patch)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.prefetcher = Prefetcher(max_workers=1)
+        self.addCleanup(self.prefetcher._executor.shutdown)
+        self.addCleanup(self.release.set)
+
+    def test_cancel_and_dedup(self):
+        self.prefetcher.schedule("s1", [dialog.ASK_TEMP])
+        self.assertTrue(self.started.wait(5))  # 하나뿐인 워커가 합성 중
+
+        # s1 의 예상이 바뀜: 이미 시작한 ASK_TEMP 는 끝까지, 새 두 문장은 대기
+        self.prefetcher.schedule("s1", [f"{dialog.ASK_EXTRA} {dialog.ASK_SIZE}"])
+        # s2 도 같은 문장을 기다리면 작업을 새로 만들지 않음
+        self.prefetcher.schedule("s2", [dialog.ASK_EXTRA])
+        self.assertEqual(len(self.prefetcher._inflight), 3)
+
+        # s1 이 떠나도 s2 가 기다리는 ASK_EXTRA 는 남고, 아무도 원하지 않는 ASK_SIZE 는 취소
+        self.prefetcher.schedule("s1", [])
+        extra = self.prefetcher.pending(dialog.ASK_EXTRA)
+        self.assertIsNone(self.prefetcher.pending(dialog.ASK_SIZE))
+        # 실제 답변이 기다리는 작업(pending)은 예상이 바뀌어도 취소하지 않음
+        self.prefetcher.schedule("s2", [])
+
+        self.release.set()
+        self.assertEqual(extra.result(5), dialog.ASK_EXTRA.encode())
+        self.assertEqual(self.synthesized, [dialog.ASK_TEMP, dialog.ASK_EXTRA])
+
+    def test_cached_sentences_are_skipped(self):
+        self.cache.put(tts_cache_key(dialog.ASK_TEMP), b"cached")
+        self.prefetcher.schedule("s1", [dialog.ASK_TEMP])
+        self.assertEqual(self.prefetcher._inflight, {})
+
+
+class ConversationStoreTests(SimpleTestCase):
+    def test_incomplete_backend_fails_at_construction(self):
+        from api.sessions import ConversationStore
+
+        class LoadOnlyStore(ConversationStore):
+            def load(self, session_id):
+                return None
+
+        with self.assertRaises(TypeError):
+            LoadOnlyStore()
+
+    def test_in_memory_round_trip(self):
+        from api.sessions import Conversation, InMemoryConversationStore
+
+        store = InMemoryConversationStore()
+        store.save("s1", Conversation(state={"flow": {"step": "temp"}}))
+        self.assertEqual(store.load("s1").state, {"flow": {"step": "temp"}})
+        store.delete("s1")
+        self.assertIsNone(store.load("s1"))
+
+
+class ProfileStoreTests(SimpleTestCase):
+    def test_incomplete_backend_fails_at_construction(self):
+        from api.profiles import ProfileStore
+
+        class LocateOnlyStore(ProfileStore):
+            def _locate(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            LocateOnlyStore()
+
+    def test_sqlite_lookup_by_id_or_phone(self):
+        from api.profiles import SQLiteProfileStore
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteProfileStore(f"{directory}/profiles.sqlite3")
+            store.put({"user_id": "kiosk-guest", "name": "Guest"})  # 전화번호 없음
+            store.put({"user_id": "minsu", "name": "Minsu", "phone_number": "+82-10-1234-5678"})
+
+            self.assertEqual(store.get("010-1234-5678").name, "Minsu")
+            self.assertEqual(store.get("kiosk-guest").name, "Guest")
+            # 숫자가 없는 모르는 ID 가 전화번호 없는 고객과 맞으면 안 됨
+            self.assertIsNone(store.get("unknown-customer"))
+
+
+@override_settings(ORDERS={**settings.ORDERS, "BARISTA_TOKEN": "barista-secret", "HEARTBEAT": 0.05})
+class OrderEventsTests(SimpleTestCase):
+    """
+    api/order_events.py: SSE 연결이 끊기면 구독을 해제하고, 뒤처진 구독자는 끊는지.
+    """
+
+    order = {"_id": "o1", "number": "010", "status": "pending", "eta_at": "2026-10-18T10:00:00", "updated_at": 1.0}
+
+    def setUp(self):
+        self.feed = OrderFeed(queue_size=3)
+        self.feed._run = lambda: None  # MongoDB 감시 스레드 없이 publish() 만 씀
+        for name, value in (("get_order_feed", self.feed), ("list_orders", [self.order])):
+            patcher = mock.patch(f"api.order_events.{name}", return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    def start(self, query: str = "token=barista-secret", headers=()):
+        scope = {"type": "http", "method": "GET", "path": "/api/orders/events/",
+                 "query_string": query.encode(), "headers": list(headers)}
+
+        async def send(message):
+            self.sent.append(message)
+
+        self.incoming.put_nowait({"type": "http.request", "body": b"", "more_body": False})
+        return asyncio.create_task(order_events(scope, self.incoming.get, send))
+
+    def body(self) -> str:
+        return "".join(m["body"].decode() for m in self.sent if m["type"] == "http.response.body")
+
+    async def wait_for(self, text: str):
+        for _ in range(100):
+            if text in self.body():
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"{text!r} not in {self.body()!r}")
+
+    async def test_requires_token(self):
+        await self.start(query="")
+        self.assertEqual(self.sent[0]["status"], 401)
+
+    async def test_disconnect_unsubscribes(self):
+        task = self.start()
+        await self.wait_for("event: snapshot")
+        self.assertEqual(self.sent[0]["status"], 200)
+        self.feed.publish({**self.order, "status": "ready", "updated_at": 2.0})
+        await self.wait_for('"status": "ready"')
+        await self.wait_for(": keepalive")
+        self.assertEqual(len(self.feed._subscribers), 1)
+
+        self.incoming.put_nowait({"type": "http.disconnect"})
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(self.feed._subscribers, set())
+
+    async def test_slow_subscriber_is_disconnected(self):
+        task = self.start()
+        await self.wait_for("event: snapshot")
+        queue = next(iter(self.feed._subscribers))[1]
+        # 이벤트 루프를 양보하지 않고 큐 크기보다 많이 보내면 구독자가 뒤처진 것
+        for n in range(5):
+            self.feed._deliver(queue, {**self.order, "updated_at": 10.0 + n})
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(self.feed._subscribers, set())
+        self.assertFalse(self.sent[-1]["more_body"])
+
+    async def test_reconnect_snapshot_includes_closed_orders(self):
+        with mock.patch("api.order_events.list_orders", return_value=[]) as list_orders:
+            task = self.start(headers=[(b"last-event-id", b"5.0")])
+            await self.wait_for("event: snapshot")
+            list_orders.assert_called_once_with(None, None, 5.0)
+        self.incoming.put_nowait({"type": "http.disconnect"})
+        await asyncio.wait_for(task, 1)
@@ -1,10 +1,15 @@
-import os
-import subprocess
-import json
+import re
+import asyncio
+import threading
 
 from pathlib import Path
-from openai import OpenAI
 from django.conf import settings
+from .audio_cache import AudioCache, atomic_write_bytes, make_cache_key
+from .clients import get_async_openai_client, get_openai_client
+from .history import count_text_tokens
+from .metrics import TTS_CACHE_LOOKUPS, timed
+from .resilience import deadline, guarded
+from .scheduler import admit, get_scheduler
 
 # --- Configuration ---
 LANGUAGE_MODE = "English"   # Language Mode 
@@ -26,100 +31,169 @@ VOICE = "ballad"            # Voice Setting (can change later )
 
 TTS_MODEL = "gpt-4o-mini-tts"
 
-# Initialize OpenAI client
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise EnvironmentError("Please set the OPENAI_API_KEY environment variable.")
-client = OpenAI(api_key=api_key)
+# OpenAI 클라이언트는 api/clients.py 에서 처음 쓸 때 만듭니다 (OPENAI_API_KEY 가 없으면 그때 EnvironmentError).
 
 
-def synthesize_and_play(text: str, filename: str):
+def speech_instructions() -> str:
     """
-    Generate speech from text, save as MP3 (<filename>.mp3), then play.
+    Build the mode-specific speaking instructions for the TTS model.
     """
-    output_path = Path(f"{filename}.mp3")
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    # Build mode-specific instructions
     if SPEECH_MODE == "Child":
-        instr = (
+        return (
             f"Speak the following text in a very high tone and a bit slowly with easier intonation and extra friendly style, "
             f"in {LANGUAGE_MODE} language."
         )
     elif SPEECH_MODE == "Adult":
-        instr = (
+        return (
             f"Speak the following text in a normal and clear voice, "
             f"in {LANGUAGE_MODE} language."
         )
     elif SPEECH_MODE == "Senior":
-        instr = (
+        return (
             f"Speak the following text quite a bit slowed down, more loud and clear, "
             f"with easier intonation—nice, kind, and friendly—"
             f"in {LANGUAGE_MODE} language."
         )
     else:
-        instr = (
+        return (
             f"Speak the following text clearly, "
             f"in {LANGUAGE_MODE} language."
         )
 
-    # Call the TTS endpoint
-    with client.audio.speech.with_streaming_response.create(
+
+# 문장 끝(. ! ?) 뒤에 공백이 와야 자릅니다. "4.5" 나 "payment?, If so" 는 자르지 않습니다.
+# 답변은 이 단위로 합성·캐시되므로, 미리 합성(prefetch)할 때도 같은 방식으로 잘라야 캐시가 맞습니다.
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text: str) -> list:
+    return [sentence.strip() for sentence in SENTENCE_BREAK.split(text) if sentence.strip()]
+
+
+def tts_cache_key(text: str) -> str:
+    return make_cache_key(text, VOICE, SPEECH_MODE, LANGUAGE_MODE, TTS_MODEL)
+
+
+_tts_cache = None
+_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> AudioCache:
+    global _tts_cache
+    if _tts_cache is None:
+        with _tts_cache_lock:
+            if _tts_cache is None:
+                _tts_cache = AudioCache(settings.TTS_CACHE["DIR"], settings.TTS_CACHE["MAX_BYTES"])
+    return _tts_cache
+
+
+def synthesize_bytes(text: str) -> bytes:
+    """
+    Return MP3 bytes for text, served from the TTS audio cache when the same line
+    was already synthesized with the current voice settings.
+    """
+    cache = get_tts_cache()
+    key = tts_cache_key(text)
+    data = cache.get(key)
+    if data is not None:
+        TTS_CACHE_LOOKUPS.inc("hit")
+        return data
+
+    TTS_CACHE_LOOKUPS.inc("miss")
+    admit("tts", count_text_tokens(text))
+    with timed("tts"), get_openai_client().audio.speech.with_streaming_response.create(
         model=TTS_MODEL,
         voice=VOICE,
         input=text,
-        instructions=instr,
+        instructions=speech_instructions(),
     ) as response:
-        response.stream_to_file(output_path)
+        data = response.read()
+    cache.put(key, data)
+    return data
 
-    print(f"✅ Saved speech file: {output_path}")
 
-    # Auto-play on macOS (afplay) or fallback
-    try:
-        subprocess.run(["afplay", str(output_path)], check=True)
-    except FileNotFoundError:
-        print("⚠️ 'afplay' not found—install it or replace with your OS player.")
+async def asynthesize_bytes(text: str) -> bytes:
+    """
+    Async version of synthesize_bytes (AsyncOpenAI); cache file I/O runs in a worker thread.
+    """
+    cache = get_tts_cache()
+    key = tts_cache_key(text)
+    data = await asyncio.to_thread(cache.get, key)
+    if data is not None:
+        TTS_CACHE_LOOKUPS.inc("hit")
+        return data
 
-if __name__ == "__main__":
-    # Use the user's name field for text and filename
-    user_name = "Justin"
-    if not user_name:
-        raise ValueError("Missing 'name' in data for TTS filename.")
+    TTS_CACHE_LOOKUPS.inc("miss")
 
-    # Here, text to speak is the user name (customize if needed)
-    synthesize_and_play(text="Welcome startbucks", filename=user_name)
+    async def request() -> bytes:
+        async with get_async_openai_client().audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=VOICE,
+            input=text,
+            instructions=speech_instructions(),
+        ) as response:
+            return await response.read()
 
+    with timed("tts"):
+        data = await guarded("tts", request, tokens=count_text_tokens(text))
+    await asyncio.to_thread(cache.put, key, data)
+    return data
 
-def synthesize_and_save(text: str, filename: str) -> Path:
-    output_path = Path(settings.MEDIA_ROOT) / f"{filename}.mp3"
 
-    if SPEECH_MODE == "Child":
-        instr = (
-            f"Speak the following text in a very high tone and a bit slowly with easier intonation and extra friendly style, "
-            f"in {LANGUAGE_MODE} language."
-        )
-    elif SPEECH_MODE == "Adult":
-        instr = (
-            f"Speak the following text in a normal and clear voice, "
-            f"in {LANGUAGE_MODE} language."
-        )
-    elif SPEECH_MODE == "Senior":
-        instr = (
-            f"Speak the following text quite a bit slowed down, more loud and clear, "
-            f"with easier intonation—nice, kind, and friendly—"
-            f"in {LANGUAGE_MODE} language."
-        )
-    else:
-        instr = (
-            f"Speak the following text clearly, "
-            f"in {LANGUAGE_MODE} language."
-        )
-    
-    with client.audio.speech.with_streaming_response.create(
+async def asynthesize_stream(text: str, chunk_size: int = 4096):
+    """
+    Return an async iterator of MP3 bytes for text that streams them as they arrive
+    from the TTS endpoint, without writing a file first. A fully received clip is
+    stored in the TTS audio cache, and a cached clip is yielded straight from it.
+
+    Admission happens here, before any byte is produced, so the caller can still
+    answer 429 on Overloaded instead of failing a response that already started.
+    """
+    cache = get_tts_cache()
+    key = tts_cache_key(text)
+    data = await asyncio.to_thread(cache.get, key)
+    if data is not None:
+        TTS_CACHE_LOOKUPS.inc("hit")
+        return _iter_chunks(data, chunk_size)
+    TTS_CACHE_LOOKUPS.inc("miss")
+
+    await get_scheduler("tts").acquire(tokens=count_text_tokens(text))
+    return _stream_speech(text, key, chunk_size)
+
+
+async def _iter_chunks(data: bytes, chunk_size: int):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+async def _stream_speech(text: str, key: str, chunk_size: int):
+    chunks = []
+    # 이미 보내기 시작한 스트림은 헤지/재시도할 수 없으므로 제한 시간만 둡니다.
+    async with get_async_openai_client().with_options(timeout=deadline("tts")).audio.speech.with_streaming_response.create(
         model=TTS_MODEL,
         voice=VOICE,
         input=text,
-        instructions=instr,
+        instructions=speech_instructions(),
     ) as response:
-        response.stream_to_file(str(output_path))
-    return output_path
\ No newline at end of file
+        async for chunk in response.iter_bytes(chunk_size):
+            chunks.append(chunk)
+            yield chunk
+    await asyncio.to_thread(get_tts_cache().put, key, b"".join(chunks))
+
+
+def save_audio(data: bytes, filename: str) -> Path:
+    """
+    MEDIA_ROOT/<filename>.mp3 에 씁니다. 내용이 같으면 다시 쓰지 않습니다 (mtime/ETag 가 그대로 유지됨).
+    """
+    output_path = Path(settings.MEDIA_ROOT) / f"{filename}.mp3"
+    try:
+        if output_path.stat().st_size == len(data) and output_path.read_bytes() == data:
+            return output_path
+    except FileNotFoundError:
+        pass
+    atomic_write_bytes(output_path, data)
+    return output_path
+
+
+async def asave_audio(data: bytes, filename: str) -> Path:
+    return await asyncio.to_thread(save_audio, data, filename)
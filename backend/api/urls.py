@@ -2,9 +2,15 @@ from django.urls import path
 from .views import STTProcessView
 from .views import IntroTTSView
 from .views import ConfirmTTSView
+from .views import OrderDetailView, OrderEventsView, OrdersView
+from .warmup import readiness_view
 
 urlpatterns = [
     path('process/', STTProcessView.as_view(), name='stt-process'),
     path("intro/", IntroTTSView.as_view(), name="intro-tts"),
     path('confirm-tts', ConfirmTTSView.as_view(), name='confirm-tts'),
+    path('ready/', readiness_view, name='ready'),
+    path('orders/', OrdersView.as_view(), name='orders'),
+    path('orders/events/', OrderEventsView.as_view(), name='order-events'),
+    path('orders/<str:order_id>/', OrderDetailView.as_view(), name='order-detail'),
 ]
\ No newline at end of file
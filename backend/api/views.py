@@ -1,93 +1,286 @@
-import os
+import asyncio
+import json
+import logging
 import uuid
-import tempfile
 from django.conf import settings
-from django.http import FileResponse
-from rest_framework.response import Response
-from rest_framework.views import APIView
+from urllib.parse import quote
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
-from rest_framework.parsers import MultiPartParser
-from .stt import listen_and_transcribe
-from .llm import order_agent
-from .tts import synthesize_and_save
+from .stt import alisten_and_transcribe, apreprocess_audio
+from .llm import aorder_agent, session_priority
+from .dialog import MODE, PAYMENT, STEP_PRIORITY
+from .profiles import get_profile
+from .pipeline import SpeechPipeline
+from .media import asave_clip, clip_url
+from .order_events import barista_error, order_filters, parse_cursor
+from .orders import ORDER_STATUSES, get_order, list_orders, update_order_status
+from .tts import asave_audio, asynthesize_bytes, asynthesize_stream, get_tts_cache
+from .metrics import RESILIENCE_EVENTS, timed
+from .scheduler import Overloaded, set_request_priority
 
-class STTProcessView(APIView):
-    parser_classes = [MultiPartParser]
+logger = logging.getLogger(__name__)
 
-    def post(self, request):
-        print("🛠️ Received POST request at /api/process/")
+REPEAT_TEXT = "Sorry, I didn't catch that. Could you say that again?"
+INTRO_TEXT = "Hello! Welcome to Starbucks Voice Order Agent. Start ordering! Choose between normal ordering, recommendation, or order using nickname."
+
+
+def get_session_id(request) -> str:
+    """
+    키오스크 세션 ID: X-Session-ID 헤더 → 쿠키 순서로 찾고, 없으면 새로 발급합니다.
+    """
+    session_id = request.headers.get(settings.VORDER_SESSION_HEADER) or request.COOKIES.get(settings.VORDER_SESSION_COOKIE)
+    return session_id or uuid.uuid4().hex
+
+
+def get_customer_profile(request):
+    """
+    X-Customer-ID 헤더 또는 ?customer= 로 지정한 고객(ID 또는 전화번호)의 Profile.
+    지정하지 않으면 기본 고객, 찾지 못하면 None.
+    """
+    return get_profile(request.headers.get(settings.VORDER_CUSTOMER_HEADER) or request.GET.get("customer"))
+
+
+def overloaded_response(error: Overloaded) -> JsonResponse:
+    """
+    업스트림 대기열이 가득 찼을 때: 같은 녹음을 Retry-After 초 뒤에 다시 보내면 됩니다.
+    """
+    response = JsonResponse({"error": str(error), "retry_after": error.retry_after}, status=429)
+    response["Retry-After"] = str(int(error.retry_after))
+    return response
+
+
+def wants_stream(request) -> bool:
+    """
+    ?stream=1 이면 mp3 파일 URL 대신 TTS 오디오를 응답 본문으로 바로 흘려보냅니다.
+    """
+    return request.GET.get("stream") in ("1", "true", "yes")
+
+
+def streaming_audio_response(chunks, headers: dict) -> StreamingHttpResponse:
+    """
+    TTS 바이트(async iterator)를 chunked 응답으로 전송합니다. 텍스트 정보는 헤더에 (URL 인코딩해서) 담습니다.
+    """
+    response = StreamingHttpResponse(chunks, content_type="audio/mpeg")
+    response["Cache-Control"] = "no-store"
+    for name, value in headers.items():
+        response[name] = quote(str(value))
+    return response
+
+
+# async 뷰: ASGI(uvicorn)에서는 STT/LLM/TTS 네트워크 대기 동안 워커 스레드를 점유하지 않습니다.
+# DRF APIView 는 async 핸들러를 지원하지 않으므로 Django View 를 직접 사용합니다.
+@method_decorator(csrf_exempt, name="dispatch")
+class STTProcessView(View):
+    async def post(self, request):
+        logger.info("🛠️ Received POST request at /api/process/")
         
         audio_file = request.FILES.get('audio')
         if not audio_file:
-            print("🚫 No audio file provided")
-            return Response({"error": "No audio file provided"}, status=400)
+            logger.warning("🚫 No audio file provided")
+            return JsonResponse({"error": "No audio file provided"}, status=400)
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-            for chunk in audio_file.chunks():
-                temp_audio.write(chunk)
-            temp_audio_path = temp_audio.name
+        session_id = get_session_id(request)
+        profile = get_customer_profile(request)
+        if profile is None:
+            logger.warning("🚫 Unknown customer")
+            return JsonResponse({"error": "Unknown customer"}, status=404)
+        # 이 요청(과 TTS task)의 업스트림 호출은 세션의 주문 단계 우선순위로 줄을 섭니다.
+        set_request_priority(session_priority(session_id))
 
+        # 무음 제거 / 모노 16 kHz / FLAC 변환 (프로세스 풀). 전부 무음이면 STT·LLM 을 건너뜁니다.
+        with timed("upload_read"):
+            data = audio_file.read()
         try:
-            print(f"🎧 Running STT on: {temp_audio_path}")
-            text = listen_and_transcribe(temp_audio_path)
-            print(f"📝 STT result: {text}")
+            audio = await apreprocess_audio(data)
         except Exception as e:
-            print(f"❌ STT error: {e}")
-            return Response({"error": f"STT failed: {e}"}, status=500)
-        finally:
-            os.remove(temp_audio_path)
+            logger.warning(f"⚠️ Audio preprocessing failed, sending original upload: {e}")
+            audio = audio_file
 
-        try:
-            reply, final_flag = order_agent(text)
-            print(f"🤖 LLM reply: {reply} | Final: {final_flag}")
-        except Exception as e:
-            print(f"❌ LLM error: {e}")
-            return Response({"error": f"LLM failed: {e}"}, status=500)
+        # LLM 답변을 문장 단위로 받아, 첫 문장이 끝나는 즉시 TTS 를 시작합니다.
+        pipeline = SpeechPipeline()
+        final_orders = []
+        if audio is None:
+            logger.info("🔇 Silent recording, skipping STT")
+            text, reply, final_flag = "", REPEAT_TEXT, False
+        else:
+            # 업로드된 버퍼를 임시 파일로 복사하지 않고 그대로 STT 에 넘깁니다.
+            try:
+                text = await alisten_and_transcribe(audio)
+                logger.info(f"📝 STT result: {text}")
+            except Overloaded as e:
+                logger.warning(f"🚦 {e}")
+                return overloaded_response(e)
+            except Exception as e:
+                logger.error(f"❌ STT error: {e}")
+                return JsonResponse({"error": f"STT failed: {e}"}, status=500)
+
+        if audio is not None and not text:
+            # STT 가 실패했거나(제한 시간 초과, 서킷 열림) 아무 말도 인식하지 못함: LLM 을 건너뛰고 다시 말해 달라고 합니다.
+            logger.info("🙉 Empty transcript, asking to repeat")
+            reply, final_flag = REPEAT_TEXT, False
+        elif audio is not None:
+            try:
+                reply, final_flag = await aorder_agent(
+                    text, session_id=session_id, profile=profile, on_text=pipeline.feed, on_final=final_orders.append,
+                )
+                logger.info(f"🤖 LLM reply: {reply} | Final: {final_flag}")
+            except Overloaded as e:
+                pipeline.cancel()
+                logger.warning(f"🚦 {e}")
+                return overloaded_response(e)
+            except Exception as e:
+                pipeline.cancel()
+                logger.error(f"❌ LLM error: {e}")
+                return JsonResponse({"error": f"LLM failed: {e}"}, status=500)
 
-        filename = "latest_reply"  # .mp3 확장자 없이 순수한 파일명 생성
+        pipeline.finish(reply)
+        # 확정된 주문은 /api/orders/<order_id>/ 로 조회합니다.
+        order_id = final_orders[0]["_id"] if final_orders else None
 
+        if wants_stream(request):
+            # 헤더에 답변 전체가 들어가야 하므로 응답은 LLM 이 끝난 뒤 시작하지만,
+            # 앞 문장들의 TTS 는 그 사이 이미 진행 중입니다.
+            response = streaming_audio_response(pipeline.stream(), {
+                "X-User-Text": text,
+                "X-Assistant-Text": reply,
+                "X-Order-Final": "true" if final_flag else "false",
+                "X-Order-ID": order_id or "",
+                settings.VORDER_SESSION_HEADER: session_id,
+            })
+            response.set_cookie(settings.VORDER_SESSION_COOKIE, session_id, samesite="Lax")
+            return response
+
+        # 세션끼리 덮어쓰지 않도록 답변마다 내용 해시 이름으로 저장합니다 (캐시 방지 쿼리 불필요).
+        # TTS 가 실패해도 주문은 진행되었으므로 500 대신 텍스트만 돌려줍니다 (audio_url = null).
+        audio_url = None
         try:
-            output_path = synthesize_and_save(text=reply, filename=filename)
-            print(f"🔊 TTS saved at: {output_path}")
+            clip = await asave_clip(await pipeline.read_all())
+            audio_url = clip_url(request, clip)
+            logger.info(f"🔊 TTS saved as clip {clip} | cache: {get_tts_cache().stats()}")
         except Exception as e:
-            print(f"❌ TTS error: {e}")
-            return Response({"error": f"TTS failed: {e}"}, status=500)
-        
-        base_url = request.build_absolute_uri('/')[:-1]  # ex) http://localhost:8000
+            logger.error(f"❌ TTS error, replying with text only: {e}")
+            RESILIENCE_EVENTS.inc("tts", "fallback")
 
-        return Response({
+        response = JsonResponse({
             "user_text": text,
             "assistant_text": reply,
-            "audio_url": f"{base_url}{settings.MEDIA_URL}{filename}.mp3",
+            "audio_url": audio_url,
             "final": final_flag,
+            "order_id": order_id,
+            "session_id": session_id,
         })
+        response[settings.VORDER_SESSION_HEADER] = session_id
+        response.set_cookie(settings.VORDER_SESSION_COOKIE, session_id, samesite="Lax")
+        return response
     
 
-class IntroTTSView(APIView):
-    def post(self, request):
-        intro_path = os.path.join(settings.MEDIA_ROOT, "intro.mp3")
-
-        # 파일이 존재하지 않으면 생성
-        if not os.path.exists(intro_path):
-            intro_text = "Hello! Welcome to Starbucks Voice Order Agent. Start ordering! Choose between normal ordering, recommendation, or order using nickname."
-            try:
-                synthesize_and_save(text=intro_text, filename="intro")
-            except Exception as e:
-                return Response({"error": f"TTS generation failed: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+@method_decorator(csrf_exempt, name="dispatch")
+class IntroTTSView(View):
+    async def post(self, request):
+        # 새 세션의 첫 화면이므로 주문 시작 단계의 우선순위로 합성합니다.
+        set_request_priority(STEP_PRIORITY[MODE])
+        # TTS 캐시를 거치므로 음성 설정이 바뀌지 않았다면 API 호출 없이 바로 만들어집니다.
+        # intro.mp3 는 고정 경로로 재생하는 클라이언트를 위해 남겨 두되, 내용이 바뀐 경우에만 다시 씁니다.
+        try:
+            data = await asynthesize_bytes(INTRO_TEXT)
+            await asave_audio(data, "intro")
+            clip = await asave_clip(data)
+        except Overloaded as e:
+            return overloaded_response(e)
+        except Exception as e:
+            return JsonResponse({"error": f"TTS generation failed: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response({"audio_url": f"{settings.MEDIA_URL}intro.mp3"})
+        return JsonResponse({"audio_url": clip_url(request, clip)})
     
 
-class ConfirmTTSView(APIView):
-    def get(self, request):
+class ConfirmTTSView(View):
+    async def get(self, request):
         text = request.GET.get("text")
         if not text:
-            return Response({"error": "Missing 'text' query parameter"}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponse({"error": "Missing 'text' query parameter"}, status=status.HTTP_400_BAD_REQUEST)
 
-        filename = f"latest_confirm_reply"
+        # 주문 확인 낭독은 결제 직전 세션과 같은 우선순위 (세션 단계는 이미 DONE 일 수 있음)
+        set_request_priority(STEP_PRIORITY[PAYMENT])
         try:
-            output_path = synthesize_and_save(text, filename)
+            if wants_stream(request):
+                # 승인(Overloaded)은 응답 헤더를 보내기 전에 끝내고, 제너레이터는 받아서 흘려보내기만 합니다.
+                return streaming_audio_response(await asynthesize_stream(text), {})
+
+            # 공용 파일(latest_confirm_reply.mp3)에 쓰지 않고, 캐시 가능한 내용 해시 URL 로 보냅니다.
+            clip = await asave_clip(await asynthesize_bytes(text))
+        except Overloaded as e:
+            return overloaded_response(e)
         except Exception as e:
-            return Response({"error": f"TTS failed: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return JsonResponse({"error": f"TTS failed: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return HttpResponseRedirect(clip_url(request, clip))
+
+
+def barista_denied(request):
+    """
+    바리스타 토큰 확인 (api/order_events.py 의 barista_error). 통과하면 None, 아니면 돌려줄 응답.
+    """
+    error = barista_error(request.headers.get("Authorization", ""), request.GET.get("token"))
+    if error:
+        return JsonResponse({"error": error[1]}, status=error[0])
+    return None
+
+
+class OrdersView(View):
+    async def get(self, request):
+        """
+        주문 대기열 (ETA 순). ?since=<cursor> 이면 그 뒤에 새로 생기거나 바뀐 주문만.
+        """
+        denied = barista_denied(request)
+        if denied:
+            return denied
+        statuses, number = order_filters(request.GET)
+        since = parse_cursor(request.GET.get("since"))
+        orders = await asyncio.to_thread(list_orders, statuses, number, since)
+        cursor = max([order.get("updated_at", 0) for order in orders], default=since)
+        return JsonResponse({"orders": orders, "cursor": cursor})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class OrderDetailView(View):
+    async def get(self, request, order_id):
+        # 키오스크 확인 화면용: 추측할 수 없는 주문 ID 를 아는 쪽만 조회 (토큰 불필요)
+        order = await asyncio.to_thread(get_order, order_id)
+        if order is None:
+            return JsonResponse({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse(order)
+
+    async def post(self, request, order_id):
+        """
+        바리스타 화면에서 상태 변경: {"status": "preparing" | "ready" | "picked_up" | "cancelled" | "pending"}
+        """
+        denied = barista_denied(request)
+        if denied:
+            return denied
+        try:
+            new_status = json.loads(request.body or b"{}").get("status")
+        except ValueError:
+            new_status = None
+        if new_status not in ORDER_STATUSES:
+            return JsonResponse({"error": f"status must be one of {', '.join(ORDER_STATUSES)}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        order = await asyncio.to_thread(update_order_status, order_id, new_status)
+        if order is None:
+            return JsonResponse({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse(order)
+
 
-        return FileResponse(open(output_path, "rb"), content_type="audio/mpeg")
\ No newline at end of file
+class OrderEventsView(View):
+    async def get(self, request):
+        """
+        /api/orders/events/ 는 ASGI 서버에서 api/order_events.py 가 직접 처리합니다 (backend/asgi.py).
+        여기까지 왔다면 WSGI(runserver)라서 클라이언트 연결 끊김을 알 수 없으므로 열지 않습니다.
+        """
+        return JsonResponse(
+            {"error": "Order events need the ASGI server (uvicorn backend.asgi:application); "
+                      "poll /api/orders/?since=<cursor> instead"},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
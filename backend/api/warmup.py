@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# 서버 프로세스가 뜬 직후 백그라운드에서 무거운 모듈 import, 클라이언트 생성, 캐시 준비를 미리 해서
+# 첫 요청이 그 비용을 치르지 않게 합니다. /api/ready/ 는 이 작업이 끝나야 200 을 돌려줍니다.
+
+
+def _load_audio():
+    # numpy/soundfile 로드 + 전처리 워커 프로세스 띄우기
+    from .audio import preprocess_audio
+    from .stt import get_preprocess_pool
+    get_preprocess_pool().submit(preprocess_audio, b"").result()
+
+
+def _load_clients():
+    from .clients import get_async_openai_client, get_openai_client
+    from .llm import get_order_model
+    get_openai_client()
+    get_async_openai_client()
+    get_order_model()
+
+
+def _load_profiles():
+    # 기본 고객의 메뉴 색인 / 시스템 프롬프트를 만들고 발음 키 캐시를 채워 둡니다.
+    from .profiles import get_default_profile
+    get_default_profile().catalog.candidates("caffe latte")
+
+
+def _load_tokenizer():
+    from .history import get_encoding
+    get_encoding()
+
+
+def _open_stores():
+    from .media import get_clip_store
+    from .mongo import get_order_collection
+    from .outbox import get_order_outbox
+    from .sessions import get_conversation_store
+    from .tts import get_tts_cache
+    get_tts_cache()
+    get_clip_store()
+    get_conversation_store()
+    get_order_outbox()
+    get_order_collection()  # 연결은 pymongo 가 백그라운드에서 엽니다
+
+
+def _prefetch_prompts():
+    # 인사말과 첫 질문을 TTS 캐시에 미리 넣어 둡니다 (이미 있으면 건너뜀).
+    # IntroTTSView 는 인사말 전체를 한 번에 합성하므로 문장 단위로 나누는 prefetcher 가 아니라
+    # 같은 캐시 키(전체 문장)로 직접 합성합니다.
+    from .dialog import MODE, NEXT_PROMPTS
+    from .prefetch import prefetch_replies
+    from .tts import synthesize_bytes
+    from .views import INTRO_TEXT
+    synthesize_bytes(INTRO_TEXT)
+    prefetch_replies("warmup", NEXT_PROMPTS.get(MODE, ()))
+
+
+# (이름, 필수 여부, 함수). 필수 단계가 실패하면 준비되지 않은 상태(503)로 남습니다.
+WARMUP_STEPS = [
+    ("clients", True, _load_clients),
+    ("profiles", True, _load_profiles),
+    ("audio", True, _load_audio),
+    ("tokenizer", False, _load_tokenizer),
+    ("stores", False, _open_stores),
+    ("prefetch", False, _prefetch_prompts),
+]
+
+_status = {"state": "pending", "steps": {}}
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def warmup():
+    failed = False
+    for name, required, step in WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+            _status["steps"][name] = {"ok": True, "seconds": round(time.perf_counter() - start, 3)}
+        except Exception as e:
+            logger.warning(f"⚠️ Warmup step '{name}' failed: {e}")
+            _status["steps"][name] = {"ok": False, "error": str(e), "seconds": round(time.perf_counter() - start, 3)}
+            failed = failed or required
+    _status["state"] = "failed" if failed else "ready"
+    logger.info(f"🔥 Warmup {_status['state']}: {_status['steps']}")
+
+
+def start_warmup():
+    """
+    asgi.py / wsgi.py 에서 애플리케이션을 만든 뒤 한 번 부릅니다.
+    """
+    global _thread
+    if not settings.WARMUP["ENABLED"]:
+        _status["state"] = "ready"
+        return
+    with _thread_lock:
+        if _thread is None:
+            _status["state"] = "warming"
+            _thread = threading.Thread(target=warmup, name="warmup", daemon=True)
+            _thread.start()
+
+
+def is_ready() -> bool:
+    return _status["state"] == "ready"
+
+
+def readiness_view(request):
+    return JsonResponse({"ready": is_ready(), **_status}, status=200 if is_ready() else 503)
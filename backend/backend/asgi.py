@@ -13,4 +13,40 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Django 설정이 로드된 뒤에 import 해야 합니다.
+from django.utils.module_loading import import_string  # noqa: E402
+from api.warmup import start_warmup  # noqa: E402
+
+# 무거운 초기화를 첫 요청 전에 백그라운드에서 끝내 둡니다 (/api/ready/ 로 확인).
+start_warmup()
+
+# 핸들러 모듈(numpy, LLM 등)은 첫 연결 때 import 합니다.
+WEBSOCKET_ROUTES = {
+    "/ws/stt": "api.stream_stt.websocket_stt",
+}
+# 연결 끊김을 직접 봐야 하는 스트리밍 HTTP 엔드포인트 (Django 를 거치지 않음)
+HTTP_ROUTES = {
+    "/api/orders/events": "api.order_events.order_events",
+}
+
+
+async def application(scope, receive, send):
+    """
+    HTTP 는 HTTP_ROUTES 에 있으면 그 핸들러로, 나머지는 Django 로 보냅니다.
+    웹소켓은 WEBSOCKET_ROUTES 의 핸들러로 보냅니다.
+    """
+    if scope["type"] == "websocket":
+        handler = WEBSOCKET_ROUTES.get(scope["path"].rstrip("/"))
+        if handler is None:
+            await send({"type": "websocket.close", "code": 4404})
+            return
+        await import_string(handler)(scope, receive, send)
+        return
+    if scope["type"] == "http" and scope["method"] == "GET":
+        handler = HTTP_ROUTES.get(scope["path"].rstrip("/"))
+        if handler is not None:
+            await import_string(handler)(scope, receive, send)
+            return
+    await django_application(scope, receive, send)
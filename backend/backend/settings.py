@@ -14,6 +14,7 @@ import os
 
 from pathlib import Path
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 # .env에서 OPENAI_API_KEY 불러오기
 load_dotenv()
@@ -132,6 +133,136 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 INSTALLED_APPS += ['corsheaders']
 MIDDLEWARE = ['corsheaders.middleware.CorsMiddleware'] + MIDDLEWARE
 CORS_ALLOW_ALL_ORIGINS = True  # 개발 중에만!
+CORS_ALLOW_HEADERS = (*default_headers, "x-session-id", "x-customer-id")
+CORS_EXPOSE_HEADERS = ["X-Session-ID", "X-User-Text", "X-Assistant-Text", "X-Order-Final", "X-Order-ID"]
+
+# 음성 업로드는 이 크기까지 메모리에 두고 바로 STT 로 넘깁니다 (임시 파일을 만들지 않음).
+FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# 세션별 대화 저장소 (memory: 단일 프로세스 LRU, sqlite: 여러 워커가 공유)
+CONVERSATION_STORE = {
+    "BACKEND": os.getenv("CONVERSATION_STORE", "memory"),
+    "PATH": BASE_DIR / "conversations.sqlite3",
+    "MAX_SESSIONS": 1000,
+    "IDLE_TIMEOUT": 30 * 60,  # 초
+}
+VORDER_SESSION_HEADER = "X-Session-ID"
+VORDER_SESSION_COOKIE = "vorder_session"
+
+# 고객 프로필: 요청의 X-Customer-ID 헤더(또는 ?customer=)로 고객 ID / 전화번호를 지정합니다.
+# 지정하지 않으면 DEFAULT 파일(user_info.json)의 고객으로 주문합니다.
+PROFILE_STORE = {
+    "BACKEND": os.getenv("PROFILE_STORE", "json"),  # "json" (DIR/<고객ID>.json) 또는 "sqlite"
+    "DIR": BASE_DIR / "profiles",
+    "PATH": BASE_DIR / "profiles.sqlite3",
+    "DEFAULT": BASE_DIR / "user_info.json",
+    "MAX_PROFILES": 256,
+}
+VORDER_CUSTOMER_HEADER = "X-Customer-ID"
+
+# LLM 에 보내는 대화 기록의 토큰 예산 (시스템 프롬프트, 주문 상태 요약 제외).
+# 예산을 넘는 오래된 턴은 빠지고 주문 상태 요약이 대신합니다.
+CHAT_HISTORY = {
+    "MODEL": "gpt-4o-mini",  # tiktoken 인코딩 선택용
+    "MAX_TOKENS": 600,
+    "MIN_TURNS": 2,  # 예산을 넘어도 남기는 최근 턴 수
+}
+
+# TTS 오디오 캐시 (같은 문장 + 같은 음성 설정이면 재사용)
+TTS_CACHE = {
+    "DIR": os.path.join(MEDIA_ROOT, "tts_cache"),
+    "MAX_BYTES": 200 * 1024 * 1024,
+}
+# 요청마다 만든 답변 음성 (내용 해시 파일명, /media/clips/<sha256>.mp3).
+# 백그라운드 스레드가 SWEEP_INTERVAL 마다 TTL(마지막 사용 기준)이 지난 파일과 크기 상한을 넘는 파일을 지웁니다.
+MEDIA_CLIPS = {
+    "DIR": os.path.join(MEDIA_ROOT, "clips"),
+    "TTL": 6 * 3600,  # 초
+    "MAX_BYTES": 100 * 1024 * 1024,
+    "SWEEP_INTERVAL": 600,  # 초
+}
+# 업스트림(OpenAI) 호출 정책 (api/resilience.py). 단위: 초
+# DEADLINE 은 재시도까지 포함한 한 단계의 제한 시간, 첫 요청이 최근 p95 (표본이 MIN_SAMPLES 보다 적으면
+# HEDGE_AFTER) 를 넘기면 같은 요청을 하나 더 보내 먼저 온 응답을 씁니다. FAILURE_THRESHOLD 번 연속 실패하면
+# RESET_TIMEOUT 동안 바로 실패 처리(LLM 은 고정 질문, TTS 는 텍스트만 응답)합니다.
+RESILIENCE = {
+    "DEFAULTS": {
+        "DEADLINE": 10.0,
+        "HEDGE_AFTER": 3.0,
+        "HEDGE_PERCENTILE": 95,
+        "MIN_SAMPLES": 20,
+        "RETRIES": 1,
+        "BACKOFF": 0.2,
+        "FAILURE_THRESHOLD": 5,
+        "RESET_TIMEOUT": 30.0,
+    },
+    "STAGES": {
+        "stt": {"DEADLINE": 8.0, "HEDGE_AFTER": 2.5},
+        "llm": {"DEADLINE": 10.0, "HEDGE_AFTER": 3.0},
+        "tts": {"DEADLINE": 8.0, "HEDGE_AFTER": 2.0},
+    },
+}
+# 업스트림 호출 승인 (api/scheduler.py). RPM/TPM 은 OpenAI 계정 한도에 맞추고(프로세스 수로 나눠서),
+# BURST_SECONDS 만큼은 몰아서 보낼 수 있습니다. 대기열이 MAX_QUEUE 개로 찼거나 예상 대기가 MAX_WAIT 초를
+# 넘으면 429 + Retry-After 로 바로 돌려보냅니다. TPM 이 None 이면 요청 수만 제한합니다.
+SCHEDULER = {
+    "DEFAULTS": {
+        "RPM": 500,
+        "TPM": None,
+        "BURST_SECONDS": 5,
+        "MAX_QUEUE": 50,
+        "MAX_WAIT": 5.0,
+    },
+    "STAGES": {
+        "stt": {"RPM": 500},
+        "llm": {"RPM": 500, "TPM": 200000},
+        "tts": {"RPM": 500, "TPM": 200000},
+    },
+}
+# 매 턴 다음에 나올 고정 대사를 미리 합성해 둡니다 (백그라운드 스레드 WORKERS 개).
+TTS_PREFETCH = {
+    "ENABLED": os.getenv("TTS_PREFETCH", "1") == "1",
+    "WORKERS": 2,
+}
+
+# 서버 시작 직후 백그라운드 준비 (api/warmup.py). 끝나기 전까지 /api/ready/ 는 503
+WARMUP = {
+    "ENABLED": os.getenv("WARMUP", "1") == "1",
+}
+
+# MongoDB (주문 저장). 예: mongodb+srv://<user>:<password>@<cluster>/order?appName=llm-project
+# 테스트/벤치마크에서는 MONGODB_URI=mongomock:// 로 인프로세스 대체 DB 사용
+MONGODB = {
+    "URI": os.getenv("MONGODB_URI", "mongodb://localhost:27017"),
+    "DATABASE": "order",
+    "COLLECTION": "order_list",
+    "MAX_POOL_SIZE": 20,
+    "MIN_POOL_SIZE": 1,
+    "MAX_IDLE_TIME_MS": 5 * 60 * 1000,
+    "SERVER_SELECTION_TIMEOUT_MS": 5000,
+    "CONNECT_TIMEOUT_MS": 5000,
+    "SOCKET_TIMEOUT_MS": 10000,
+    "WRITE_CONCERN": "majority",
+}
+
+# 주문 대기열 API (api/orders.py): change stream 을 못 쓰는 배포에서는 POLL_INTERVAL 초마다 폴링,
+# SSE 연결은 HEARTBEAT 초마다 keepalive 를 보냅니다.
+# 목록/이벤트/상태 변경은 바리스타 화면용이라 BARISTA_TOKEN 이 필요합니다 (설정하지 않으면 닫혀 있음).
+ORDERS = {
+    "BARISTA_TOKEN": os.getenv("BARISTA_TOKEN"),
+    "POLL_INTERVAL": 1.0,
+    "HEARTBEAT": 15,
+    "MAX_RESULTS": 200,
+    "QUEUE_SIZE": 100,  # SSE 연결마다 쌓아 둘 수 있는 변경 수 (넘으면 그 연결을 끊음)
+}
+
+# 주문 outbox: 로컬 SQLite 에 먼저 기록하고 백그라운드에서 MongoDB 로 배치 전송
+ORDER_OUTBOX = {
+    "PATH": BASE_DIR / "order_outbox.sqlite3",
+    "BATCH_SIZE": 100,
+    "FLUSH_INTERVAL": 1.0,  # 초
+    "MAX_BACKOFF": 60.0,  # 초
+}
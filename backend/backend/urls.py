@@ -15,15 +15,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
+from api.media import serve_media
+from api.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),  # ✅ 여기가 중요!
-]
-
-# 미디어 파일 서빙 (TTS 생성된 mp3 파일 접근 위해 필요)
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape
+    # 미디어 파일 서빙 (TTS 생성된 mp3 파일 접근 위해 필요). DEBUG 여부와 관계없이 ETag/Range 지원.
+    re_path(r'^media/(?P<path>.+)$', serve_media, name='media'),
+]
\ No newline at end of file
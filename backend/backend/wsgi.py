@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# 무거운 초기화를 첫 요청 전에 백그라운드에서 끝내 둡니다 (/api/ready/ 로 확인).
+from api.warmup import start_warmup  # noqa: E402
+
+start_warmup()
@@ -0,0 +1,182 @@
+"""
+Local stand-in for the OpenAI endpoints VOrder uses (transcriptions, chat completions, speech),
+with configurable latency and jitter. Point the clients at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python -m benchmarks.fake_openai --port 8765 --stt-latency 0.4 --llm-latency 0.6 --tts-latency 0.8
+"""
+import argparse
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import soundfile as sf
+
+# 벤치마크 클립 길이로 몇 번째 발화인지 알아냅니다: 길이 = CLIP_BASE + CLIP_STEP * 순번
+CLIP_BASE_SECONDS = 1.0
+CLIP_STEP_SECONDS = 0.25
+
+DEFAULT_TRANSCRIPTS = [
+    "I'd like a normal order.",
+    "A caffe latte, please.",
+    "Iced.",
+    "No extras.",
+    "Grande.",
+    "No, that's it.",
+    "15 minutes.",
+    "Proceed to payment.",
+]
+DEFAULT_COMPLETION = "Sure! Hot or Iced?"
+DEFAULT_MP3 = Path(__file__).resolve().parent.parent / "media" / "finish_order.mp3"
+
+
+def clip_seconds(turn: int) -> float:
+    return CLIP_BASE_SECONDS + CLIP_STEP_SECONDS * turn
+
+
+class FakeOpenAI:
+    def __init__(self, stt_latency=0.4, llm_latency=0.6, tts_latency=0.8, jitter=0.1,
+                 transcripts=None, completion=DEFAULT_COMPLETION, mp3_path=DEFAULT_MP3):
+        self.latency = {"stt": stt_latency, "llm": llm_latency, "tts": tts_latency}
+        self.jitter = jitter
+        self.transcripts = transcripts or DEFAULT_TRANSCRIPTS
+        self.completion = completion
+        self.mp3 = Path(mp3_path).read_bytes() if Path(mp3_path).exists() else b"\xff\xfb" + bytes(4094)
+        self.counts = {"stt": 0, "llm": 0, "tts": 0}
+        self._lock = threading.Lock()
+        self.server = None
+
+    def delay(self, stage: str):
+        with self._lock:
+            self.counts[stage] += 1
+        seconds = self.latency[stage] + random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, seconds))
+
+    def transcript_for(self, body: bytes) -> str:
+        # multipart 본문에서 오디오를 꺼내 길이로 발화 순번을 계산합니다.
+        for part in body.split(b"\r\n--"):
+            head, _, payload = part.partition(b"\r\n\r\n")
+            if b'name="file"' not in head:
+                continue
+            try:
+                samples, rate = sf.read(io.BytesIO(payload))
+            except Exception:
+                break
+            turn = round((len(samples) / rate - CLIP_BASE_SECONDS) / CLIP_STEP_SECONDS)
+            return self.transcripts[max(0, min(turn, len(self.transcripts) - 1))]
+        return random.choice(self.transcripts)
+
+    def start(self, host="127.0.0.1", port=0):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                path = self.path.split("?")[0]
+                if path.endswith("/audio/transcriptions"):
+                    fake.delay("stt")
+                    self._json({"text": fake.transcript_for(body)})
+                elif path.endswith("/chat/completions"):
+                    fake.delay("llm")
+                    self._chat(json.loads(body or b"{}"))
+                elif path.endswith("/audio/speech"):
+                    fake.delay("tts")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "audio/mpeg")
+                    self.send_header("Content-Length", str(len(fake.mp3)))
+                    self.end_headers()
+                    self.wfile.write(fake.mp3)
+                else:
+                    self.send_error(404)
+
+            def _chat(self, request: dict):
+                model = request.get("model", "gpt-4o-mini")
+                created = int(time.time())
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                usage = {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110}
+                if not request.get("stream"):
+                    self._json({
+                        "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": fake.completion}}],
+                        "usage": usage,
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for piece in re.findall(r"\S+\s*", fake.completion):
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(0.01)
+                done = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+                self.wfile.flush()
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-openai", daemon=True).start()
+        return self.server.server_address
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stt-latency", type=float, default=0.4)
+    parser.add_argument("--llm-latency", type=float, default=0.6)
+    parser.add_argument("--tts-latency", type=float, default=0.8)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(args.stt_latency, args.llm_latency, args.tts_latency, args.jitter)
+    fake.start(args.host, args.port)
+    print(f"🧪 Fake OpenAI API listening on {fake.base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Offline end-to-end benchmark: drives /api/intro/, /api/process/ and /api/confirm-tts against a local
+fake OpenAI server (benchmarks/fake_openai.py) and reports p50/p95/p99 latency per stage and
+overall throughput. No network or API key needed.
+
+    cd backend
+    python -m benchmarks.run --sessions 20 --concurrency 5
+    python -m benchmarks.run --url http://127.0.0.1:8000 --concurrency 20   # live ASGI server
+
+In live mode the server must itself be started with OPENAI_BASE_URL pointing at a fake server
+(python -m benchmarks.fake_openai); only per-endpoint latencies are available there.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from api.metrics import LatencyRecorder, format_report
+
+from .fake_openai import DEFAULT_TRANSCRIPTS, FakeOpenAI, clip_seconds
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_clip(turn: int, rate: int = 16000) -> bytes:
+    """
+    발화 순번이 길이에 담긴 사인파 WAV (fake STT 가 길이를 보고 대본의 해당 문장을 돌려줌).
+    """
+    t = np.arange(int(rate * clip_seconds(turn))) / rate
+    samples = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    output = io.BytesIO()
+    sf.write(output, samples, rate, format="WAV", subtype="PCM_16")
+    return output.getvalue()
+
+
+def instrument_stages(recorder: LatencyRecorder):
+    """
+    뷰가 호출하는 단계 함수를 감싸서 단계별 소요 시간을 기록합니다 (in-process 모드 전용).
+    """
+    from api import views
+
+    def wrap(name: str, stage: str):
+        original = getattr(views, name)
+
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                recorder.add(f"stage:{stage}", time.perf_counter() - start)
+
+        setattr(views, name, timed)
+
+    wrap("apreprocess_audio", "preprocess")
+    wrap("alisten_and_transcribe", "stt")
+    wrap("aorder_agent", "llm")
+
+    # LLM 이 끝난 뒤 남은 TTS 대기 시간 (앞 문장은 LLM 생성 중에 이미 합성됩니다)
+    read_all = views.SpeechPipeline.read_all
+
+    async def timed_read_all(self):
+        start = time.perf_counter()
+        try:
+            return await read_all(self)
+        finally:
+            recorder.add("stage:tts_wait", time.perf_counter() - start)
+
+    views.SpeechPipeline.read_all = timed_read_all
+
+
+async def run_session(client, index: int, turns: int, recorder: LatencyRecorder, live: bool):
+    session_id = f"bench-{index}-{os.getpid()}"
+    headers = {"X-Session-ID": session_id}
+
+    async def timed(name, call):
+        start = time.perf_counter()
+        response = await call
+        recorder.add(f"endpoint:{name}", time.perf_counter() - start)
+        if response.status_code >= 400:
+            recorder.errors[name] += 1
+        return response
+
+    await timed("intro", client.post("/api/intro/"))
+
+    for turn in range(turns):
+        clip = make_clip(turn)
+        if live:
+            call = client.post("/api/process/", files={"audio": ("input.wav", clip, "audio/wav")}, headers=headers)
+        else:
+            upload = io.BytesIO(clip)
+            upload.name = "input.wav"
+            call = client.post("/api/process/", {"audio": upload}, headers=headers)
+        await timed("process", call)
+
+    text = "You ordered a Grande Caffe Latte. The total is 4500₩."
+    await timed("confirm-tts", client.get("/api/confirm-tts", params={"text": text}) if live
+                else client.get("/api/confirm-tts", {"text": text}))
+
+
+async def run(args, recorder: LatencyRecorder):
+    live = bool(args.url)
+    if live:
+        import httpx
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        from django.test import AsyncClient
+        client = AsyncClient()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(index):
+        async with semaphore:
+            try:
+                await run_session(client, index, args.turns, recorder, live)
+            except Exception as e:
+                recorder.errors["session"] += 1
+                print(f"❌ session {index} failed: {e}", file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(i) for i in range(args.sessions)))
+    wall = time.perf_counter() - start
+    if live:
+        await client.aclose()
+    return wall
+
+
+def setup_django(fake: FakeOpenAI, workdir: str):
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["OPENAI_BASE_URL"] = fake.base_url
+    os.environ["OPENAI_API_BASE"] = fake.base_url
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    try:
+        import mongomock  # noqa: F401
+        os.environ.setdefault("MONGODB_URI", "mongomock://")
+    except ImportError:
+        print("⚠️ mongomock not installed: order outbox flushes will fail and stay pending", file=sys.stderr)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.chdir(BACKEND_DIR)
+    import django
+    from django.conf import settings
+    django.setup()
+
+    # 결과물(mp3, 캐시, outbox)은 임시 디렉토리에만 씁니다.
+    # MEDIA_CLIPS / TTS_CACHE 의 DIR 은 설정을 읽을 때 MEDIA_ROOT 로 이미 정해졌으므로 따로 바꿉니다.
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+    settings.MEDIA_ROOT = workdir
+    settings.MEDIA_CLIPS = {**settings.MEDIA_CLIPS, "DIR": os.path.join(workdir, "clips")}
+    settings.TTS_CACHE = {**settings.TTS_CACHE, "DIR": os.path.join(workdir, "tts_cache")}
+    settings.ORDER_OUTBOX = {**settings.ORDER_OUTBOX, "PATH": os.path.join(workdir, "outbox.sqlite3")}
+    settings.CONVERSATION_STORE = {**settings.CONVERSATION_STORE, "BACKEND": "memory"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VOrder offline end-to-end benchmark")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=len(DEFAULT_TRANSCRIPTS))
+    parser.add_argument("--url", help="benchmark a live server instead of the in-process Django app")
+    parser.add_argument("--stt-latency", type=float, default=0.4)
+    parser.add_argument("--llm-latency", type=float, default=0.6)
+    parser.add_argument("--tts-latency", type=float, default=0.8)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(args.stt_latency, args.llm_latency, args.tts_latency, args.jitter)
+    fake.start()
+    recorder = LatencyRecorder()
+    with tempfile.TemporaryDirectory(prefix="vorder-bench-") as workdir:
+        if not args.url:
+            setup_django(fake, workdir)
+            instrument_stages(recorder)
+        wall = asyncio.run(run(args, recorder))
+    fake.stop()
+
+    report = recorder.report(wall, args.sessions * args.turns)
+    report["upstream_calls"] = fake.counts
+    print(format_report(report))
+    print(f"upstream calls: {fake.counts}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
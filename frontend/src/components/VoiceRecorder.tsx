@@ -1,16 +1,16 @@
 import { useState } from 'react';
+import { WavRecorder } from '../wavRecorder';
 
 export default function VoiceRecorder() {
   const [recording, setRecording] = useState(false);
 
   const handleRecord = async () => {
     const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-    const mediaRecorder = new MediaRecorder(stream);
-    const chunks: BlobPart[] = [];
+    const mediaRecorder = new WavRecorder(stream);
 
-    mediaRecorder.ondataavailable = (e) => chunks.push(e.data);
-    mediaRecorder.onstop = async () => {
-      const blob = new Blob(chunks, { type: 'audio/wav' });
+    mediaRecorder.onstop = async (blob) => {
+      mediaRecorder.close();
+      stream.getTracks().forEach((track) => track.stop());
       const formData = new FormData();
       formData.append('audio', blob, 'recording.wav');
 
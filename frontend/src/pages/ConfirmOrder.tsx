@@ -3,13 +3,19 @@ import { useLocation, useNavigate } from 'react-router-dom';
 
 export default function ConfirmOrder() {
   const navigate = useNavigate();
+  const location = useLocation();
+  const orderId = (location.state as { orderId?: string } | null)?.orderId;
   const [orderData, setOrderData] = useState<any[]>([]);
   const ttsPlayedRef = useRef(false);
 
   useEffect(() => {
   const loadDataAndPlayTTS = async () => {
     try {
-      const res = await fetch('http://localhost:8000/media/final_order.json');
+      // 주문 ID 가 있으면 주문 API 로 조회하고, 없으면 예전처럼 final_order.json 을 읽습니다.
+      let res = orderId ? await fetch(`http://localhost:8000/api/orders/${orderId}/`) : null;
+      if (!res || !res.ok) {
+        res = await fetch('http://localhost:8000/media/final_order.json');
+      }
       const data = await res.json();
 
       const orderItem = {
@@ -27,7 +33,7 @@ export default function ConfirmOrder() {
 
       if (!ttsPlayedRef.current) {
         const ttsText = `You ordered a ${data.size} ${data.menu} ${data.extra ? 'with ' + data.extra : ''}. The total is ${data.price}₩.`;
-        const ttsAudio = new Audio(`http://localhost:8000/api/confirm-tts?text=${encodeURIComponent(ttsText)}`);
+        const ttsAudio = new Audio(`http://localhost:8000/api/confirm-tts?stream=1&text=${encodeURIComponent(ttsText)}`);
 
         console.log('📢 TTS audio.play() triggered');
         ttsAudio.play().catch((err) => console.warn('TTS autoplay failed:', err));
@@ -45,7 +51,7 @@ export default function ConfirmOrder() {
   };
 
   loadDataAndPlayTTS();
-}, []);
+}, [orderId]);
 
 
   const handleCancel = () => {
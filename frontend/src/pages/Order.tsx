@@ -1,5 +1,6 @@
 import { useEffect, useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { WavRecorder } from '../wavRecorder';
 
 export default function Order() {
   const navigate = useNavigate();
@@ -8,8 +9,9 @@ export default function Order() {
   const [introPlayed, setIntroPlayed] = useState(false);
   const [assistantAudioUrl, setAssistantAudioUrl] = useState<string | null>(null);
   const audioRef = useRef<HTMLAudioElement | null>(null);
-  const mediaRecorderRef = useRef<MediaRecorder | null>(null);
-  const audioChunksRef = useRef<BlobPart[]>([]);
+  const mediaRecorderRef = useRef<WavRecorder | null>(null);
+  // 주문 화면에 들어올 때마다 새 대화 세션
+  const sessionIdRef = useRef<string>(crypto.randomUUID());
 
   const playDing = (frequency = 800, duration = 0.2) => {
   const audioContext = new (window.AudioContext || (window as any).webkitAudioContext)();
@@ -31,8 +33,6 @@ export default function Order() {
 
   const startRecording = () => {
     if (mediaRecorderRef.current && mediaRecorderRef.current.state !== 'recording') {
-      audioChunksRef.current = [];
-
       playDing();
 
       mediaRecorderRef.current.start();
@@ -48,26 +48,25 @@ export default function Order() {
 
   useEffect(() => {
     navigator.mediaDevices.getUserMedia({ audio: true }).then((stream) => {
-      const recorder = new MediaRecorder(stream);
+      // 서버가 바로 읽을 수 있도록 webm 대신 PCM WAV 로 녹음합니다.
+      const recorder = new WavRecorder(stream);
       mediaRecorderRef.current = recorder;
 
-      recorder.ondataavailable = (e) => audioChunksRef.current.push(e.data);
-
-      recorder.onstop = async () => {
+      recorder.onstop = async (blob) => {
         playDing();
 
-        const blob = new Blob(audioChunksRef.current, { type: 'audio/wav' });
         const formData = new FormData();
         formData.append('audio', blob, 'input.wav');
 
         const response = await fetch('http://localhost:8000/api/process/', {
           method: 'POST',
+          headers: { 'X-Session-ID': sessionIdRef.current },
           body: formData,
         });
 
         if (response.ok) {
           const result = await response.json();
-          const { user_text, assistant_text, audio_url, final } = result;
+          const { user_text, assistant_text, audio_url, final, order_id } = result;
           console.log('Audio url: ', audio_url);
 
           setChatLog((prev) => [
@@ -76,17 +75,26 @@ export default function Order() {
             { role: 'assistant', text: assistant_text },
           ]);
 
-          // 캐시 방지용 타임스탬프 추가
-          setAssistantAudioUrl(`${audio_url}?t=${Date.now()}`);
+          // 답변 음성 URL 은 내용 해시라 캐시해도 안전합니다. 같은 답변이 반복돼도 다시 재생되도록
+          // 캐시에 영향이 없는 #fragment 만 바꿉니다.
+          if (audio_url) {
+            setAssistantAudioUrl(`${audio_url}#${Date.now()}`);
+          }
 
           if (final) {
             setRecording(false);
-            setTimeout(() => navigate('/confirm-order'), 1500);
+            setTimeout(() => navigate('/confirm-order', { state: { orderId: order_id } }), 1500);
+            return;
+          }
+
+          if (!audio_url) {
+            // TTS 를 쓸 수 없어 텍스트만 온 경우: 재생할 음성이 없으니 바로 다음 녹음을 시작합니다.
+            setRecording(false);
+            startRecording();
             return;
           }
         }
 
-        audioChunksRef.current = [];
         setRecording(false);
       };
 
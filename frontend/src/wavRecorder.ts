@@ -0,0 +1,78 @@
+// 브라우저 MediaRecorder 는 webm/opus 로 녹음하는데, 서버 전처리(soundfile)는 webm 을 읽지 못해서
+// 무음 제거/16 kHz 변환 없이 원본이 그대로 STT 로 갑니다. 마이크 입력을 PCM 그대로 모아 WAV 로 보냅니다.
+export class WavRecorder {
+  state: 'inactive' | 'recording' = 'inactive';
+  onstop: ((blob: Blob) => void) | null = null;
+
+  private context: AudioContext;
+  private source: MediaStreamAudioSourceNode;
+  private processor: ScriptProcessorNode;
+  private chunks: Float32Array[] = [];
+
+  constructor(stream: MediaStream) {
+    this.context = new (window.AudioContext || (window as any).webkitAudioContext)();
+    this.source = this.context.createMediaStreamSource(stream);
+    // AudioWorklet 은 별도 모듈 파일이 필요해서, 4초 녹음에는 충분한 ScriptProcessor 를 씁니다.
+    this.processor = this.context.createScriptProcessor(4096, 1, 1);
+    this.processor.onaudioprocess = (e) => {
+      if (this.state === 'recording') {
+        this.chunks.push(new Float32Array(e.inputBuffer.getChannelData(0)));
+      }
+    };
+    this.source.connect(this.processor);
+    // 출력 버퍼는 비워 두므로 스피커로는 아무 소리도 나가지 않습니다 (연결해야 onaudioprocess 가 불림).
+    this.processor.connect(this.context.destination);
+  }
+
+  start() {
+    this.chunks = [];
+    this.state = 'recording';
+    this.context.resume();
+  }
+
+  stop() {
+    if (this.state !== 'recording') return;
+    this.state = 'inactive';
+    const blob = encodeWAV(this.chunks, this.context.sampleRate);
+    this.chunks = [];
+    this.onstop?.(blob);
+  }
+
+  close() {
+    this.source.disconnect();
+    this.processor.disconnect();
+    this.context.close();
+  }
+}
+
+// 모노 Float32 샘플 → 16-bit PCM WAV
+export function encodeWAV(chunks: Float32Array[], sampleRate: number): Blob {
+  const length = chunks.reduce((total, chunk) => total + chunk.length, 0);
+  const view = new DataView(new ArrayBuffer(44 + length * 2));
+  const writeString = (offset: number, text: string) => {
+    for (let i = 0; i < text.length; i++) view.setUint8(offset + i, text.charCodeAt(i));
+  };
+
+  writeString(0, 'RIFF');
+  view.setUint32(4, 36 + length * 2, true);
+  writeString(8, 'WAVE');
+  writeString(12, 'fmt ');
+  view.setUint32(16, 16, true); // fmt chunk size
+  view.setUint16(20, 1, true); // PCM
+  view.setUint16(22, 1, true); // mono
+  view.setUint32(24, sampleRate, true);
+  view.setUint32(28, sampleRate * 2, true); // byte rate
+  view.setUint16(32, 2, true); // block align
+  view.setUint16(34, 16, true); // bits per sample
+  writeString(36, 'data');
+  view.setUint32(40, length * 2, true);
+
+  let offset = 44;
+  for (const chunk of chunks) {
+    for (let i = 0; i < chunk.length; i++, offset += 2) {
+      const sample = Math.max(-1, Math.min(1, chunk[i]));
+      view.setInt16(offset, sample < 0 ? sample * 0x8000 : sample * 0x7fff, true);
+    }
+  }
+  return new Blob([view], { type: 'audio/wav' });
+}